@@ -1,14 +1,30 @@
 from flask import Flask, jsonify
+from flask.json.provider import DefaultJSONProvider
 from flask_cors import CORS
+from datetime import time
 import os
 from config import Config
-from utils.db import init_database
+from utils.db import init_database, get_db, prepared_statements
 from routes.auth_routes import auth_bp
-from routes.event_routes import event_bp
+from routes.event_routes import event_bp, catalog_cache
 from routes.admin_routes import admin_bp
+from routes.waiting_room_routes import waiting_room_bp
+from utils.payments import payment_queue, gateway
+from utils.availability import feed as availability_feed
+from utils.change_feed import listener as change_listener
+
+class JSONProvider(DefaultJSONProvider):
+    """Also serializes TIME columns (e.g. events.event_time)"""
+
+    @staticmethod
+    def default(o):
+        if isinstance(o, time):
+            return o.isoformat()
+        return DefaultJSONProvider.default(o)
 
 def create_app():
     app = Flask(__name__)
+    app.json = JSONProvider(app)
     
     # Configuration
     app.config['SECRET_KEY'] = Config.SECRET_KEY
@@ -28,13 +44,28 @@ def create_app():
     app.register_blueprint(auth_bp, url_prefix='/auth')
     app.register_blueprint(event_bp, url_prefix='/api')
     app.register_blueprint(admin_bp, url_prefix='/admin')
+    app.register_blueprint(waiting_room_bp, url_prefix='/api')
+    
+    # Start background payment workers
+    if payment_queue:
+        payment_queue.start()
+    
+    # Listen for catalog changes made by other workers
+    if change_listener:
+        change_listener.start()
     
     # Health check endpoint
     @app.route('/health', methods=['GET'])
     def health_check():
         return jsonify({
             'status': 'healthy',
-            'message': 'Event Ticketing API is running'
+            'message': 'Event Ticketing API is running',
+            'payment_gateway': gateway.stats(),
+            'availability_viewers': sum(availability_feed.viewers().values()),
+            'change_notifications': bool(change_listener and change_listener.connected),
+            'catalog_cache': catalog_cache.stats(),
+            'database': get_db().replica_stats(),
+            'prepared_statements': prepared_statements.stats()
         }), 200
     
     # Root endpoint
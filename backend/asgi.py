@@ -0,0 +1,67 @@
+"""
+Async entry point: serves the catalog, availability stream, cart and checkout
+endpoints from asyncio handlers (routes/async_event_routes.py) and everything
+else from the regular Flask app, in one process.
+
+    pip install -r requirements-async.txt
+    uvicorn asgi:app --host 0.0.0.0 --port $PORT
+
+A handler waiting on Postgres or PayPal holds no thread, so one process can
+keep thousands of slow connections open. The sync routes run in a thread
+pool as usual.
+"""
+from contextlib import asynccontextmanager
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.middleware.wsgi import WSGIMiddleware
+from starlette.routing import Match
+from config import Config
+from app import create_app
+from routes.async_event_routes import async_event_routes
+from utils.async_db import async_db
+from utils.async_payments import async_provider
+
+@asynccontextmanager
+async def lifespan(app):
+    await async_db.open()
+    yield
+    await async_db.close()
+    await async_provider.close()
+
+def create_async_app():
+    return Starlette(
+        routes=async_event_routes,
+        lifespan=lifespan,
+        # Same CORS policy as Flask-CORS applies to the sync app
+        middleware=[Middleware(
+            CORSMiddleware,
+            allow_origins=Config.CORS_ORIGINS,
+            allow_credentials=True,
+            allow_methods=['*'],
+            allow_headers=['*']
+        )]
+    )
+
+class Dispatcher:
+    """
+    Sends each request to the async app when one of its routes matches the
+    path and method, and to the Flask app otherwise (CORS preflights
+    included, which Flask-CORS answers)
+    """
+
+    def __init__(self, async_app, wsgi_app):
+        self.async_app = async_app
+        self.wsgi_app = WSGIMiddleware(wsgi_app)
+
+    def handles(self, scope):
+        return any(route.matches(scope)[0] == Match.FULL for route in self.async_app.routes)
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'http' and not self.handles(scope):
+            await self.wsgi_app(scope, receive, send)
+        else:
+            # Lifespan events open and close the async app's pool
+            await self.async_app(scope, receive, send)
+
+app = Dispatcher(create_async_app(), create_app())
@@ -0,0 +1,347 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmarks for the hot paths of the API.
+
+Measures the Python side of SupabaseDB.execute_query, the get_events and
+get_cart routes, require_auth, JSON serialization and autocomplete lookups. The database and the
+Supabase client are replaced by in-memory fakes returning deterministic
+data, so results do not depend on the network or the database contents.
+Compare runs made on the same machine.
+
+    python benchmark.py --save             # store a baseline
+    python benchmark.py                    # compare against it
+    python benchmark.py --filter execute_query
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import time
+from datetime import date, datetime, timedelta
+from datetime import time as dt_time
+from decimal import Decimal
+import jwt
+from psycopg2.extras import RealDictRow
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from config import Config
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'benchmarks', 'baseline.json')
+
+class FakeCursor:
+    """Cursor returning the same rows for every query"""
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.description = [(name,) for name in rows[0]] if rows else None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, query, params=None):
+        pass
+
+    def fetchone(self):
+        return RealDictRow(self.rows[0]) if self.rows else None
+
+    def fetchall(self):
+        return [RealDictRow(row) for row in self.rows]
+
+class FakeConnection:
+    """Stands in for the psycopg2 connection of SupabaseDB"""
+
+    closed = False
+
+    def __init__(self, rows):
+        self.rows = rows
+
+    def cursor(self, cursor_factory=None):
+        return FakeCursor(self.rows)
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+class FakeResponse:
+    def __init__(self, data):
+        self.data = data
+
+class FakeTable:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def select(self, columns):
+        return self
+
+    def execute(self):
+        return FakeResponse([dict(row) for row in self.rows])
+
+class FakeClient:
+    """Stands in for the Supabase client, serving whole tables"""
+
+    def __init__(self, tables):
+        self.tables = tables
+
+    def table(self, name):
+        return FakeTable(self.tables.get(name, []))
+
+def make_tables(events=500, seed=42):
+    """Deterministic catalog tables as the Supabase client returns them"""
+    rnd = random.Random(seed)
+    start = date(2030, 1, 1)
+    event_types = [{'id': i, 'name': f'Type {i}', 'description': ''} for i in range(1, 6)]
+    venues = [{'id': i, 'name': f'Venue {i}', 'city': f'City {i % 7}'} for i in range(1, 41)]
+    artists = [{'id': i, 'name': f'Artist {i}'} for i in range(1, 201)]
+    events_data = []
+    tickets = []
+    for i in range(1, events + 1):
+        events_data.append({
+            'id': i,
+            'title': f'Event {i}',
+            'description': 'Lorem ipsum dolor sit amet ' * 4,
+            'event_date': (start + timedelta(days=rnd.randint(0, 365))).isoformat(),
+            'event_time': '20:00:00',
+            'image_url': f'https://example.com/{i}.jpg',
+            'status': 'active' if rnd.random() < 0.9 else 'cancelled',
+            'type_id': rnd.randint(1, 5),
+            'venue_id': rnd.randint(1, 40),
+            'artist_id': rnd.randint(1, 200)
+        })
+        for tier in range(4):
+            tickets.append({
+                'id': len(tickets) + 1,
+                'event_id': i,
+                'location': f'Tier {tier}',
+                'price': f'{rnd.randint(10, 300)}.00',
+                'quantity_available': 500,
+                'quantity_sold': rnd.randint(0, 500)
+            })
+    return {
+        'events': events_data,
+        'event_types': event_types,
+        'venues': venues,
+        'artists': artists,
+        'tickets': tickets,
+        'users': []
+    }
+
+def make_catalog_rows(tables):
+    """Rows of the get_events query (active events joined with their summaries)"""
+    event_types = {et['id']: et for et in tables['event_types']}
+    venues = {v['id']: v for v in tables['venues']}
+    artists = {a['id']: a for a in tables['artists']}
+    rows = []
+    for event in sorted(tables['events'], key=lambda e: e['event_date']):
+        if event['status'] != 'active':
+            continue
+        tickets = [t for t in tables['tickets'] if t['event_id'] == event['id']]
+        remaining = sum(t['quantity_available'] - t['quantity_sold'] for t in tickets)
+        rows.append({
+            'id': event['id'],
+            'title': event['title'],
+            'description': event['description'],
+            'event_date': event['event_date'],
+            'event_time': event['event_time'],
+            'image_url': event['image_url'],
+            'status': event['status'],
+            'event_type': event_types[event['type_id']]['name'],
+            'venue_name': venues[event['venue_id']]['name'],
+            'venue_city': venues[event['venue_id']]['city'],
+            'artist_name': artists[event['artist_id']]['name'],
+            'min_price': min(float(t['price']) for t in tickets),
+            'max_price': max(float(t['price']) for t in tickets),
+            'remaining_inventory': remaining,
+            'sold_out': remaining <= 0
+        })
+    return rows
+
+def make_suggestions(tables):
+    """Autocomplete suggestions for the active events and everything they reference"""
+    suggestions = []
+    for event in tables['events']:
+        if event['status'] == 'active':
+            suggestions.append({'type': 'event', 'id': event['id'], 'text': event['title'], 'score': event['id'] % 97})
+    for kind, table in (('artist', 'artists'), ('venue', 'venues'), ('event_type', 'event_types')):
+        for row in tables[table]:
+            suggestions.append({'type': kind, 'id': row['id'], 'text': row['name'], 'score': row['id']})
+    return suggestions
+
+def make_rows(count, seed=42):
+    """Deterministic result rows with the column types psycopg2 returns"""
+    rnd = random.Random(seed)
+    return [{
+        'id': i,
+        'quantity': rnd.randint(1, 6),
+        'ticket_id': rnd.randint(1, 10000),
+        'location': 'General',
+        'price': Decimal(f'{rnd.randint(10, 300)}.50'),
+        'event_id': rnd.randint(1, 1000),
+        'event_title': f'Event {i}',
+        'event_date': date(2030, 1, 1) + timedelta(days=i % 365),
+        'event_time': dt_time(20, 0),
+        'venue_name': 'Venue',
+        'created_at': datetime(2030, 1, 1, 12, 0, 0)
+    } for i in range(count)]
+
+def measure(func, min_time=0.5, repeat=15):
+    """
+    Run func in rounds of `number` calls, with `number` calibrated so a round
+    lasts at least min_time / repeat. Returns per-call times of each round.
+    """
+    func()
+    number = 1
+    while True:
+        started = time.perf_counter()
+        for _ in range(number):
+            func()
+        elapsed = time.perf_counter() - started
+        if elapsed >= min_time / repeat:
+            break
+        number *= 2
+
+    rounds = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for _ in range(number):
+            func()
+        rounds.append((time.perf_counter() - started) / number)
+    return rounds
+
+def build_benchmarks():
+    """Return {name: callable} with the app wired to the in-memory fakes"""
+    from utils.db import get_db
+    from app import create_app
+    from routes.auth_routes import require_auth
+    from routes import event_routes
+    from utils.autocomplete import PrefixIndex
+
+    db = get_db()
+    tables = make_tables()
+    db._client = FakeClient(tables)
+    app = create_app()
+
+    token = jwt.encode({
+        'user_id': 1, 'email': 'bench@example.com', 'role': 'user',
+        'exp': datetime.utcnow() + timedelta(days=1)
+    }, Config.JWT_SECRET_KEY, algorithm='HS256')
+    headers = {'Authorization': f'Bearer {token}'}
+
+    rows_1 = make_rows(1)
+    rows_1k = make_rows(1000)
+    rows_10k = make_rows(10000)
+    cart_rows = make_rows(20)
+    catalog_rows = make_catalog_rows(tables)
+    suggestions = PrefixIndex(make_suggestions(make_tables(events=20000)))
+
+    def with_rows(rows, func):
+        def run():
+            db._pg_conn = FakeConnection(rows)
+            return func()
+        return run
+
+    @require_auth
+    def authenticated():
+        return None
+
+    benchmarks = {
+        'execute_query.detect_table': lambda: db.execute_query('venues'),
+        'execute_query.one': with_rows(rows_1, lambda: db.execute_query(
+            "SELECT id, email FROM users WHERE email = %s", ('a@example.com',), fetch='one')),
+        'execute_query.all_1k': with_rows(rows_1k, lambda: db.execute_query(
+            "SELECT * FROM cart_items WHERE user_id = %s", (1,), fetch=True)),
+        'execute_query.write': with_rows([], lambda: db.execute_query(
+            "UPDATE cart_items SET quantity = %s WHERE id = %s", (2, 1))),
+        'json.rows_10k': lambda: app.json.dumps(rows_10k),
+        'autocomplete.short_prefix': lambda: suggestions.search('e'),
+        'autocomplete.long_prefix': lambda: suggestions.search('event 123'),
+    }
+
+    def in_request(name, func, **kwargs):
+        def run():
+            with app.test_request_context(**kwargs):
+                return func()
+        benchmarks[name] = run
+
+    def uncached(func):
+        def run():
+            event_routes.catalog_cache.invalidate()
+            return func()
+        return run
+
+    # Without invalidating, every round after the first is a catalog_cache hit
+    in_request('route.get_events', with_rows(catalog_rows, uncached(event_routes.get_events)))
+    in_request('route.get_events.cached', with_rows(catalog_rows, event_routes.get_events))
+    in_request('route.get_cart', with_rows(cart_rows, event_routes.get_cart), headers=headers)
+    in_request('require_auth', authenticated, headers=headers)
+    return benchmarks
+
+def load_baseline(path):
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+def main():
+    """Main function"""
+    parser = argparse.ArgumentParser(description='Micro-benchmarks for the API hot paths')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE, help='Baseline file')
+    parser.add_argument('--save', action='store_true', help='Store the results as the new baseline')
+    parser.add_argument('--filter', help='Only run benchmarks whose name contains this text')
+    parser.add_argument('--min-time', type=float, default=0.5, help='Seconds spent measuring each benchmark')
+    parser.add_argument('--threshold', type=float, default=0.20,
+                        help='Slowdown (fraction of the baseline) reported as a regression')
+    args = parser.parse_args()
+
+    benchmarks = build_benchmarks()
+    baseline = load_baseline(args.baseline)
+    baseline_results = baseline['results'] if baseline else {}
+    if baseline:
+        print(f"\nBaseline: {args.baseline} ({baseline['created_at']}, Python {baseline['python']})")
+
+    print(f"\n{'benchmark':<28}{'median':>12}{'min':>12}{'base min':>12}{'change':>10}")
+    results = {}
+    regressions = []
+    for name, func in benchmarks.items():
+        if args.filter and args.filter not in name:
+            continue
+
+        rounds = measure(func, min_time=args.min_time)
+        results[name] = {'median': statistics.median(rounds), 'min': min(rounds)}
+
+        line = f"{name:<28}{results[name]['median'] * 1e6:>10.1f}us{results[name]['min'] * 1e6:>10.1f}us"
+        previous = baseline_results.get(name)
+        if previous:
+            # Compare the fastest rounds, the least affected by other processes
+            change = results[name]['min'] / previous['min'] - 1
+            line += f"{previous['min'] * 1e6:>10.1f}us{change * 100:>+9.1f}%"
+            if change > args.threshold:
+                regressions.append(name)
+                line += ' ⚠️'
+        print(line)
+
+    if args.save:
+        os.makedirs(os.path.dirname(args.baseline), exist_ok=True)
+        with open(args.baseline, 'w') as f:
+            json.dump({
+                'created_at': datetime.now().isoformat(timespec='seconds'),
+                'python': platform.python_version(),
+                'results': results
+            }, f, indent=2)
+        print(f"\n✅ Baseline saved to {args.baseline}")
+        return
+
+    if regressions:
+        print(f"\n❌ {len(regressions)} benchmark(s) slower than the baseline by more than "
+              f"{args.threshold * 100:.0f}%: {', '.join(regressions)}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,309 @@
+#!/usr/bin/env python3
+"""
+Query-plan regression check for the SQL embedded in the routes.
+
+Every query registered with register_query (by the route modules and the
+utils they import) and every SQL statement passed to db.execute_query,
+fetch_one, fetch_all, fetch_value, execute or stream in the route modules
+is extracted, prepared against a database filled with
+generate_data.py and explained with representative parameter values. A
+query fails when it reads a large table with a sequential scan or when its
+estimated cost exceeds its budget. With a baseline (--save), full scans
+already accepted there are only reported, and the budget becomes the
+baseline cost plus --threshold; without one it is --max-cost.
+
+    python check_query_plans.py --database-url postgresql://postgres@localhost:5432/tickets --save
+    python check_query_plans.py --database-url postgresql://postgres@localhost:5432/tickets
+    python check_query_plans.py --filter admin_routes --verbose
+"""
+import argparse
+import ast
+import importlib
+import json
+import os
+import re
+import sys
+from datetime import datetime
+import psycopg2
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from config import Config
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_BASELINE = os.path.join(BASE_DIR, 'benchmarks', 'query_plans.json')
+DEFAULT_MODULES = ['routes/event_routes.py', 'routes/admin_routes.py', 'routes/auth_routes.py']
+SQL_KEYWORDS = ('SELECT', 'INSERT', 'UPDATE', 'DELETE')
+# SupabaseDB methods (and cursor.execute) taking SQL as first argument
+QUERY_METHODS = ('execute_query', 'fetch_one', 'fetch_all', 'fetch_value', 'execute', 'stream')
+
+# Parameter values by Postgres type. Ids and page sizes get a small integer,
+# strings a frequent status, so lookups are planned as in production.
+SAMPLE_VALUES = {
+    'integer': '20',
+    'bigint': '20',
+    'smallint': '20',
+    'numeric': '50',
+    'character varying': 'completed',
+    'text': 'completed',
+    'date': '2026-06-01',
+    'time without time zone': '20:00',
+    'timestamp without time zone': '2026-06-01 20:00',
+    'timestamp with time zone': '2026-06-01 20:00',
+    'boolean': 'true',
+    'jsonb': '{}',
+}
+
+def is_sql(text):
+    """Same test SupabaseDB.execute_query uses to tell SQL from a table name"""
+    return ' ' in text and any(keyword in text.upper() for keyword in SQL_KEYWORDS)
+
+def _string_value(node):
+    if isinstance(node, ast.Constant) and isinstance(node.value, str):
+        return node.value
+    return None
+
+def _query_pieces(function):
+    """Map each variable of a function to the string constants assigned or appended to it"""
+    pieces = {}
+    for node in ast.walk(function):
+        if isinstance(node, ast.Assign) and len(node.targets) == 1 and isinstance(node.targets[0], ast.Name):
+            value = _string_value(node.value)
+            if value is not None:
+                pieces.setdefault(node.targets[0].id, []).append((node.lineno, value))
+        elif isinstance(node, ast.AugAssign) and isinstance(node.target, ast.Name) and isinstance(node.op, ast.Add):
+            value = _string_value(node.value)
+            if value is not None:
+                pieces.setdefault(node.target.id, []).append((node.lineno, value))
+    return {name: ''.join(value for _, value in sorted(parts)) for name, parts in pieces.items()}
+
+def _module_name(path):
+    return os.path.splitext(os.path.relpath(path, BASE_DIR))[0].replace(os.sep, '.')
+
+def _is_registered(node, namespace):
+    """Whether an argument names a registered query, e.g. CART_QUERY or seat_map.CART_HOLD_QUERY"""
+    from utils.db import Query
+    attributes = []
+    while isinstance(node, ast.Attribute):
+        attributes.insert(0, node.attr)
+        node = node.value
+    if not isinstance(node, ast.Name) or node.id not in namespace:
+        return False
+    value = namespace[node.id]
+    for attribute in attributes:
+        value = getattr(value, attribute, None)
+    return isinstance(value, Query)
+
+def extract_queries(path):
+    """
+    Return [{'key', 'line', 'sql'}] for every call of a QUERY_METHODS method
+    with SQL in a module. Queries built with += are taken with every optional
+    clause appended; f-strings and other dynamic SQL are returned with
+    sql=None. Registered queries are left to registered_queries_to_check().
+    """
+    with open(path, encoding='utf-8') as f:
+        tree = ast.parse(f.read(), filename=path)
+
+    module = os.path.splitext(os.path.basename(path))[0]
+    namespace = vars(importlib.import_module(_module_name(path)))
+    queries = []
+    for function in ast.walk(tree):
+        if not isinstance(function, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            continue
+        calls = [node for node in ast.walk(function)
+                 if isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute)
+                 and node.func.attr in QUERY_METHODS and node.args]
+        if not calls:
+            continue
+
+        variables = _query_pieces(function)
+        for number, call in enumerate(sorted(calls, key=lambda c: c.lineno), 1):
+            argument = call.args[0]
+            if _is_registered(argument, namespace):
+                continue
+            sql = _string_value(argument)
+            if sql is None and isinstance(argument, ast.Name):
+                sql = variables.get(argument.id)
+            if sql is not None and not is_sql(sql):
+                continue  # Supabase table access, not SQL
+            queries.append({
+                'key': f"{module}.{function.name}#{number}",
+                'line': call.lineno,
+                'sql': ' '.join(sql.split()) if sql else None
+            })
+    return sorted(queries, key=lambda q: q['line'])
+
+def registered_queries_to_check(modules):
+    """
+    Return [{'key', 'line', 'sql'}] for the queries registered once the given
+    modules are imported, keyed query:<name>
+    """
+    for module in modules:
+        importlib.import_module(_module_name(os.path.join(BASE_DIR, module)))
+    from utils.db import registered_queries
+    return [
+        {'key': f"query:{name}", 'line': None, 'sql': ' '.join(query.split())}
+        for name, query in sorted(registered_queries().items())
+    ]
+
+def to_prepared(sql):
+    """Turn psycopg2 %s placeholders into $1..$n, returning the SQL and the parameter count"""
+    count = 0
+
+    def placeholder(match):
+        nonlocal count
+        if match.group(0) == '%%':
+            return '%'
+        count += 1
+        return f"${count}"
+
+    return re.sub(r'%%|%s', placeholder, sql), count
+
+def large_tables(cursor, min_rows):
+    """Tables whose planner row estimate is at least min_rows"""
+    cursor.execute("""
+        SELECT relname FROM pg_class
+        WHERE relkind IN ('r', 'p') AND relnamespace = 'public'::regnamespace AND reltuples >= %s
+    """, (min_rows,))
+    return {row[0] for row in cursor.fetchall()}
+
+def explain(cursor, sql):
+    """Prepare a query and return its JSON plan for representative parameter values"""
+    prepared, count = to_prepared(sql)
+    cursor.execute("DEALLOCATE ALL")
+    cursor.execute(f"PREPARE plan_check AS {prepared}")
+    values = []
+    if count:
+        cursor.execute("SELECT parameter_types::text[] FROM pg_prepared_statements WHERE name = 'plan_check'")
+        values = [SAMPLE_VALUES.get(pg_type) for pg_type in cursor.fetchone()[0]]
+    placeholders = f"({', '.join(['%s'] * count)})" if count else ''
+    cursor.execute(f"EXPLAIN (FORMAT JSON) EXECUTE plan_check{placeholders}", values)
+    return cursor.fetchone()[0][0]['Plan']
+
+def scanned_tables(plan):
+    """Relations read with a sequential scan anywhere in the plan"""
+    tables = set()
+    if plan['Node Type'] == 'Seq Scan':
+        tables.add(plan['Relation Name'])
+    for child in plan.get('Plans', []):
+        tables |= scanned_tables(child)
+    return tables
+
+def describe(plan, depth=0):
+    """Indented one line per node, like EXPLAIN's text format"""
+    relation = f" on {plan['Relation Name']}" if 'Relation Name' in plan else ''
+    index = f" using {plan['Index Name']}" if 'Index Name' in plan else ''
+    lines = [f"{'  ' * depth}-> {plan['Node Type']}{index}{relation}  (cost={plan['Total Cost']:.0f} rows={plan['Plan Rows']})"]
+    for child in plan.get('Plans', []):
+        lines.extend(describe(child, depth + 1))
+    return lines
+
+def load_baseline(path):
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+def main():
+    """Main function"""
+    parser = argparse.ArgumentParser(description='Check the query plans of the SQL in the routes')
+    parser.add_argument('--database-url', default=Config.DATABASE_URL,
+                        help='Database filled with generate_data.py (default DATABASE_URL)')
+    parser.add_argument('--modules', nargs='+', default=DEFAULT_MODULES, help='Route modules to scan')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE, help='Baseline file')
+    parser.add_argument('--save', action='store_true', help='Store the current plans as the new baseline')
+    parser.add_argument('--filter', help='Only check queries whose key contains this text')
+    parser.add_argument('--large-table-rows', type=int, default=10000,
+                        help='Tables with at least this many rows must not be scanned sequentially')
+    parser.add_argument('--max-cost', type=float, default=10000,
+                        help='Cost budget of queries missing from the baseline')
+    parser.add_argument('--threshold', type=float, default=0.25,
+                        help='Cost increase (fraction of the baseline) reported as a regression')
+    parser.add_argument('--verbose', action='store_true', help='Print every plan')
+    args = parser.parse_args()
+
+    queries = registered_queries_to_check(args.modules)
+    for module in args.modules:
+        queries.extend(extract_queries(os.path.join(BASE_DIR, module)))
+    if args.filter:
+        queries = [q for q in queries if args.filter in q['key']]
+
+    baseline = load_baseline(args.baseline)
+    baseline_results = baseline['results'] if baseline else {}
+    if baseline:
+        print(f"\nBaseline: {args.baseline} ({baseline['created_at']})")
+
+    conn = psycopg2.connect(args.database_url)
+    conn.set_session(readonly=True)
+    results = {}
+    failures = []
+    skipped = []
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("SET plan_cache_mode = force_custom_plan")
+            large = large_tables(cursor, args.large_table_rows)
+            print(f"Large tables (>= {args.large_table_rows} rows): {', '.join(sorted(large)) or 'none'}")
+            print(f"\n{'query':<44}{'cost':>12}{'base cost':>12}  full scans")
+
+            for query in queries:
+                if not query['sql']:
+                    skipped.append(query['key'])
+                    continue
+
+                try:
+                    plan = explain(cursor, query['sql'])
+                except psycopg2.Error as e:
+                    conn.rollback()
+                    cursor.execute("SET plan_cache_mode = force_custom_plan")
+                    failures.append(query['key'])
+                    print(f"{query['key']:<44}  ❌ {str(e).strip().splitlines()[0]}")
+                    continue
+
+                full_scans = sorted(scanned_tables(plan) & large)
+                results[query['key']] = {'cost': plan['Total Cost'], 'full_scans': full_scans, 'sql': query['sql']}
+
+                previous = baseline_results.get(query['key'])
+                budget = previous['cost'] * (1 + args.threshold) if previous else args.max_cost
+                accepted = set(previous['full_scans']) if previous else set()
+                problems = []
+                if set(full_scans) - accepted:
+                    problems.append('new full scan' if previous else 'full scan')
+                if plan['Total Cost'] > budget:
+                    problems.append(f"over budget ({budget:.0f})")
+
+                line = f"{query['key']:<44}{plan['Total Cost']:>12.0f}"
+                line += f"{previous['cost']:>12.0f}" if previous else f"{'-':>12}"
+                line += f"  {', '.join(full_scans) or '-'}"
+                if problems and not args.save:
+                    failures.append(query['key'])
+                    line += f"  ❌ {'; '.join(problems)}"
+                elif full_scans:
+                    line += '  ⚠️'
+                print(line)
+                if args.verbose or (problems and not args.save):
+                    print(f"    {'line ' + str(query['line']) if query['line'] else 'registered'}: {query['sql'][:110]}")
+                    for plan_line in describe(plan):
+                        print(f"    {plan_line}")
+    finally:
+        conn.rollback()
+        conn.close()
+
+    if skipped:
+        print(f"\n⚠️ Dynamic SQL not checked: {', '.join(skipped)}")
+
+    if args.save:
+        os.makedirs(os.path.dirname(args.baseline), exist_ok=True)
+        with open(args.baseline, 'w') as f:
+            json.dump({
+                'created_at': datetime.now().isoformat(timespec='seconds'),
+                'results': results
+            }, f, indent=2)
+        print(f"\n✅ Baseline saved to {args.baseline}")
+        return
+
+    if failures:
+        print(f"\n❌ {len(failures)} of {len(queries)} queries failed the plan check: {', '.join(failures)}")
+        sys.exit(1)
+    print(f"\n✅ {len(results)} query plans within budget")
+
+if __name__ == "__main__":
+    main()
@@ -15,7 +15,22 @@ class Config:
     SUPABASE_DB_PASSWORD = os.getenv('SUPABASE_DB_PASSWORD', 'your_db_password')
     SUPABASE_DB_NAME = "postgres"
     
-    DATABASE_URL = f"postgresql://{SUPABASE_DB_USER}:{SUPABASE_DB_PASSWORD}@{SUPABASE_DB_HOST}:{SUPABASE_DB_PORT}/{SUPABASE_DB_NAME}"
+    DATABASE_URL = os.getenv('DATABASE_URL', f"postgresql://{SUPABASE_DB_USER}:{SUPABASE_DB_PASSWORD}@{SUPABASE_DB_HOST}:{SUPABASE_DB_PORT}/{SUPABASE_DB_NAME}")
+    DB_TRANSACTION_POOL_MAX = int(os.getenv('DB_TRANSACTION_POOL_MAX', 10))  # connections for db.transaction(), per process
+    
+    # Read replicas (comma-separated DSNs) for read-only queries
+    DATABASE_REPLICA_URLS = [url.strip() for url in os.getenv('DATABASE_REPLICA_URLS', '').split(',') if url.strip()]
+    REPLICA_MAX_LAG_SECONDS = float(os.getenv('REPLICA_MAX_LAG_SECONDS', 5))  # replicas further behind are skipped
+    REPLICA_LAG_CHECK_INTERVAL = float(os.getenv('REPLICA_LAG_CHECK_INTERVAL', 5))  # seconds between lag checks
+    REPLICA_STICKY_SECONDS = float(os.getenv('REPLICA_STICKY_SECONDS', 30))  # a user's reads stay on the primary this long after they write
+    
+    # Server-side prepared statements for registered hot queries. They live in
+    # the database session: disable behind the Supabase transaction pooler (port 6543)
+    PREPARED_STATEMENTS_ENABLED = os.getenv('PREPARED_STATEMENTS_ENABLED', 'true').lower() == 'true'
+
+    # Streaming large results from server-side cursors (db.stream)
+    DB_STREAM_FETCH_SIZE = int(os.getenv('DB_STREAM_FETCH_SIZE', 2000))  # rows per round trip
+    DB_STREAM_MIN_ROWS = int(os.getenv('DB_STREAM_MIN_ROWS', 500))  # admin pages this large are streamed instead of built in memory
     
     # Flask Configuration
     SECRET_KEY = os.getenv('SECRET_KEY', 'your-secret-key-change-in-production')
@@ -25,6 +40,90 @@ class Config:
     PAYPAL_CLIENT_ID = os.getenv('PAYPAL_CLIENT_ID', 'your_paypal_client_id')
     PAYPAL_SECRET = os.getenv('PAYPAL_SECRET', 'your_paypal_secret')
     PAYPAL_MODE = os.getenv('PAYPAL_MODE', 'sandbox')  # 'sandbox' or 'live'
+    PAYPAL_RETURN_URL = os.getenv('PAYPAL_RETURN_URL', 'http://localhost:3000/payment/success')
+    PAYPAL_CANCEL_URL = os.getenv('PAYPAL_CANCEL_URL', 'http://localhost:3000/payment/cancel')
+    PAYPAL_WEBHOOK_ID = os.getenv('PAYPAL_WEBHOOK_ID', '')
+    PAYPAL_TIMEOUT = float(os.getenv('PAYPAL_TIMEOUT', 10))  # seconds per HTTP call
+
+    # Payment Gateway Configuration
+    PAYMENT_GATEWAY = os.getenv('PAYMENT_GATEWAY', 'paypal')  # 'paypal' or 'fake' (load testing only)
+    FAKE_GATEWAY_LATENCY_MS = float(os.getenv('FAKE_GATEWAY_LATENCY_MS', 0))
+    FAKE_GATEWAY_LATENCY_JITTER_MS = float(os.getenv('FAKE_GATEWAY_LATENCY_JITTER_MS', 0))
+    FAKE_GATEWAY_ERROR_RATE = float(os.getenv('FAKE_GATEWAY_ERROR_RATE', 0))
+    FAKE_GATEWAY_APPROVAL = os.getenv('FAKE_GATEWAY_APPROVAL', 'approve')  # 'approve', 'decline' or 'cancel'
+
+    # Payment Gateway Protection (circuit breaker + bulkhead)
+    PAYMENT_BREAKER_FAILURE_RATE = float(os.getenv('PAYMENT_BREAKER_FAILURE_RATE', 0.5))
+    PAYMENT_BREAKER_SLOW_CALL_MS = float(os.getenv('PAYMENT_BREAKER_SLOW_CALL_MS', 5000))
+    PAYMENT_BREAKER_SLOW_CALL_RATE = float(os.getenv('PAYMENT_BREAKER_SLOW_CALL_RATE', 0.5))
+    PAYMENT_BREAKER_WINDOW = int(os.getenv('PAYMENT_BREAKER_WINDOW', 20))
+    PAYMENT_BREAKER_MIN_CALLS = int(os.getenv('PAYMENT_BREAKER_MIN_CALLS', 10))
+    PAYMENT_BREAKER_OPEN_SECONDS = float(os.getenv('PAYMENT_BREAKER_OPEN_SECONDS', 30))
+    PAYMENT_BREAKER_HALF_OPEN_CALLS = int(os.getenv('PAYMENT_BREAKER_HALF_OPEN_CALLS', 3))
+    PAYMENT_BULKHEAD_MAX_CONCURRENT = int(os.getenv('PAYMENT_BULKHEAD_MAX_CONCURRENT', 10))
+    PAYMENT_BULKHEAD_MAX_WAIT = float(os.getenv('PAYMENT_BULKHEAD_MAX_WAIT', 0.5))  # seconds
+
+    # Payment Queue Configuration
+    # When enabled, checkout and payment execution return immediately and the
+    # PayPal calls run in background workers.
+    PAYMENT_QUEUE_ENABLED = os.getenv('PAYMENT_QUEUE_ENABLED', 'false').lower() == 'true'
+    PAYMENT_QUEUE_PATH = os.getenv('PAYMENT_QUEUE_PATH', 'payment_jobs.sqlite3')  # ':memory:' for in-process only
+    PAYMENT_QUEUE_WORKERS = int(os.getenv('PAYMENT_QUEUE_WORKERS', 4))
+    PAYMENT_QUEUE_MAX_ATTEMPTS = int(os.getenv('PAYMENT_QUEUE_MAX_ATTEMPTS', 3))
+    PAYMENT_STATUS_MAX_WAIT = int(os.getenv('PAYMENT_STATUS_MAX_WAIT', 25))  # seconds
+
+    # Payment Reconciliation Configuration
+    RECONCILE_STALE_MINUTES = int(os.getenv('RECONCILE_STALE_MINUTES', 15))
+    RECONCILE_EXPIRE_HOURS = int(os.getenv('RECONCILE_EXPIRE_HOURS', 3))  # unapproved PayPal payments expire
+    RECONCILE_BATCH_SIZE = int(os.getenv('RECONCILE_BATCH_SIZE', 200))
+    RECONCILE_CONCURRENCY = int(os.getenv('RECONCILE_CONCURRENCY', 16))
+
+    # Waiting Room Configuration (flash sales)
+    WAITING_ROOM_ENABLED = os.getenv('WAITING_ROOM_ENABLED', 'false').lower() == 'true'
+    WAITING_ROOM_EVENT_IDS = os.getenv('WAITING_ROOM_EVENT_IDS', '')  # comma separated, empty = all events
+    WAITING_ROOM_ADMIT_RATE = float(os.getenv('WAITING_ROOM_ADMIT_RATE', 50))  # buyers per second per worker
+    WAITING_ROOM_ADMIT_BURST = int(os.getenv('WAITING_ROOM_ADMIT_BURST', 100))
+    WAITING_ROOM_ADMISSION_TTL = int(os.getenv('WAITING_ROOM_ADMISSION_TTL', 600))  # seconds
+    WAITING_ROOM_QUEUE_TOKEN_TTL = int(os.getenv('WAITING_ROOM_QUEUE_TOKEN_TTL', 3600))  # seconds a place in the queue is kept
+    WAITING_ROOM_SECRET = os.getenv('WAITING_ROOM_SECRET', JWT_SECRET_KEY)
+    
+    # Reserved Seating Configuration
+    SEAT_HOLD_TTL = int(os.getenv('SEAT_HOLD_TTL', 600))  # seconds a seat hold lasts
+    SEAT_INDEX_TTL = int(os.getenv('SEAT_INDEX_TTL', 5))  # seconds before best-available search reloads seat state
+    SEAT_BEST_MAX_QUANTITY = int(os.getenv('SEAT_BEST_MAX_QUANTITY', 20))  # largest block best-available will search for
+
+    # Live Availability Stream Configuration (Server-Sent Events)
+    AVAILABILITY_POLL_INTERVAL = float(os.getenv('AVAILABILITY_POLL_INTERVAL', 2))  # seconds between reads of watched events
+    AVAILABILITY_MIN_INTERVAL = float(os.getenv('AVAILABILITY_MIN_INTERVAL', 0.25))  # local sales wake the feed at most this often
+    AVAILABILITY_HEARTBEAT = int(os.getenv('AVAILABILITY_HEARTBEAT', 15))  # seconds between keep-alive comments
+    AVAILABILITY_STREAM_MAX_SECONDS = int(os.getenv('AVAILABILITY_STREAM_MAX_SECONDS', 600))  # clients reconnect after this
+    AVAILABILITY_QUEUE_SIZE = int(os.getenv('AVAILABILITY_QUEUE_SIZE', 20))  # pending messages per viewer
+
+    # Order Partitioning Configuration (migration 005)
+    ORDER_PARTITIONS_AHEAD = int(os.getenv('ORDER_PARTITIONS_AHEAD', 3))  # months created in advance
+    ORDER_RETENTION_MONTHS = int(os.getenv('ORDER_RETENTION_MONTHS', 24))  # older months are archived
+    ORDER_ARCHIVE_DIR = os.getenv('ORDER_ARCHIVE_DIR', 'archive')
+
+    # Event Search Configuration (migration 007)
+    SEARCH_MAX_QUERY_LENGTH = int(os.getenv('SEARCH_MAX_QUERY_LENGTH', 100))
+    SEARCH_MAX_PER_PAGE = int(os.getenv('SEARCH_MAX_PER_PAGE', 50))
+    AUTOCOMPLETE_MAX_RESULTS = int(os.getenv('AUTOCOMPLETE_MAX_RESULTS', 10))
+    AUTOCOMPLETE_INDEX_TTL = int(os.getenv('AUTOCOMPLETE_INDEX_TTL', 300))  # seconds before a worker rebuilds its index
+
+    # Catalog Read Cache (GET /api/events and /api/events/<id>)
+    CATALOG_CACHE_TTL = float(os.getenv('CATALOG_CACHE_TTL', 2))  # seconds a response is served without querying
+    CATALOG_CACHE_STALE_TTL = float(os.getenv('CATALOG_CACHE_STALE_TTL', 5))  # seconds past that it is served while one request refreshes it
+    CATALOG_CACHE_MAX_ENTRIES = int(os.getenv('CATALOG_CACHE_MAX_ENTRIES', 5000))
+
+    # Async Mode Configuration (asgi.py)
+    ASYNC_DB_POOL_MIN = int(os.getenv('ASYNC_DB_POOL_MIN', 2))
+    ASYNC_DB_POOL_MAX = int(os.getenv('ASYNC_DB_POOL_MAX', 20))  # connections per process, shared by every async request
+
+    # Catalog Change Notifications (migration 008)
+    # LISTEN needs a direct session: on Supabase use the direct connection or
+    # the session pooler (port 5432), not the transaction pooler
+    CHANGE_NOTIFICATIONS_ENABLED = os.getenv('CHANGE_NOTIFICATIONS_ENABLED', 'true').lower() == 'true'
+    CHANGE_NOTIFICATIONS_URL = os.getenv('CHANGE_NOTIFICATIONS_URL', DATABASE_URL)
     
     # Environment
     FLASK_ENV = os.getenv('FLASK_ENV', 'development')
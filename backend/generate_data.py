@@ -0,0 +1,338 @@
+#!/usr/bin/env python3
+"""
+Synthetic data generator for benchmarks.
+
+Streams production-size tables into PostgreSQL with COPY, several chunks in
+parallel. The output is deterministic for a given --seed on an empty
+database: every chunk gets its own random generator and explicit ids.
+
+    python generate_data.py --events 100000 --tiers 10 --users 1000000 --orders 10000000 --workers 8
+
+Data is skewed like real sales: a few events get most of the orders, prices
+vary by event and tier, most orders complete and are placed in the weeks
+before the event.
+"""
+import argparse
+import io
+import math
+import sys
+import os
+import random
+import time
+from datetime import date, datetime, timedelta
+from multiprocessing import Pool
+import psycopg2
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from config import Config
+
+# Password of every generated user: password123
+PASSWORD_HASH = '$2b$12$2XLb1ZWnVeRG4QwFLl.L9uG.15nGXWqBjsAVRNAbAtOWkiEcLHOQC'
+EVENT_TIMES = ['18:00:00', '19:00:00', '19:30:00', '20:00:00', '20:30:00', '21:00:00', '10:00:00']
+TIER_NAMES = ['General', 'Preferencia', 'Platea', 'Palco', 'VIP', 'Balcón', 'Grada Norte',
+              'Grada Sur', 'Campo', 'Mesa']
+CITIES = ['San Salvador', 'Santa Ana', 'San Miguel', 'La Libertad', 'Sonsonate',
+          'Ahuachapán', 'Usulután', 'Chalatenango']
+WORDS = ['Noche', 'Festival', 'Concierto', 'Gira', 'Clásico', 'Rock', 'Sinfonía', 'Tributo',
+         'Gran', 'Final', 'Electrónica', 'Acústico', 'Verano', 'Leyendas', 'En Vivo', 'Tour']
+ORDER_STATUSES = [('completed', 0.85), ('cancelled', 0.08), ('pending', 0.05), ('refunded', 0.02)]
+MAX_ITEMS_PER_ORDER = 4
+# Fixed reference date, so the same seed always produces the same dates
+TODAY = date(2026, 1, 1)
+
+def _mix(*values):
+    """Deterministic 64-bit hash of integers (splitmix64 finalizer)"""
+    x = 0x9E3779B97F4A7C15
+    for value in values:
+        x = (x ^ value) * 0xBF58476D1CE4E5B9 & 0xFFFFFFFFFFFFFFFF
+        x = (x ^ (x >> 31)) * 0x94D049BB133111EB & 0xFFFFFFFFFFFFFFFF
+    return x ^ (x >> 29)
+
+def _uniform(*values):
+    """Deterministic float in [0, 1) for the given integers"""
+    return _mix(*values) / 2.0 ** 64
+
+def tier_price(seed, event, tier):
+    """Price of a ticket tier, derived from the event and tier so any process can recompute it"""
+    base = 10 + 90 * _uniform(seed, 1, event) ** 2
+    return round(base * (1 + tier * 0.6), 2)
+
+def _copy(cursor, table, columns, rows):
+    buffer = io.StringIO()
+    for row in rows:
+        buffer.write('\t'.join('\\N' if value is None else str(value) for value in row))
+        buffer.write('\n')
+    buffer.seek(0)
+    cursor.copy_expert(f"COPY {table} ({', '.join(columns)}) FROM STDIN", buffer)
+
+def _pick_status(rnd):
+    roll = rnd.random()
+    for status, share in ORDER_STATUSES:
+        if roll < share:
+            return status
+        roll -= share
+    return ORDER_STATUSES[0][0]
+
+def _title(rnd):
+    return ' '.join(rnd.choice(WORDS) for _ in range(rnd.randint(2, 4)))
+
+def gen_venues(rnd, plan, first, count):
+    for venue_id in range(first, first + count):
+        yield (venue_id, f'Recinto {venue_id}', f'Calle {rnd.randint(1, 200)} #{rnd.randint(1, 999)}',
+               rnd.choice(CITIES), rnd.choice([500, 1500, 2000, 5000, 12000, 50000]))
+
+def gen_artists(rnd, plan, first, count):
+    for artist_id in range(first, first + count):
+        yield (artist_id, f'Artista {artist_id}', f'Biografía del artista {artist_id}', None)
+
+def gen_users(rnd, plan, first, count):
+    registered = datetime(2022, 1, 1)
+    for user_id in range(first, first + count):
+        yield (user_id, f'user{user_id}@example.com', PASSWORD_HASH, f'Usuario {user_id}', 'user',
+               registered + timedelta(minutes=rnd.randint(0, 4 * 365 * 24 * 60)))
+
+def event_date(seed, event):
+    """Date of an event: most are in the past, upcoming ones cluster in the next months"""
+    if _uniform(seed, 2, event) < 0.7:
+        return TODAY - timedelta(days=int(3 * 365 * _uniform(seed, 3, event)))
+    return TODAY + timedelta(days=int(365 * _uniform(seed, 3, event) ** 2))
+
+def gen_events(rnd, plan, first, count):
+    seed = plan['seed']
+    for event in range(first, first + count):
+        day = event_date(seed, event)
+        if day < TODAY:
+            status = 'completed'
+        else:
+            status = 'cancelled' if rnd.random() < 0.03 else 'active'
+        yield (event, _title(rnd), f'Descripción del evento {event}', day, rnd.choice(EVENT_TIMES),
+               rnd.choice(plan['event_type_ids']),
+               plan['venue_base'] + rnd.randint(1, plan['venues']),
+               plan['artist_base'] + rnd.randint(1, plan['artists']),
+               None, status)
+
+def ticket_id(plan, event, tier):
+    return plan['ticket_base'] + (event - plan['event_base'] - 1) * plan['tiers'] + tier + 1
+
+def gen_tickets(rnd, plan, first, count):
+    # Chunks of tickets are generated per event: `first` and `count` are event ids
+    for event in range(first, first + count):
+        for tier in range(plan['tiers']):
+            yield (ticket_id(plan, event, tier), event, TIER_NAMES[tier % len(TIER_NAMES)],
+                   tier_price(plan['seed'], event, tier),
+                   rnd.choice([50, 100, 200, 500, 1000, 5000]), 0)
+
+def popular_event(rnd, plan):
+    """
+    Pick an event with a power-law skew (a few events sell most tickets),
+    scattering the popular ones over the id range.
+    """
+    rank = int(plan['events'] * rnd.random() ** plan['skew'])
+    return plan['event_base'] + 1 + (rank * 2654435761) % plan['events']
+
+def gen_orders(rnd, plan, first, count):
+    """Yields ('orders', row) and ('order_items', row) tuples"""
+    seed = plan['seed']
+    now = datetime.combine(TODAY, datetime.min.time())
+    for order_id in range(first, first + count):
+        event = popular_event(rnd, plan)
+        day = datetime.combine(event_date(seed, event), datetime.min.time())
+        ordered_at = min(day - timedelta(days=rnd.expovariate(1 / 20.0)), now) - timedelta(
+            minutes=rnd.randint(0, 24 * 60))
+        status = _pick_status(rnd)
+        items = min(int(rnd.expovariate(1.2)) + 1, MAX_ITEMS_PER_ORDER)
+        tiers = rnd.sample(range(plan['tiers']), min(items, plan['tiers']))
+
+        total = 0
+        rows = []
+        for k, tier in enumerate(tiers):
+            quantity = min(int(rnd.expovariate(0.6)) + 1, 8)
+            price = tier_price(seed, event, tier)
+            total += price * quantity
+            rows.append(((order_id - plan['order_base'] - 1) * MAX_ITEMS_PER_ORDER + plan['item_base'] + k + 1,
+                         order_id, ordered_at, ticket_id(plan, event, tier), quantity, price, ordered_at))
+
+        payment = f'PAY-GEN-{order_id}' if status != 'pending' else None
+        yield 'orders', (order_id, plan['user_base'] + rnd.randint(1, plan['users']), ordered_at, status,
+                         round(total, 2), payment, f'PAYER{order_id % 100000}' if payment else None)
+        for row in rows:
+            yield 'order_items', row
+
+COLUMNS = {
+    'venues': ('id', 'name', 'address', 'city', 'capacity'),
+    'artists': ('id', 'name', 'bio', 'image_url'),
+    'users': ('id', 'email', 'hashed_password', 'name', 'role', 'registration_date'),
+    'events': ('id', 'title', 'description', 'event_date', 'event_time', 'type_id', 'venue_id',
+               'artist_id', 'image_url', 'status'),
+    'tickets': ('id', 'event_id', 'location', 'price', 'quantity_available', 'quantity_sold'),
+    'orders': ('id', 'user_id', 'order_date', 'status', 'total_amount', 'paypal_payment_id', 'paypal_payer_id'),
+    'order_items': ('id', 'order_id', 'order_date', 'ticket_id', 'quantity', 'price', 'created_at')
+}
+
+GENERATORS = {
+    'venues': gen_venues,
+    'artists': gen_artists,
+    'users': gen_users,
+    'events': gen_events,
+    'tickets': gen_tickets,
+    'orders': gen_orders
+}
+
+def load_chunk(task):
+    """Generate one chunk and COPY it in its own connection and transaction. Returns the rows loaded"""
+    table, chunk, first, count, plan = task
+    rnd = random.Random(f"{plan['seed']}:{table}:{chunk}")
+
+    conn = psycopg2.connect(plan['database_url'])
+    try:
+        with conn.cursor() as cursor:
+            rows = GENERATORS[table](rnd, plan, first, count)
+            if table == 'orders':
+                rows = list(rows)
+                _copy(cursor, 'orders', COLUMNS['orders'], (row for kind, row in rows if kind == 'orders'))
+                _copy(cursor, 'order_items', COLUMNS['order_items'],
+                      (row for kind, row in rows if kind == 'order_items'))
+            else:
+                _copy(cursor, table, COLUMNS[table], rows)
+        conn.commit()
+    finally:
+        conn.close()
+
+    if table == 'tickets':
+        return count * plan['tiers']
+    return count
+
+def _chunks(table, first, total, size, plan):
+    return [(table, i, first + i * size + 1, min(size, total - i * size), plan)
+            for i in range(int(math.ceil(total / float(size))))]
+
+def _max_id(cursor, table):
+    cursor.execute(f"SELECT COALESCE(MAX(id), 0) FROM {table}")
+    return cursor.fetchone()[0]
+
+def prepare(conn, args):
+    """Read id offsets and reference data. Returns the plan shared with the workers"""
+    with conn.cursor() as cursor:
+        if args.truncate:
+            print("🗑️  Truncating orders, tickets, events, artists, venues and users...")
+            cursor.execute("""
+                TRUNCATE order_items, orders, cart_items, tickets, events, artists, venues,
+                         event_summary_deltas
+                RESTART IDENTITY CASCADE
+            """)
+            cursor.execute("DELETE FROM users WHERE role = 'user'")
+        conn.commit()
+
+        cursor.execute("SELECT id FROM event_types ORDER BY id")
+        event_type_ids = [row[0] for row in cursor.fetchall()]
+        if not event_type_ids:
+            raise RuntimeError('event_types is empty, run migrate.py first')
+
+        # Orders go back a little over three years, give every month its partition
+        cursor.execute("SELECT create_order_partitions(%s, %s)", (TODAY - timedelta(days=4 * 365), TODAY))
+        conn.commit()
+
+        plan = {
+            'seed': args.seed,
+            'database_url': args.database_url,
+            'event_type_ids': event_type_ids,
+            'venues': args.venues or max(args.events // 100, 10),
+            'artists': args.artists or max(args.events // 20, 10),
+            'users': args.users,
+            'events': args.events,
+            'tiers': args.tiers,
+            'orders': args.orders,
+            'skew': args.skew
+        }
+        for table in ('venues', 'artists', 'users', 'events', 'tickets', 'orders'):
+            plan[table.rstrip('s') + '_base'] = _max_id(cursor, table)
+        plan['item_base'] = _max_id(cursor, 'order_items')
+    return plan
+
+def finish(conn, plan):
+    """Make sold counters match completed orders, move sequences past the new ids, analyze"""
+    with conn.cursor() as cursor:
+        print("🔢 Updating sold counters...")
+        cursor.execute("""
+            UPDATE tickets t
+            SET quantity_sold = s.sold,
+                quantity_available = GREATEST(t.quantity_available, s.sold)
+            FROM (
+                SELECT oi.ticket_id, SUM(oi.quantity) as sold
+                FROM order_items oi
+                JOIN orders o ON oi.order_id = o.id AND oi.order_date = o.order_date
+                WHERE o.status = 'completed' AND oi.ticket_id > %s
+                GROUP BY oi.ticket_id
+            ) s
+            WHERE t.id = s.ticket_id
+        """, (plan['ticket_base'],))
+
+        print("📋 Refreshing event summaries...")
+        cursor.execute("SELECT refresh_event_summaries()")
+
+        for table in ('venues', 'artists', 'users', 'events', 'tickets', 'orders', 'order_items'):
+            cursor.execute(f"""
+                SELECT setval(pg_get_serial_sequence('{table}', 'id'), GREATEST(MAX(id), 1))
+                FROM {table}
+            """)
+        conn.commit()
+
+    print("📊 Analyzing tables...")
+    conn.autocommit = True
+    with conn.cursor() as cursor:
+        for table in ('venues', 'artists', 'users', 'events', 'tickets', 'orders', 'order_items', 'event_summaries',
+                      'event_search'):
+            cursor.execute(f"ANALYZE {table}")
+
+def main():
+    """Main function"""
+    parser = argparse.ArgumentParser(description='Generate synthetic data with COPY')
+    parser.add_argument('--database-url', default=Config.DATABASE_URL)
+    parser.add_argument('--events', type=int, default=1000)
+    parser.add_argument('--tiers', type=int, default=10, help='Ticket tiers per event')
+    parser.add_argument('--users', type=int, default=10000)
+    parser.add_argument('--orders', type=int, default=50000, help='Orders (1-4 items each)')
+    parser.add_argument('--venues', type=int, help='Default: events / 100')
+    parser.add_argument('--artists', type=int, help='Default: events / 20')
+    parser.add_argument('--skew', type=float, default=3.0,
+                        help='Popularity skew of events for orders (1 = uniform)')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 4, help='Parallel COPY connections')
+    parser.add_argument('--chunk-size', type=int, default=50000, help='Rows per COPY')
+    parser.add_argument('--truncate', action='store_true',
+                        help='Delete existing events, orders, tickets, venues, artists and users first')
+    args = parser.parse_args()
+
+    conn = psycopg2.connect(args.database_url)
+    try:
+        plan = prepare(conn, args)
+    except Exception as e:
+        print(f"❌ Error preparing the database: {e}")
+        sys.exit(1)
+
+    # Tables are loaded in dependency order, the chunks of each phase in parallel
+    events_per_chunk = max(args.chunk_size // args.tiers, 1)
+    orders_per_chunk = max(args.chunk_size // 2, 1)
+    phases = [
+        ('venues, artists, users',
+         _chunks('venues', plan['venue_base'], plan['venues'], args.chunk_size, plan)
+         + _chunks('artists', plan['artist_base'], plan['artists'], args.chunk_size, plan)
+         + _chunks('users', plan['user_base'], plan['users'], args.chunk_size, plan)),
+        ('events', _chunks('events', plan['event_base'], plan['events'], args.chunk_size, plan)),
+        ('tickets', _chunks('tickets', plan['event_base'], plan['events'], events_per_chunk, plan)),
+        ('orders', _chunks('orders', plan['order_base'], plan['orders'], orders_per_chunk, plan))
+    ]
+
+    started = time.time()
+    with Pool(args.workers) as pool:
+        for name, tasks in phases:
+            phase_started = time.time()
+            rows = sum(pool.imap_unordered(load_chunk, tasks))
+            print(f"✅ {name}: {rows} rows in {time.time() - phase_started:.1f}s")
+
+    finish(conn, plan)
+    conn.close()
+    print(f"🎉 Done in {time.time() - started:.1f}s")
+
+if __name__ == "__main__":
+    main()
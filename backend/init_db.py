@@ -7,132 +7,18 @@ y datos de ejemplo para la aplicación EventTickets
 import os
 import sys
 from utils.db import supabase_db
+from utils.migrations import migrate
 from config import Config
 
 def create_tables():
-    """Crear todas las tablas necesarias"""
-    
-    # SQL para crear las tablas
-    create_tables_sql = """
-    -- Crear tabla de usuarios
-    CREATE TABLE IF NOT EXISTS users (
-        id SERIAL PRIMARY KEY,
-        email VARCHAR(255) UNIQUE NOT NULL,
-        password_hash VARCHAR(255) NOT NULL,
-        first_name VARCHAR(100) NOT NULL,
-        last_name VARCHAR(100) NOT NULL,
-        phone VARCHAR(20),
-        is_admin BOOLEAN DEFAULT FALSE,
-        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-    );
-
-    -- Crear tabla de tipos de eventos
-    CREATE TABLE IF NOT EXISTS event_types (
-        id SERIAL PRIMARY KEY,
-        name VARCHAR(100) NOT NULL,
-        description TEXT,
-        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-    );
-
-    -- Crear tabla de lugares/venues
-    CREATE TABLE IF NOT EXISTS venues (
-        id SERIAL PRIMARY KEY,
-        name VARCHAR(200) NOT NULL,
-        address TEXT NOT NULL,
-        city VARCHAR(100) NOT NULL,
-        state VARCHAR(100),
-        country VARCHAR(100) NOT NULL,
-        capacity INTEGER,
-        description TEXT,
-        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-    );
-
-    -- Crear tabla de artistas
-    CREATE TABLE IF NOT EXISTS artists (
-        id SERIAL PRIMARY KEY,
-        name VARCHAR(200) NOT NULL,
-        bio TEXT,
-        genre VARCHAR(100),
-        image_url TEXT,
-        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-    );
-
-    -- Crear tabla de eventos
-    CREATE TABLE IF NOT EXISTS events (
-        id SERIAL PRIMARY KEY,
-        title VARCHAR(200) NOT NULL,
-        description TEXT,
-        event_date TIMESTAMP NOT NULL,
-        event_type_id INTEGER REFERENCES event_types(id),
-        venue_id INTEGER REFERENCES venues(id),
-        artist_id INTEGER REFERENCES artists(id),
-        image_url TEXT,
-        status VARCHAR(20) DEFAULT 'active',
-        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-    );
-
-    -- Crear tabla de tipos de tickets
-    CREATE TABLE IF NOT EXISTS ticket_types (
-        id SERIAL PRIMARY KEY,
-        event_id INTEGER REFERENCES events(id) ON DELETE CASCADE,
-        name VARCHAR(100) NOT NULL,
-        description TEXT,
-        price DECIMAL(10,2) NOT NULL,
-        quantity_available INTEGER NOT NULL,
-        quantity_sold INTEGER DEFAULT 0,
-        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-    );
-
-    -- Crear tabla de carrito de compras
-    CREATE TABLE IF NOT EXISTS cart_items (
-        id SERIAL PRIMARY KEY,
-        user_id INTEGER REFERENCES users(id) ON DELETE CASCADE,
-        ticket_type_id INTEGER REFERENCES ticket_types(id) ON DELETE CASCADE,
-        quantity INTEGER NOT NULL DEFAULT 1,
-        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-    );
-
-    -- Crear tabla de órdenes
-    CREATE TABLE IF NOT EXISTS orders (
-        id SERIAL PRIMARY KEY,
-        user_id INTEGER REFERENCES users(id),
-        total_amount DECIMAL(10,2) NOT NULL,
-        status VARCHAR(20) DEFAULT 'pending',
-        payment_id VARCHAR(255),
-        payment_method VARCHAR(50),
-        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-    );
-
-    -- Crear tabla de items de órdenes
-    CREATE TABLE IF NOT EXISTS order_items (
-        id SERIAL PRIMARY KEY,
-        order_id INTEGER REFERENCES orders(id) ON DELETE CASCADE,
-        ticket_type_id INTEGER REFERENCES ticket_types(id),
-        quantity INTEGER NOT NULL,
-        unit_price DECIMAL(10,2) NOT NULL,
-        total_price DECIMAL(10,2) NOT NULL,
-        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-    );
-
-    -- Crear índices para mejorar performance
-    CREATE INDEX IF NOT EXISTS idx_events_date ON events(event_date);
-    CREATE INDEX IF NOT EXISTS idx_events_type ON events(event_type_id);
-    CREATE INDEX IF NOT EXISTS idx_events_venue ON events(venue_id);
-    CREATE INDEX IF NOT EXISTS idx_users_email ON users(email);
-    CREATE INDEX IF NOT EXISTS idx_orders_user ON orders(user_id);
-    CREATE INDEX IF NOT EXISTS idx_cart_user ON cart_items(user_id);
-    """
-    
+    """Crear las tablas aplicando las migraciones versionadas de migrations/"""
     try:
-        print("Creando tablas...")
-        supabase_db.execute_query(create_tables_sql)
-        print("✅ Tablas creadas exitosamente")
+        print("Aplicando migraciones...")
+        applied = migrate()
+        print(f"✅ Tablas al día ({len(applied)} migraciones aplicadas)")
         return True
     except Exception as e:
-        print(f"❌ Error creando tablas: {e}")
+        print(f"❌ Error aplicando migraciones: {e}")
         return False
 
 def create_admin_user():
@@ -144,8 +30,8 @@ def create_admin_user():
     password_hash = bcrypt.hashpw('admin123'.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
     
     insert_admin_sql = """
-    INSERT INTO users (email, password_hash, first_name, last_name, is_admin)
-    VALUES (%s, %s, %s, %s, %s)
+    INSERT INTO users (email, hashed_password, name, role)
+    VALUES (%s, %s, %s, %s)
     ON CONFLICT (email) DO NOTHING
     """
     
@@ -153,7 +39,7 @@ def create_admin_user():
         print("Creando usuario administrador...")
         supabase_db.execute_query(
             insert_admin_sql, 
-            ('admin@admin.com', password_hash, 'Admin', 'User', True)
+            ('admin@admin.com', password_hash, 'Administrator', 'admin')
         )
         print("✅ Usuario administrador creado: admin@admin.com / admin123")
         return True
@@ -178,26 +64,30 @@ def create_sample_data():
         ON CONFLICT DO NOTHING
         """
         
-        # Venues
+        # Venues (los nombres no son únicos, se omiten los que ya existen)
         venues_sql = """
-        INSERT INTO venues (name, address, city, country, capacity) VALUES
-        ('Teatro Nacional', 'Av. Principal 123', 'Ciudad de México', 'México', 2000),
-        ('Estadio Central', 'Calle Deportiva 456', 'Guadalajara', 'México', 50000),
-        ('Centro de Convenciones', 'Blvd. Empresarial 789', 'Monterrey', 'México', 5000),
-        ('Auditorio Municipal', 'Plaza Central 321', 'Puebla', 'México', 1500),
-        ('Arena Deportiva', 'Av. Olímpica 654', 'Tijuana', 'México', 15000)
-        ON CONFLICT DO NOTHING
+        INSERT INTO venues (name, address, city, capacity)
+        SELECT * FROM (VALUES
+        ('Teatro Nacional', 'Av. Principal 123', 'Ciudad de México', 2000),
+        ('Estadio Central', 'Calle Deportiva 456', 'Guadalajara', 50000),
+        ('Centro de Convenciones', 'Blvd. Empresarial 789', 'Monterrey', 5000),
+        ('Auditorio Municipal', 'Plaza Central 321', 'Puebla', 1500),
+        ('Arena Deportiva', 'Av. Olímpica 654', 'Tijuana', 15000)
+        ) AS v(name, address, city, capacity)
+        WHERE NOT EXISTS (SELECT 1 FROM venues WHERE venues.name = v.name)
         """
         
         # Artistas
         artists_sql = """
-        INSERT INTO artists (name, bio, genre) VALUES
-        ('Los Rockeros', 'Banda de rock mexicano con 20 años de trayectoria', 'Rock'),
-        ('María González', 'Cantante de música popular mexicana', 'Pop Latino'),
-        ('Compañía de Teatro Clásico', 'Grupo teatral especializado en obras clásicas', 'Teatro'),
-        ('Orquesta Sinfónica Nacional', 'La mejor orquesta del país', 'Clásica'),
-        ('DJ ElectroMex', 'DJ especializado en música electrónica', 'Electrónica')
-        ON CONFLICT DO NOTHING
+        INSERT INTO artists (name, bio)
+        SELECT * FROM (VALUES
+        ('Los Rockeros', 'Banda de rock mexicano con 20 años de trayectoria'),
+        ('María González', 'Cantante de música popular mexicana'),
+        ('Compañía de Teatro Clásico', 'Grupo teatral especializado en obras clásicas'),
+        ('Orquesta Sinfónica Nacional', 'La mejor orquesta del país'),
+        ('DJ ElectroMex', 'DJ especializado en música electrónica')
+        ) AS a(name, bio)
+        WHERE NOT EXISTS (SELECT 1 FROM artists WHERE artists.name = a.name)
         """
         
         supabase_db.execute_query(event_types_sql)
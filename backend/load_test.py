@@ -0,0 +1,356 @@
+#!/usr/bin/env python3
+"""
+Load test for the purchase path.
+
+Replays buyer flows (browse events, open the event, add to cart, checkout,
+approve and execute the payment) against a running API and reports
+throughput, latency percentiles and errors per step. At the end it checks
+the database for oversold ticket tiers.
+
+Start the API with the fake gateway so payments need no PayPal account:
+
+    PAYMENT_GATEWAY=fake python app.py
+    python load_test.py --event-id 1 --rate 50 --duration 60 --arrival spike
+"""
+import argparse
+import math
+import os
+import queue
+import random
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse, parse_qs
+import requests
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+ARRIVALS = ('constant', 'ramp', 'spike')
+PASSWORD = 'LoadTest123!'
+
+def arrival_offsets(curve, rate, duration):
+    """
+    Seconds (from the start of the test) at which buyers arrive.
+      constant: `rate` buyers per second for the whole test
+      ramp:     grows linearly from 0 to `rate` buyers per second
+      spike:    10% of `rate` in the first and last thirds, `rate` in the middle
+    """
+    def rate_at(t):
+        if curve == 'ramp':
+            return rate * t / duration
+        if curve == 'spike':
+            return rate if duration / 3 <= t < 2 * duration / 3 else rate / 10
+        return rate
+
+    offsets = []
+    t = 0.0
+    while t < duration:
+        current = rate_at(t)
+        if current <= 0:
+            t += 0.1
+            continue
+        offsets.append(t)
+        t += 1.0 / current
+    return offsets
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a sorted list"""
+    if not values:
+        return 0
+    return values[min(max(int(math.ceil(pct / 100.0 * len(values))) - 1, 0), len(values) - 1)]
+
+class Stats:
+    """Thread-safe latency and error counters per step"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies = {}
+        self.errors = {}
+        self.outcomes = {}
+        self.max_lag = 0
+
+    def record(self, step, seconds, status):
+        with self._lock:
+            self.latencies.setdefault(step, []).append(seconds)
+            if status is None or status >= 400:
+                errors = self.errors.setdefault(step, {})
+                errors[status] = errors.get(status, 0) + 1
+
+    def outcome(self, name, seconds, lag):
+        with self._lock:
+            self.outcomes[name] = self.outcomes.get(name, 0) + 1
+            self.latencies.setdefault('flow', []).append(seconds)
+            self.max_lag = max(self.max_lag, lag)
+
+class Buyer:
+    """A logged in user with its own HTTP session"""
+
+    def __init__(self, base_url, stats, token=None):
+        self.base_url = base_url.rstrip('/')
+        self.stats = stats
+        self.session = requests.Session()
+        self.admissions = {}
+        if token:
+            self.session.headers['Authorization'] = f'Bearer {token}'
+
+    def call(self, step, method, path, timeout=30, **kwargs):
+        """Send a request and record its latency. Returns the response or None"""
+        if self.admissions:
+            kwargs.setdefault('headers', {})['X-Admission-Token'] = ','.join(self.admissions.values())
+
+        started = time.time()
+        try:
+            response = self.session.request(method, self.base_url + path, timeout=timeout, **kwargs)
+        except requests.RequestException:
+            self.stats.record(step, time.time() - started, None)
+            return None
+
+        self.stats.record(step, time.time() - started, response.status_code)
+        return response
+
+    def wait_in_queue(self, event_id, max_wait):
+        """Join the event's waiting room and poll until admitted. Returns True if admitted"""
+        response = self.call('queue_join', 'POST', f'/api/events/{event_id}/queue')
+        if response is None or response.status_code >= 400:
+            return False
+
+        status = response.json()
+        token = status.get('queue_token')
+        deadline = time.time() + max_wait
+        while not status.get('admitted'):
+            if time.time() + (status.get('poll_after') or 1) > deadline:
+                return False
+            time.sleep(status.get('poll_after') or 1)
+            response = self.call('queue_status', 'GET', f'/api/events/{event_id}/queue', params={'token': token})
+            if response is None or response.status_code >= 400:
+                return False
+            status = response.json()
+
+        if status.get('admission_token'):
+            self.admissions[event_id] = status['admission_token']
+        return True
+
+    def wait_for_payment(self, status_url, done, max_wait):
+        """Long-poll a queued payment until its status is in `done`. Returns the last status"""
+        deadline = time.time() + max_wait
+        status = {}
+        while time.time() < deadline:
+            wait = min(deadline - time.time(), 10)
+            response = self.call('payment_status', 'GET', status_url, params={'wait': wait}, timeout=wait + 30)
+            if response is None or response.status_code >= 400:
+                return status
+            status = response.json()
+            if status.get('status') in done or status.get('status') in ('failed', 'cancelled'):
+                return status
+        return status
+
+    def empty_cart(self):
+        response = self.session.get(self.base_url + '/api/cart', timeout=30)
+        if response.status_code == 200:
+            for item in response.json().get('items', []):
+                self.session.delete(f"{self.base_url}/api/cart/{item['id']}", timeout=30)
+
+def create_buyers(base_url, count, stats, concurrency):
+    """Register and log in `count` throwaway users (not timed)"""
+    run_id = uuid.uuid4().hex[:8]
+
+    def create(i):
+        email = f'loadtest-{run_id}-{i}@example.com'
+        session = requests.Session()
+        session.post(f'{base_url}/auth/register', json={
+            'email': email, 'password': PASSWORD, 'name': f'Load Test {i}'
+        }, timeout=60)
+        response = session.post(f'{base_url}/auth/login', json={'email': email, 'password': PASSWORD}, timeout=60)
+        if response.status_code != 200:
+            return None
+        return Buyer(base_url, stats, response.json()['token'])
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        return [buyer for buyer in executor.map(create, range(count)) if buyer]
+
+def buyer_flow(buyer, event_id, quantity, args):
+    """
+    One purchase attempt. Returns 'purchased', 'sold_out', 'abandoned'
+    (the fake gateway cancelled the approval) or 'failed'.
+    """
+    buyer.call('browse', 'GET', '/api/events')
+
+    response = buyer.call('event_details', 'GET', f'/api/events/{event_id}')
+    if response is None or response.status_code != 200:
+        return 'failed'
+    tickets = [t for t in response.json().get('tickets', []) if t['available'] >= quantity]
+    if args.ticket_id:
+        tickets = [t for t in tickets if t['id'] == args.ticket_id]
+    if not tickets:
+        return 'sold_out'
+    ticket = random.choice(tickets)
+
+    for _ in range(2):
+        response = buyer.call('add_to_cart', 'POST', '/api/cart', json={'ticket_id': ticket['id'], 'quantity': quantity})
+        if response is None or response.status_code != 429:
+            break
+        if not buyer.wait_in_queue(event_id, args.max_wait):
+            return 'failed'
+    if response is None:
+        return 'failed'
+    if response.status_code == 400:
+        return 'sold_out'
+    if response.status_code != 200:
+        return 'failed'
+
+    response = buyer.call('checkout', 'POST', '/api/checkout')
+    if response is None:
+        return 'failed'
+    if response.status_code == 400:
+        return 'sold_out'
+    if response.status_code not in (200, 202):
+        return 'failed'
+
+    payment = response.json()
+    if response.status_code == 202:
+        payment = buyer.wait_for_payment(payment['status_url'], ('awaiting_approval',), args.max_wait)
+        if payment.get('status') != 'awaiting_approval':
+            return 'failed'
+
+    # The fake gateway puts the buyer's approval in the return URL
+    approval = parse_qs(urlparse(payment.get('approval_url') or '').query)
+    if 'paymentId' not in approval or 'PayerID' not in approval:
+        return 'abandoned'
+
+    response = buyer.call('execute_payment', 'POST', '/api/payment/execute', json={
+        'payment_id': approval['paymentId'][0],
+        'payer_id': approval['PayerID'][0]
+    })
+    if response is None or response.status_code not in (200, 202):
+        return 'failed'
+
+    if response.status_code == 202:
+        status = buyer.wait_for_payment(response.json()['status_url'], ('completed',), args.max_wait)
+        if status.get('status') != 'completed':
+            return 'failed'
+
+    return 'purchased'
+
+def check_oversell(event_id):
+    """Sold counters, capacity and tickets of completed orders of each tier"""
+    from utils.db import get_db
+    db = get_db()
+    return db.execute_query("""
+        SELECT
+            t.id, t.location, t.quantity_available, t.quantity_sold,
+            COALESCE(o.quantity, 0) as ordered
+        FROM ticket_inventory t
+        LEFT JOIN (
+            SELECT oi.ticket_id, SUM(oi.quantity) as quantity
+            FROM order_items oi
+            JOIN orders o ON oi.order_id = o.id AND oi.order_date = o.order_date
+            WHERE o.status = 'completed' AND NOT oi.oversold
+            GROUP BY oi.ticket_id
+        ) o ON o.ticket_id = t.id
+        WHERE t.event_id = %s
+        ORDER BY t.id
+    """, (event_id,), fetch=True) or []
+
+def print_report(stats, elapsed, flows):
+    print(f"\n{flows} flows in {elapsed:.1f}s ({flows / elapsed:.1f} flows/s), "
+          f"max start lag {stats.max_lag:.2f}s")
+    print("Outcomes: " + ', '.join(f"{name}={count}" for name, count in sorted(stats.outcomes.items())))
+
+    requests_total = sum(len(v) for step, v in stats.latencies.items() if step != 'flow')
+    print(f"Requests: {requests_total} ({requests_total / elapsed:.1f} req/s)\n")
+
+    print(f"{'step':<16}{'count':>8}{'errors':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+    for step, values in stats.latencies.items():
+        values = sorted(values)
+        errors = sum(stats.errors.get(step, {}).values())
+        print(f"{step:<16}{len(values):>8}{errors:>8}"
+              f"{percentile(values, 50) * 1000:>10.0f}{percentile(values, 95) * 1000:>10.0f}"
+              f"{percentile(values, 99) * 1000:>10.0f}{values[-1] * 1000:>10.0f}")
+
+    for step, errors in stats.errors.items():
+        print(f"  {step} errors: " + ', '.join(f"{status or 'connection'}={count}" for status, count in errors.items()))
+
+def main():
+    """Main function"""
+    parser = argparse.ArgumentParser(description='Load test the purchase path')
+    parser.add_argument('--base-url', default=f"http://localhost:{os.environ.get('PORT', 5000)}")
+    parser.add_argument('--event-id', type=int, required=True, help='Event on sale')
+    parser.add_argument('--ticket-id', type=int, help='Only buy this ticket tier')
+    parser.add_argument('--quantity', type=int, default=2, help='Tickets per order')
+    parser.add_argument('--users', type=int, default=100, help='Buyer accounts to create')
+    parser.add_argument('--concurrency', type=int, default=50, help='Flows running at the same time')
+    parser.add_argument('--rate', type=float, default=20, help='Peak arrivals per second')
+    parser.add_argument('--duration', type=float, default=30, help='Seconds of arrivals')
+    parser.add_argument('--arrival', choices=ARRIVALS, default='constant')
+    parser.add_argument('--max-wait', type=float, default=60, help='Seconds to wait in queues and for payments')
+    parser.add_argument('--skip-db-check', action='store_true', help='Do not check the database for oversells')
+    args = parser.parse_args()
+
+    stats = Stats()
+    print(f"Creating {args.users} buyers...")
+    buyers = create_buyers(args.base_url, args.users, stats, args.concurrency)
+    if not buyers:
+        print("❌ Could not create buyers, is the API running?")
+        sys.exit(1)
+
+    # Sales made before the run are not the test's, only changes are compared
+    before = {} if args.skip_db_check else {tier['id']: tier for tier in check_oversell(args.event_id)}
+
+    idle = queue.Queue()
+    for buyer in buyers:
+        idle.put(buyer)
+
+    def run(scheduled_at):
+        buyer = idle.get()
+        started = time.time()
+        try:
+            result = buyer_flow(buyer, args.event_id, args.quantity, args)
+        except Exception as e:
+            print(f"Flow error: {e}")
+            result = 'failed'
+        stats.outcome(result, time.time() - started, started - scheduled_at)
+        if result != 'purchased':
+            try:
+                buyer.empty_cart()
+            except requests.RequestException:
+                pass
+        idle.put(buyer)
+
+    offsets = arrival_offsets(args.arrival, args.rate, args.duration)
+    print(f"Running {len(offsets)} flows ({args.arrival}, peak {args.rate}/s, {args.duration}s)...")
+
+    start = time.time()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        for offset in offsets:
+            delay = start + offset - time.time()
+            if delay > 0:
+                time.sleep(delay)
+            executor.submit(run, start + offset)
+    elapsed = time.time() - start
+
+    print_report(stats, elapsed, len(offsets))
+
+    if args.skip_db_check:
+        return
+
+    print("\nInventory check:")
+    problems_found = False
+    for tier in check_oversell(args.event_id):
+        start_tier = before.get(tier['id'], {'quantity_sold': 0, 'ordered': 0})
+        sold = tier['quantity_sold'] - start_tier['quantity_sold']
+        ordered = tier['ordered'] - start_tier['ordered']
+        problems = []
+        if tier['quantity_sold'] > tier['quantity_available']:
+            problems.append('OVERSOLD')
+        if ordered != sold:
+            problems.append(f"counter differs from completed orders (+{ordered})")
+        problems_found = problems_found or bool(problems)
+        print(f"  {'❌' if problems else '✅'} {tier['location']}: +{sold} sold, "
+              f"{tier['quantity_sold']}/{tier['quantity_available']} {' '.join(problems)}")
+
+    if problems_found:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
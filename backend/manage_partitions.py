@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""
+Script para mantener las particiones mensuales de orders y order_items.
+Pensado para ejecutarse a diario (cron, Railway/Render scheduled job).
+
+    python manage_partitions.py                     # crea las particiones de los próximos meses
+    python manage_partitions.py list                # muestra las particiones
+    python manage_partitions.py archive             # exporta y elimina los meses antiguos
+    python manage_partitions.py archive --dry-run   # solo muestra qué meses se archivarían
+"""
+
+import argparse
+import sys
+from utils.partitions import ensure_partitions, list_partitions, archive_partitions
+
+def main():
+    """Función principal"""
+    parser = argparse.ArgumentParser(description='Mantener las particiones de órdenes')
+    parser.add_argument('command', nargs='?', default='ensure', choices=['ensure', 'list', 'archive'])
+    parser.add_argument('--months-ahead', type=int, help='Meses a crear por adelantado')
+    parser.add_argument('--keep-months', type=int, help='Meses que se conservan en la base de datos')
+    parser.add_argument('--archive-dir', help='Directorio de los ficheros exportados')
+    parser.add_argument('--dry-run', action='store_true', help='No modificar nada')
+    parser.add_argument('--database-url', help='Por defecto DATABASE_URL')
+    args = parser.parse_args()
+
+    try:
+        if args.command == 'list':
+            for partition in list_partitions(args.database_url):
+                state = '' if partition['attached'] else '  (separada, pendiente de archivar)'
+                print(f"📅 {partition['month']:%Y-%m}: ~{partition['rows']} órdenes{state}")
+            return
+
+        if args.command == 'archive':
+            print("📦 Archivando meses antiguos...")
+            archived = archive_partitions(
+                keep_months=args.keep_months,
+                directory=args.archive_dir,
+                dry_run=args.dry_run,
+                database_url=args.database_url
+            )
+            print(f"✅ {len(archived)} mes(es) {'por archivar' if args.dry_run else 'archivados'}")
+            return
+
+        created = ensure_partitions(args.months_ahead, args.database_url)
+        print(f"✅ {created} partición(es) mensual(es) creadas")
+    except Exception as e:
+        print(f"❌ Error gestionando particiones: {e}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
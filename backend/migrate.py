@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+"""
+Script para aplicar las migraciones versionadas de migrations/.
+
+    python migrate.py                # aplica las migraciones pendientes
+    python migrate.py status         # muestra el estado de cada migración
+    python migrate.py baseline 3     # marca 001-003 como aplicadas sin ejecutarlas
+                                     # (bases de datos creadas antes del runner)
+"""
+
+import argparse
+import sys
+from utils.migrations import migrate, status, MigrationError
+
+STATE_ICONS = {'applied': '✅', 'pending': '⏳', 'changed': '❌', 'missing': '❓'}
+
+def main():
+    """Función principal"""
+    parser = argparse.ArgumentParser(description='Aplicar migraciones de base de datos')
+    parser.add_argument('command', nargs='?', default='up', choices=['up', 'status', 'baseline'])
+    parser.add_argument('version', nargs='?', type=int, help='Versión máxima a aplicar o marcar')
+    parser.add_argument('--database-url', help='Por defecto DATABASE_URL')
+    args = parser.parse_args()
+
+    try:
+        if args.command == 'status':
+            for migration in status(args.database_url):
+                applied_at = f"  ({migration['applied_at']:%Y-%m-%d %H:%M})" if migration['applied_at'] else ''
+                print(f"{STATE_ICONS[migration['state']]} {migration['filename']}: {migration['state']}{applied_at}")
+            return
+
+        if args.command == 'baseline' and args.version is None:
+            parser.error('baseline requiere la versión hasta la que marcar')
+
+        applied = migrate(args.database_url, target=args.version, baseline=args.command == 'baseline')
+    except MigrationError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+
+    if applied:
+        print(f"✅ {len(applied)} migración(es) {'marcadas' if args.command == 'baseline' else 'aplicadas'}")
+    else:
+        print("✅ La base de datos está al día")
+
+if __name__ == "__main__":
+    main()
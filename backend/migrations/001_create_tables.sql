@@ -118,18 +118,22 @@ INSERT INTO event_types (name, description) VALUES
 ('Festival', 'Festivales y eventos culturales')
 ON CONFLICT (name) DO NOTHING;
 
--- Insert sample venues
-INSERT INTO venues (name, address, city, capacity) VALUES 
+-- Insert sample venues (names are not unique, so skip the ones already there)
+INSERT INTO venues (name, address, city, capacity)
+SELECT * FROM (VALUES 
 ('Teatro Nacional', 'Av. Principal 123', 'Ciudad Capital', 2000),
 ('Estadio Central', 'Zona Deportiva 456', 'Ciudad Capital', 50000),
 ('Centro de Convenciones', 'Av. Empresarial 789', 'Ciudad Capital', 5000),
 ('Auditorio Municipal', 'Plaza Central 321', 'Ciudad Capital', 1500)
-ON CONFLICT (name) DO NOTHING;
+) AS v(name, address, city, capacity)
+WHERE NOT EXISTS (SELECT 1 FROM venues WHERE venues.name = v.name);
 
 -- Insert sample artists
-INSERT INTO artists (name, bio) VALUES 
+INSERT INTO artists (name, bio)
+SELECT * FROM (VALUES 
 ('Banda Rock Nacional', 'Reconocida banda de rock con 20 años de trayectoria'),
 ('Compañía de Teatro Clásico', 'Grupo teatral especializado en obras clásicas'),
 ('Orquesta Sinfónica', 'Orquesta con músicos profesionales de renombre'),
 ('DJ Internacional', 'DJ reconocido mundialmente en música electrónica')
-ON CONFLICT (name) DO NOTHING;
+) AS a(name, bio)
+WHERE NOT EXISTS (SELECT 1 FROM artists WHERE artists.name = a.name);
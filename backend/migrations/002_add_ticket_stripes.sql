@@ -0,0 +1,25 @@
+-- Striped inventory counters for hot ticket tiers
+-- A striped tier spreads its capacity over several ticket_stripes rows so
+-- concurrent purchases update different rows instead of one tickets row.
+
+ALTER TABLE tickets ADD COLUMN IF NOT EXISTS stripes INTEGER NOT NULL DEFAULT 0;
+
+CREATE TABLE IF NOT EXISTS ticket_stripes (
+    ticket_id INTEGER REFERENCES tickets(id) ON DELETE CASCADE,
+    stripe INTEGER NOT NULL,
+    quantity_available INTEGER NOT NULL,
+    quantity_sold INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (ticket_id, stripe)
+);
+
+-- Live inventory per tier: striped tiers sum their stripes
+CREATE OR REPLACE VIEW ticket_inventory AS
+SELECT
+    t.id, t.event_id, t.location, t.price, t.quantity_available,
+    CASE WHEN t.stripes > 0 THEN (
+        SELECT COALESCE(SUM(s.quantity_sold), 0)::INTEGER
+        FROM ticket_stripes s
+        WHERE s.ticket_id = t.id
+    ) ELSE t.quantity_sold END AS quantity_sold,
+    t.stripes, t.created_at
+FROM tickets t;
@@ -0,0 +1,45 @@
+-- Reserved seating
+-- Venues are divided into sections and rows. Each event keeps one sold and one
+-- held bitmap per section (bit n = seat n of the section), so checking or
+-- claiming seats is a bitmap operation instead of one row per seat.
+
+CREATE TABLE IF NOT EXISTS venue_sections (
+    id SERIAL PRIMARY KEY,
+    venue_id INTEGER REFERENCES venues(id) ON DELETE CASCADE,
+    name VARCHAR(255) NOT NULL,
+    preference INTEGER NOT NULL DEFAULT 0, -- lower is better
+    seat_count INTEGER NOT NULL DEFAULT 0,
+    UNIQUE(venue_id, name)
+);
+
+CREATE TABLE IF NOT EXISTS venue_rows (
+    id SERIAL PRIMARY KEY,
+    section_id INTEGER REFERENCES venue_sections(id) ON DELETE CASCADE,
+    row_index INTEGER NOT NULL, -- 0 is the row closest to the stage
+    label VARCHAR(20) NOT NULL,
+    seat_count INTEGER NOT NULL,
+    first_seat INTEGER NOT NULL, -- bit of seat 1 in the section bitmap
+    UNIQUE(section_id, row_index)
+);
+
+CREATE TABLE IF NOT EXISTS event_section_seats (
+    event_id INTEGER REFERENCES events(id) ON DELETE CASCADE,
+    section_id INTEGER REFERENCES venue_sections(id) ON DELETE CASCADE,
+    ticket_id INTEGER REFERENCES tickets(id) ON DELETE SET NULL, -- price tier of the section
+    sold BYTEA NOT NULL,
+    held BYTEA NOT NULL,
+    PRIMARY KEY (event_id, section_id)
+);
+
+CREATE TABLE IF NOT EXISTS seat_holds (
+    id SERIAL PRIMARY KEY,
+    event_id INTEGER REFERENCES events(id) ON DELETE CASCADE,
+    user_id INTEGER REFERENCES users(id) ON DELETE CASCADE,
+    seats JSONB NOT NULL, -- {"<section_id>": [seat bits]}
+    status VARCHAR(50) DEFAULT 'held' CHECK (status IN ('held', 'confirmed', 'released')),
+    expires_at TIMESTAMP NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_venue_sections_venue ON venue_sections(venue_id);
+CREATE INDEX IF NOT EXISTS idx_seat_holds_expiry ON seat_holds(event_id, expires_at) WHERE status = 'held';
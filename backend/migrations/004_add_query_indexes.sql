@@ -0,0 +1,35 @@
+-- migrate: no-transaction
+-- Composite and partial indexes for the queries the API runs.
+-- Built CONCURRENTLY so a live database keeps taking orders meanwhile; each
+-- statement is idempotent, so a failed run can simply be retried.
+
+-- Active upcoming events by date (catalog, dashboard upcoming count)
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_events_active_date
+    ON events (event_date, event_time) WHERE status = 'active';
+
+-- Admin event list, newest first
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_events_created_at ON events (created_at DESC);
+
+-- Ticket tiers of an event by price (event page, availability checks).
+-- Not a partial index on quantity_sold < quantity_available: that predicate
+-- would make every sale's counter update a non-HOT update of the hottest rows.
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_tickets_event_price ON tickets (event_id, price);
+DROP INDEX CONCURRENTLY IF EXISTS idx_tickets_event;
+
+-- A user's orders, newest first
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_orders_user_date ON orders (user_id, order_date DESC);
+DROP INDEX CONCURRENTLY IF EXISTS idx_orders_user;
+
+-- Admin order list, optionally filtered by status, newest first
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_orders_date ON orders (order_date DESC);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_orders_status_date ON orders (status, order_date DESC);
+
+-- Payment execution and webhooks look orders up by PayPal payment id
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_orders_payment
+    ON orders (paypal_payment_id) WHERE paypal_payment_id IS NOT NULL;
+
+-- Reconciliation pages through pending orders by id
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_orders_pending ON orders (id) WHERE status = 'pending';
+
+-- Sales per tier and ON DELETE CASCADE from tickets
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_order_items_ticket ON order_items (ticket_id);
@@ -0,0 +1,102 @@
+-- Monthly range partitions of orders and order_items on the order date.
+-- order_items gets a copy of its order's order_date so both tables are
+-- partitioned alike and a month can be detached and archived as a pair
+-- (see utils/partitions.py). Postgres requires the partition key in every
+-- unique constraint, so the primary keys become (id, order_date); ids still
+-- come from the same sequences.
+-- Rewrites both tables under an exclusive lock: run it in a maintenance window.
+
+-- Creates the monthly partitions of both tables from first_month to
+-- last_month that do not exist yet. Returns how many months were added.
+CREATE OR REPLACE FUNCTION create_order_partitions(first_month DATE, last_month DATE)
+RETURNS INTEGER AS $$
+DECLARE
+    month DATE := date_trunc('month', first_month);
+    suffix TEXT;
+    created INTEGER := 0;
+BEGIN
+    WHILE month <= last_month LOOP
+        suffix := to_char(month, '"p"YYYY_MM');
+        IF to_regclass('orders_' || suffix) IS NULL THEN
+            EXECUTE format('CREATE TABLE %I PARTITION OF orders FOR VALUES FROM (%L) TO (%L)',
+                           'orders_' || suffix, month, (month + INTERVAL '1 month')::date);
+            created := created + 1;
+        END IF;
+        IF to_regclass('order_items_' || suffix) IS NULL THEN
+            EXECUTE format('CREATE TABLE %I PARTITION OF order_items FOR VALUES FROM (%L) TO (%L)',
+                           'order_items_' || suffix, month, (month + INTERVAL '1 month')::date);
+        END IF;
+        month := month + INTERVAL '1 month';
+    END LOOP;
+    RETURN created;
+END;
+$$ LANGUAGE plpgsql;
+
+ALTER TABLE order_items RENAME TO order_items_unpartitioned;
+ALTER INDEX order_items_pkey RENAME TO order_items_unpartitioned_pkey;
+ALTER TABLE orders RENAME TO orders_unpartitioned;
+ALTER INDEX orders_pkey RENAME TO orders_unpartitioned_pkey;
+ALTER SEQUENCE orders_id_seq OWNED BY NONE;
+ALTER SEQUENCE order_items_id_seq OWNED BY NONE;
+
+CREATE TABLE orders (
+    id INTEGER NOT NULL DEFAULT nextval('orders_id_seq'),
+    user_id INTEGER REFERENCES users(id) ON DELETE CASCADE,
+    order_date TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    status VARCHAR(50) DEFAULT 'pending' CHECK (status IN ('pending', 'completed', 'cancelled', 'refunded')),
+    total_amount DECIMAL(10, 2) NOT NULL,
+    paypal_payment_id VARCHAR(255),
+    paypal_payer_id VARCHAR(255),
+    PRIMARY KEY (id, order_date)
+) PARTITION BY RANGE (order_date);
+
+CREATE TABLE order_items (
+    id INTEGER NOT NULL DEFAULT nextval('order_items_id_seq'),
+    order_id INTEGER NOT NULL,
+    order_date TIMESTAMP NOT NULL,
+    ticket_id INTEGER REFERENCES tickets(id) ON DELETE CASCADE,
+    quantity INTEGER NOT NULL,
+    price DECIMAL(10, 2) NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (id, order_date),
+    FOREIGN KEY (order_id, order_date) REFERENCES orders (id, order_date) ON DELETE CASCADE
+) PARTITION BY RANGE (order_date);
+
+-- Catch-all for dates without a partition, normally empty: manage_partitions.py
+-- keeps the coming months created
+CREATE TABLE orders_default PARTITION OF orders DEFAULT;
+CREATE TABLE order_items_default PARTITION OF order_items DEFAULT;
+
+SELECT create_order_partitions(
+    COALESCE((SELECT MIN(order_date) FROM orders_unpartitioned), CURRENT_DATE)::date,
+    (CURRENT_DATE + INTERVAL '3 months')::date
+);
+
+INSERT INTO orders (id, user_id, order_date, status, total_amount, paypal_payment_id, paypal_payer_id)
+SELECT id, user_id, COALESCE(order_date, CURRENT_TIMESTAMP), status, total_amount,
+       paypal_payment_id, paypal_payer_id
+FROM orders_unpartitioned;
+
+-- Items without an order could never be shown and are not carried over
+INSERT INTO order_items (id, order_id, order_date, ticket_id, quantity, price, created_at)
+SELECT oi.id, oi.order_id, COALESCE(o.order_date, CURRENT_TIMESTAMP), oi.ticket_id,
+       oi.quantity, oi.price, oi.created_at
+FROM order_items_unpartitioned oi
+JOIN orders_unpartitioned o ON o.id = oi.order_id;
+
+DROP TABLE order_items_unpartitioned;
+DROP TABLE orders_unpartitioned;
+ALTER SEQUENCE orders_id_seq OWNED BY orders.id;
+ALTER SEQUENCE order_items_id_seq OWNED BY order_items.id;
+
+-- The indexes of 001 and 004, now on every partition
+CREATE INDEX idx_orders_user_date ON orders (user_id, order_date DESC);
+CREATE INDEX idx_orders_date ON orders (order_date DESC);
+CREATE INDEX idx_orders_status_date ON orders (status, order_date DESC);
+CREATE INDEX idx_orders_payment ON orders (paypal_payment_id) WHERE paypal_payment_id IS NOT NULL;
+CREATE INDEX idx_orders_pending ON orders (id) WHERE status = 'pending';
+CREATE INDEX idx_order_items_order ON order_items (order_id, order_date);
+CREATE INDEX idx_order_items_ticket ON order_items (ticket_id);
+
+ANALYZE orders;
+ANALYZE order_items;
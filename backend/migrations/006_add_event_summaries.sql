@@ -0,0 +1,257 @@
+-- Per-event catalog summary: price range, total and remaining inventory and
+-- show date, so listings read one row per event instead of aggregating its
+-- ticket tiers (and their stripes) on every request.
+--
+-- Tier changes (new tiers, prices, capacity, striping) recount the event's
+-- row right away. Sales only append to event_summary_deltas, so concurrent
+-- buyers of one event never queue on its summary row; every 32nd delta folds
+-- the pending ones into the row when nobody else holds it. Readers use
+-- live_event_summaries, which applies the pending deltas.
+
+CREATE TABLE IF NOT EXISTS event_summaries (
+    event_id INTEGER PRIMARY KEY REFERENCES events(id) ON DELETE CASCADE,
+    min_price DECIMAL(10, 2),
+    max_price DECIMAL(10, 2),
+    total_inventory INTEGER NOT NULL DEFAULT 0,
+    remaining_inventory INTEGER NOT NULL DEFAULT 0,
+    next_show_date DATE,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_event_summaries_show_date ON event_summaries (next_show_date);
+
+-- Tickets sold (negative when released) not yet folded into event_summaries
+CREATE TABLE IF NOT EXISTS event_summary_deltas (
+    id BIGSERIAL PRIMARY KEY,
+    event_id INTEGER NOT NULL,
+    sold INTEGER NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_event_summary_deltas_event ON event_summary_deltas (event_id);
+
+CREATE OR REPLACE VIEW live_event_summaries AS
+SELECT
+    s.event_id, s.min_price, s.max_price, s.total_inventory,
+    s.remaining_inventory - COALESCE(d.sold, 0) AS remaining_inventory,
+    s.remaining_inventory - COALESCE(d.sold, 0) <= 0 AS sold_out,
+    s.next_show_date, s.updated_at
+FROM event_summaries s
+LEFT JOIN (
+    SELECT event_id, SUM(sold)::INTEGER AS sold
+    FROM event_summary_deltas
+    GROUP BY event_id
+) d ON d.event_id = s.event_id;
+
+-- Recounts the summaries of the given events (all when NULL) from
+-- ticket_inventory and discards their pending deltas. With skip_locked,
+-- events whose summary another transaction is updating are left alone.
+-- Returns the number of summaries written.
+CREATE OR REPLACE FUNCTION refresh_event_summaries(event_ids INTEGER[] DEFAULT NULL, skip_locked BOOLEAN DEFAULT FALSE)
+RETURNS INTEGER AS $$
+DECLARE
+    refreshed INTEGER;
+BEGIN
+    -- Lock before counting, so the count below takes its snapshot after any
+    -- concurrent refresh of the same events has committed
+    IF skip_locked THEN
+        event_ids := ARRAY(
+            SELECT event_id FROM event_summaries
+            WHERE event_id = ANY(event_ids)
+            ORDER BY event_id FOR UPDATE SKIP LOCKED
+        );
+        IF cardinality(event_ids) = 0 THEN
+            RETURN 0;
+        END IF;
+    ELSE
+        PERFORM 1 FROM event_summaries
+        WHERE event_ids IS NULL OR event_id = ANY(event_ids)
+        ORDER BY event_id FOR UPDATE;
+    END IF;
+
+    -- One statement, so the deltas removed and the count share a snapshot
+    WITH folded AS (
+        DELETE FROM event_summary_deltas
+        WHERE event_ids IS NULL OR event_id = ANY(event_ids)
+    ), totals AS (
+        SELECT
+            e.id, e.event_date,
+            MIN(t.price) AS min_price, MAX(t.price) AS max_price,
+            COALESCE(SUM(t.quantity_available), 0) AS total_inventory,
+            COALESCE(SUM(t.quantity_available - t.quantity_sold), 0) AS remaining_inventory
+        FROM events e
+        LEFT JOIN ticket_inventory t ON t.event_id = e.id
+        WHERE event_ids IS NULL OR e.id = ANY(event_ids)
+        GROUP BY e.id, e.event_date
+    )
+    INSERT INTO event_summaries (event_id, min_price, max_price, total_inventory, remaining_inventory,
+                                 next_show_date, updated_at)
+    SELECT id, min_price, max_price, total_inventory, remaining_inventory, event_date, CURRENT_TIMESTAMP
+    FROM totals
+    ON CONFLICT (event_id) DO UPDATE SET
+        min_price = EXCLUDED.min_price,
+        max_price = EXCLUDED.max_price,
+        total_inventory = EXCLUDED.total_inventory,
+        remaining_inventory = EXCLUDED.remaining_inventory,
+        next_show_date = EXCLUDED.next_show_date,
+        updated_at = EXCLUDED.updated_at;
+
+    GET DIAGNOSTICS refreshed = ROW_COUNT;
+    RETURN refreshed;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Folds the pending deltas of events whose latest delta id is a multiple of 32
+CREATE OR REPLACE FUNCTION fold_event_summary_deltas(delta_ids BIGINT[], event_ids INTEGER[])
+RETURNS VOID AS $$
+DECLARE
+    due INTEGER[];
+BEGIN
+    due := ARRAY(SELECT DISTINCT e FROM unnest(delta_ids, event_ids) AS d(id, e) WHERE id % 32 = 0);
+    IF cardinality(due) > 0 THEN
+        PERFORM refresh_event_summaries(due, TRUE);
+    END IF;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION event_summaries_tickets_changed()
+RETURNS TRIGGER AS $$
+DECLARE
+    changed INTEGER[];
+    delta_ids BIGINT[];
+    delta_events INTEGER[];
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        changed := ARRAY(SELECT DISTINCT event_id FROM new_rows WHERE event_id IS NOT NULL);
+    ELSIF TG_OP = 'DELETE' THEN
+        changed := ARRAY(SELECT DISTINCT event_id FROM old_rows WHERE event_id IS NOT NULL);
+    ELSE
+        changed := ARRAY(
+            SELECT n.event_id FROM new_rows n JOIN old_rows o ON o.id = n.id
+            WHERE (n.event_id, n.price, n.quantity_available, n.stripes)
+                  IS DISTINCT FROM (o.event_id, o.price, o.quantity_available, o.stripes)
+            UNION
+            SELECT o.event_id FROM new_rows n JOIN old_rows o ON o.id = n.id
+            WHERE (n.event_id, n.price, n.quantity_available, n.stripes)
+                  IS DISTINCT FROM (o.event_id, o.price, o.quantity_available, o.stripes)
+        );
+        changed := array_remove(changed, NULL);
+
+        -- Sales on plain tiers only move quantity_sold
+        WITH added AS (
+            INSERT INTO event_summary_deltas (event_id, sold)
+            SELECT n.event_id, SUM(n.quantity_sold - o.quantity_sold)
+            FROM new_rows n JOIN old_rows o ON o.id = n.id
+            WHERE n.stripes = 0 AND n.event_id IS NOT NULL AND n.event_id <> ALL(changed)
+            GROUP BY n.event_id
+            HAVING SUM(n.quantity_sold - o.quantity_sold) <> 0
+            RETURNING id, event_id
+        )
+        SELECT array_agg(id), array_agg(event_id) INTO delta_ids, delta_events FROM added;
+
+        IF delta_ids IS NOT NULL THEN
+            PERFORM fold_event_summary_deltas(delta_ids, delta_events);
+        END IF;
+    END IF;
+
+    IF cardinality(changed) > 0 THEN
+        PERFORM refresh_event_summaries(changed);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION event_summaries_stripes_changed()
+RETURNS TRIGGER AS $$
+DECLARE
+    ticket_ids INTEGER[];
+    sold_changes INTEGER[];
+    delta_ids BIGINT[];
+    delta_events INTEGER[];
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        SELECT array_agg(ticket_id), array_agg(quantity_sold) INTO ticket_ids, sold_changes FROM new_rows;
+    ELSIF TG_OP = 'DELETE' THEN
+        SELECT array_agg(ticket_id), array_agg(-quantity_sold) INTO ticket_ids, sold_changes FROM old_rows;
+    ELSE
+        SELECT array_agg(n.ticket_id), array_agg(n.quantity_sold - o.quantity_sold) INTO ticket_ids, sold_changes
+        FROM new_rows n JOIN old_rows o ON o.ticket_id = n.ticket_id AND o.stripe = n.stripe
+        WHERE n.quantity_sold <> o.quantity_sold;
+    END IF;
+
+    IF ticket_ids IS NULL THEN
+        RETURN NULL;
+    END IF;
+
+    WITH added AS (
+        INSERT INTO event_summary_deltas (event_id, sold)
+        SELECT t.event_id, SUM(c.sold)
+        FROM unnest(ticket_ids, sold_changes) AS c(ticket_id, sold)
+        JOIN tickets t ON t.id = c.ticket_id
+        WHERE t.event_id IS NOT NULL
+        GROUP BY t.event_id
+        HAVING SUM(c.sold) <> 0
+        RETURNING id, event_id
+    )
+    SELECT array_agg(id), array_agg(event_id) INTO delta_ids, delta_events FROM added;
+
+    IF delta_ids IS NOT NULL THEN
+        PERFORM fold_event_summary_deltas(delta_ids, delta_events);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION event_summaries_events_changed()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        INSERT INTO event_summaries (event_id, next_show_date)
+        SELECT id, event_date FROM new_rows
+        ON CONFLICT (event_id) DO NOTHING;
+    ELSE
+        UPDATE event_summaries s SET next_show_date = n.event_date, updated_at = CURRENT_TIMESTAMP
+        FROM new_rows n
+        WHERE s.event_id = n.id AND s.next_show_date IS DISTINCT FROM n.event_date;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Statement level with transition tables, so bulk loads (COPY) and
+-- multi-row updates refresh each event once
+DROP TRIGGER IF EXISTS event_summaries_tickets_insert ON tickets;
+CREATE TRIGGER event_summaries_tickets_insert AFTER INSERT ON tickets
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION event_summaries_tickets_changed();
+DROP TRIGGER IF EXISTS event_summaries_tickets_update ON tickets;
+CREATE TRIGGER event_summaries_tickets_update AFTER UPDATE ON tickets
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION event_summaries_tickets_changed();
+DROP TRIGGER IF EXISTS event_summaries_tickets_delete ON tickets;
+CREATE TRIGGER event_summaries_tickets_delete AFTER DELETE ON tickets
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION event_summaries_tickets_changed();
+
+DROP TRIGGER IF EXISTS event_summaries_stripes_insert ON ticket_stripes;
+CREATE TRIGGER event_summaries_stripes_insert AFTER INSERT ON ticket_stripes
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION event_summaries_stripes_changed();
+DROP TRIGGER IF EXISTS event_summaries_stripes_update ON ticket_stripes;
+CREATE TRIGGER event_summaries_stripes_update AFTER UPDATE ON ticket_stripes
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION event_summaries_stripes_changed();
+DROP TRIGGER IF EXISTS event_summaries_stripes_delete ON ticket_stripes;
+CREATE TRIGGER event_summaries_stripes_delete AFTER DELETE ON ticket_stripes
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION event_summaries_stripes_changed();
+
+DROP TRIGGER IF EXISTS event_summaries_events_insert ON events;
+CREATE TRIGGER event_summaries_events_insert AFTER INSERT ON events
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION event_summaries_events_changed();
+DROP TRIGGER IF EXISTS event_summaries_events_update ON events;
+CREATE TRIGGER event_summaries_events_update AFTER UPDATE ON events
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION event_summaries_events_changed();
+
+SELECT refresh_event_summaries();
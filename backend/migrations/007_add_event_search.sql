@@ -0,0 +1,120 @@
+-- Event search: one document per event with its title, artist, venue and
+-- description, kept in sync by triggers. search_vector (weighted title >
+-- artist > venue > description) serves full-text queries and the trigram
+-- index on document serves fuzzy matching of misspelled names.
+--
+-- pg_trgm is created when the server provides it (Supabase does); without it
+-- /api/search falls back to full-text matching only.
+
+DO $$
+BEGIN
+    IF EXISTS (SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm') THEN
+        CREATE EXTENSION IF NOT EXISTS pg_trgm;
+    ELSE
+        RAISE NOTICE 'pg_trgm not available, event search will not match misspellings';
+    END IF;
+END $$;
+
+-- Lower case without accents, applied to documents and search terms alike
+-- (translate instead of unaccent, which is not available everywhere)
+CREATE OR REPLACE FUNCTION search_normalize(value TEXT)
+RETURNS TEXT AS $$
+    SELECT lower(translate(COALESCE(value, ''),
+        'ÁÀÂÄÃÉÈÊËÍÌÎÏÓÒÔÖÕÚÙÛÜÑÇáàâäãéèêëíìîïóòôöõúùûüñç',
+        'AAAAAEEEEIIIIOOOOOUUUUNCaaaaaeeeeiiiiooooouuuunc'))
+$$ LANGUAGE sql IMMUTABLE PARALLEL SAFE;
+
+CREATE TABLE IF NOT EXISTS event_search (
+    event_id INTEGER PRIMARY KEY REFERENCES events(id) ON DELETE CASCADE,
+    document TEXT NOT NULL,
+    search_vector TSVECTOR NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_event_search_vector ON event_search USING GIN (search_vector);
+
+DO $$
+BEGIN
+    IF EXISTS (SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm') THEN
+        CREATE INDEX IF NOT EXISTS idx_event_search_document_trgm ON event_search USING GIN (document gin_trgm_ops);
+    END IF;
+END $$;
+
+-- Rebuilds the search documents of the given events (all when NULL).
+-- Returns the number of documents written.
+CREATE OR REPLACE FUNCTION refresh_event_search(event_ids INTEGER[] DEFAULT NULL)
+RETURNS INTEGER AS $$
+DECLARE
+    refreshed INTEGER;
+BEGIN
+    INSERT INTO event_search (event_id, document, search_vector)
+    SELECT
+        e.id,
+        search_normalize(concat_ws(' ', e.title, a.name, v.name, e.description)),
+        setweight(to_tsvector('spanish', search_normalize(e.title)), 'A') ||
+        setweight(to_tsvector('spanish', search_normalize(a.name)), 'B') ||
+        setweight(to_tsvector('spanish', search_normalize(v.name)), 'C') ||
+        setweight(to_tsvector('spanish', search_normalize(e.description)), 'D')
+    FROM events e
+    LEFT JOIN artists a ON a.id = e.artist_id
+    LEFT JOIN venues v ON v.id = e.venue_id
+    WHERE event_ids IS NULL OR e.id = ANY(event_ids)
+    ON CONFLICT (event_id) DO UPDATE
+    SET document = EXCLUDED.document, search_vector = EXCLUDED.search_vector;
+
+    GET DIAGNOSTICS refreshed = ROW_COUNT;
+    RETURN refreshed;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION event_search_events_changed()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        PERFORM refresh_event_search(ARRAY(SELECT id FROM new_rows));
+    ELSE
+        PERFORM refresh_event_search(ARRAY(
+            SELECT n.id FROM new_rows n
+            JOIN old_rows o ON o.id = n.id
+            WHERE (n.title, n.description, n.artist_id, n.venue_id)
+                  IS DISTINCT FROM (o.title, o.description, o.artist_id, o.venue_id)
+        ));
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Renaming an artist or a venue rebuilds the documents of its events
+CREATE OR REPLACE FUNCTION event_search_names_changed()
+RETURNS TRIGGER AS $$
+BEGIN
+    PERFORM refresh_event_search(ARRAY(
+        SELECT e.id FROM events e
+        JOIN new_rows n ON n.id = CASE WHEN TG_TABLE_NAME = 'artists' THEN e.artist_id ELSE e.venue_id END
+        JOIN old_rows o ON o.id = n.id
+        WHERE n.name IS DISTINCT FROM o.name
+    ));
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS event_search_events_insert ON events;
+CREATE TRIGGER event_search_events_insert AFTER INSERT ON events
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION event_search_events_changed();
+
+DROP TRIGGER IF EXISTS event_search_events_update ON events;
+CREATE TRIGGER event_search_events_update AFTER UPDATE ON events
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION event_search_events_changed();
+
+DROP TRIGGER IF EXISTS event_search_artists_update ON artists;
+CREATE TRIGGER event_search_artists_update AFTER UPDATE ON artists
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION event_search_names_changed();
+
+DROP TRIGGER IF EXISTS event_search_venues_update ON venues;
+CREATE TRIGGER event_search_venues_update AFTER UPDATE ON venues
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION event_search_names_changed();
+
+SELECT refresh_event_search();
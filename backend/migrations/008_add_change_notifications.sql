@@ -0,0 +1,139 @@
+-- Catalog change notifications for the workers' in-memory caches.
+--
+-- Every statement that changes events, venues, artists, event types, ticket
+-- tiers or seat maps sends one notification on the catalog_changes channel:
+--   {"table": "events", "ids": [1, 2], "artist_ids": [...], ...}
+-- "ids" is null when the change is too large for a payload, meaning "reload
+-- everything from that table". Sales only move sold counters and don't
+-- notify, so checkouts never wait on the notification queue.
+
+CREATE OR REPLACE FUNCTION notify_catalog_change(table_name TEXT, ids INTEGER[], related JSONB DEFAULT '{}')
+RETURNS VOID AS $$
+DECLARE
+    payload TEXT;
+BEGIN
+    IF cardinality(ids) = 0 THEN
+        RETURN;
+    END IF;
+    payload := (jsonb_build_object('table', table_name, 'ids', to_jsonb(ids)) || related)::TEXT;
+    -- pg_notify payloads are limited to 8000 bytes
+    IF octet_length(payload) > 7900 THEN
+        payload := jsonb_build_object('table', table_name, 'ids', NULL)::TEXT;
+    END IF;
+    PERFORM pg_notify('catalog_changes', payload);
+END;
+$$ LANGUAGE plpgsql;
+
+-- venues, artists, event_types
+CREATE OR REPLACE FUNCTION catalog_rows_changed()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        PERFORM notify_catalog_change(TG_TABLE_NAME, ARRAY(SELECT id FROM old_rows ORDER BY id));
+    ELSE
+        PERFORM notify_catalog_change(TG_TABLE_NAME, ARRAY(SELECT id FROM new_rows ORDER BY id));
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- events, with the artists, venues and types they pointed to before and after
+CREATE OR REPLACE FUNCTION catalog_events_changed()
+RETURNS TRIGGER AS $$
+DECLARE
+    changed events[];
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        changed := ARRAY(SELECT n FROM new_rows n);
+    ELSIF TG_OP = 'UPDATE' THEN
+        changed := ARRAY(SELECT n FROM new_rows n UNION ALL SELECT o FROM old_rows o);
+    ELSE
+        changed := ARRAY(SELECT o FROM old_rows o);
+    END IF;
+
+    PERFORM notify_catalog_change('events',
+        ARRAY(SELECT DISTINCT c.id FROM unnest(changed) c ORDER BY 1),
+        jsonb_build_object(
+            'artist_ids', ARRAY(SELECT DISTINCT c.artist_id FROM unnest(changed) c WHERE c.artist_id IS NOT NULL ORDER BY 1),
+            'venue_ids', ARRAY(SELECT DISTINCT c.venue_id FROM unnest(changed) c WHERE c.venue_id IS NOT NULL ORDER BY 1),
+            'type_ids', ARRAY(SELECT DISTINCT c.type_id FROM unnest(changed) c WHERE c.type_id IS NOT NULL ORDER BY 1)
+        ));
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Ticket tiers: new, removed, repriced or resized, not sold counter changes
+CREATE OR REPLACE FUNCTION catalog_tickets_changed()
+RETURNS TRIGGER AS $$
+DECLARE
+    changed tickets[];
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        changed := ARRAY(SELECT n FROM new_rows n);
+    ELSIF TG_OP = 'UPDATE' THEN
+        changed := ARRAY(
+            SELECT n FROM new_rows n
+            JOIN old_rows o ON o.id = n.id
+            WHERE (n.event_id, n.location, n.price, n.quantity_available, n.stripes)
+                  IS DISTINCT FROM (o.event_id, o.location, o.price, o.quantity_available, o.stripes)
+        );
+    ELSE
+        changed := ARRAY(SELECT o FROM old_rows o);
+    END IF;
+
+    PERFORM notify_catalog_change('tickets',
+        ARRAY(SELECT DISTINCT c.id FROM unnest(changed) c ORDER BY 1),
+        jsonb_build_object('event_ids', ARRAY(SELECT DISTINCT c.event_id FROM unnest(changed) c ORDER BY 1)));
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Seat maps: sections (rows are always replaced with their section)
+CREATE OR REPLACE FUNCTION catalog_sections_changed()
+RETURNS TRIGGER AS $$
+DECLARE
+    changed venue_sections[];
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        changed := ARRAY(SELECT n FROM new_rows n);
+    ELSIF TG_OP = 'UPDATE' THEN
+        changed := ARRAY(SELECT n FROM new_rows n UNION ALL SELECT o FROM old_rows o);
+    ELSE
+        changed := ARRAY(SELECT o FROM old_rows o);
+    END IF;
+
+    PERFORM notify_catalog_change('venue_sections',
+        ARRAY(SELECT DISTINCT c.id FROM unnest(changed) c ORDER BY 1),
+        jsonb_build_object('venue_ids', ARRAY(SELECT DISTINCT c.venue_id FROM unnest(changed) c ORDER BY 1)));
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DO $$
+DECLARE
+    target RECORD;
+BEGIN
+    FOR target IN
+        SELECT * FROM (VALUES
+            ('venues', 'catalog_rows_changed'),
+            ('artists', 'catalog_rows_changed'),
+            ('event_types', 'catalog_rows_changed'),
+            ('events', 'catalog_events_changed'),
+            ('tickets', 'catalog_tickets_changed'),
+            ('venue_sections', 'catalog_sections_changed')
+        ) AS t(table_name, function_name)
+    LOOP
+        EXECUTE format('DROP TRIGGER IF EXISTS catalog_changes_insert ON %I', target.table_name);
+        EXECUTE format('CREATE TRIGGER catalog_changes_insert AFTER INSERT ON %I
+            REFERENCING NEW TABLE AS new_rows
+            FOR EACH STATEMENT EXECUTE FUNCTION %I()', target.table_name, target.function_name);
+        EXECUTE format('DROP TRIGGER IF EXISTS catalog_changes_update ON %I', target.table_name);
+        EXECUTE format('CREATE TRIGGER catalog_changes_update AFTER UPDATE ON %I
+            REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+            FOR EACH STATEMENT EXECUTE FUNCTION %I()', target.table_name, target.function_name);
+        EXECUTE format('DROP TRIGGER IF EXISTS catalog_changes_delete ON %I', target.table_name);
+        EXECUTE format('CREATE TRIGGER catalog_changes_delete AFTER DELETE ON %I
+            REFERENCING OLD TABLE AS old_rows
+            FOR EACH STATEMENT EXECUTE FUNCTION %I()', target.table_name, target.function_name);
+    END LOOP;
+END $$;
@@ -0,0 +1,9 @@
+-- Orders paid for after their tier sold out. The sale is not recorded (the
+-- order item is marked oversold instead) and the order is flagged for an
+-- admin to refund or resolve; refunds only give back the items that were
+-- actually claimed.
+
+ALTER TABLE orders ADD COLUMN IF NOT EXISTS needs_review BOOLEAN NOT NULL DEFAULT FALSE;
+ALTER TABLE order_items ADD COLUMN IF NOT EXISTS oversold BOOLEAN NOT NULL DEFAULT FALSE;
+
+CREATE INDEX IF NOT EXISTS idx_orders_needs_review ON orders (order_date DESC) WHERE needs_review;
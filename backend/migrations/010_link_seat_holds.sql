@@ -0,0 +1,20 @@
+-- Seat holds bought through the cart. A cart item can carry the hold its
+-- seats come from (one item per hold, next to the usual one item per tier);
+-- checkout moves the hold to 'ordered' and ties it to the order, so it no
+-- longer expires while the payment is pending. Paying sells the seats,
+-- cancelling or refunding the order gives them back.
+
+ALTER TABLE cart_items ADD COLUMN IF NOT EXISTS seat_hold_id INTEGER REFERENCES seat_holds(id) ON DELETE CASCADE;
+
+ALTER TABLE cart_items DROP CONSTRAINT IF EXISTS cart_items_user_id_ticket_id_key;
+CREATE UNIQUE INDEX IF NOT EXISTS idx_cart_items_user_ticket ON cart_items (user_id, ticket_id) WHERE seat_hold_id IS NULL;
+CREATE UNIQUE INDEX IF NOT EXISTS idx_cart_items_seat_hold ON cart_items (seat_hold_id);
+
+-- orders is partitioned by order_date, so the order id is not a foreign key
+ALTER TABLE seat_holds ADD COLUMN IF NOT EXISTS order_id INTEGER;
+
+ALTER TABLE seat_holds DROP CONSTRAINT IF EXISTS seat_holds_status_check;
+ALTER TABLE seat_holds ADD CONSTRAINT seat_holds_status_check
+    CHECK (status IN ('held', 'ordered', 'confirmed', 'released'));
+
+CREATE INDEX IF NOT EXISTS idx_seat_holds_order ON seat_holds (order_id) WHERE order_id IS NOT NULL;
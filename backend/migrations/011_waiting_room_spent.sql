@@ -0,0 +1,10 @@
+-- Waiting room admissions spent by a checkout, shared by all workers. The
+-- id names the queue position the admission was issued for; rows outlive
+-- that position's queue token and are then pruned by the next spend.
+
+CREATE TABLE IF NOT EXISTS waiting_room_spent (
+    jti TEXT PRIMARY KEY,
+    expires_at TIMESTAMPTZ NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_waiting_room_spent_expires ON waiting_room_spent (expires_at);
@@ -0,0 +1,37 @@
+#!/usr/bin/env python3
+"""
+Script para conciliar órdenes pendientes con PayPal.
+Completa las órdenes cuyo pago fue aprobado y cancela las que expiraron.
+Pensado para ejecutarse periódicamente (cron, Railway/Render scheduled job).
+"""
+
+import argparse
+import sys
+from utils.payments import reconcile_pending_orders
+
+def main():
+    """Función principal"""
+    parser = argparse.ArgumentParser(description='Conciliar órdenes pendientes con PayPal')
+    parser.add_argument('--stale-minutes', type=int, help='Antigüedad mínima de la orden en minutos')
+    parser.add_argument('--batch-size', type=int, help='Órdenes por lote')
+    parser.add_argument('--concurrency', type=int, help='Consultas simultáneas a PayPal')
+    args = parser.parse_args()
+
+    print("🔄 Conciliando órdenes pendientes...")
+
+    try:
+        summary = reconcile_pending_orders(
+            stale_minutes=args.stale_minutes,
+            batch_size=args.batch_size,
+            concurrency=args.concurrency
+        )
+    except Exception as e:
+        print(f"❌ Error conciliando órdenes: {e}")
+        sys.exit(1)
+
+    print(f"✅ Revisadas: {summary['checked']}, "
+          f"completadas: {summary['completed']}, "
+          f"canceladas: {summary['cancelled']}")
+
+if __name__ == "__main__":
+    main()
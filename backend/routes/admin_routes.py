@@ -1,6 +1,12 @@
 from flask import Blueprint, request, jsonify
 from datetime import datetime
+from config import Config
 from utils.db import get_db
+from utils.responses import stream_json
+from utils.payments import reconcile_pending_orders
+from utils import inventory
+from utils import seat_map
+from utils import autocomplete
 from routes.auth_routes import require_admin
 
 admin_bp = Blueprint('admin', __name__)
@@ -16,7 +22,7 @@ def get_all_events():
         
         offset = (page - 1) * per_page
         
-        events = db.execute_query("""
+        query = """
             SELECT 
                 e.id, e.title, e.description, e.event_date, e.event_time, 
                 e.image_url, e.status, e.created_at,
@@ -29,18 +35,25 @@ def get_all_events():
             LEFT JOIN artists a ON e.artist_id = a.id
             ORDER BY e.created_at DESC
             LIMIT %s OFFSET %s
-        """, (per_page, offset), fetch=True)
+        """
         
         total_count = db.execute_query("SELECT COUNT(*) FROM events", fetch='one')['count']
+        pagination = {
+            'page': page,
+            'per_page': per_page,
+            'total': total_count,
+            'pages': (total_count + per_page - 1) // per_page
+        }
+        
+        # Large pages are sent row by row from a server-side cursor
+        if per_page >= Config.DB_STREAM_MIN_ROWS:
+            return stream_json({'pagination': pagination}, 'events', db.stream(query, (per_page, offset)))
+        
+        events = db.execute_query(query, (per_page, offset), fetch=True)
         
         return jsonify({
             'events': events or [],
-            'pagination': {
-                'page': page,
-                'per_page': per_page,
-                'total': total_count,
-                'pages': (total_count + per_page - 1) // per_page
-            }
+            'pagination': pagination
         }), 200
         
     except Exception as e:
@@ -75,6 +88,8 @@ def create_event():
                     VALUES (%s, %s, %s, %s)
                 """, (event_id, ticket['location'], ticket['price'], ticket['quantity']))
         
+        autocomplete.refresh_event(event_id, data)
+        
         return jsonify({'message': 'Event created successfully', 'event_id': event_id}), 201
         
     except Exception as e:
@@ -103,8 +118,8 @@ def get_event_admin(event_id):
             return jsonify({'error': 'Event not found'}), 404
         
         tickets = db.execute_query("""
-            SELECT id, location, price, quantity_available, quantity_sold
-            FROM tickets WHERE event_id = %s ORDER BY price ASC
+            SELECT id, location, price, quantity_available, quantity_sold, stripes
+            FROM ticket_inventory WHERE event_id = %s ORDER BY price ASC
         """, (event_id,), fetch=True)
         
         event_data = dict(event)
@@ -123,7 +138,9 @@ def update_event(event_id):
         data = request.get_json()
         
         # Check if event exists
-        existing_event = db.execute_query("SELECT id FROM events WHERE id = %s", (event_id,), fetch='one')
+        existing_event = db.execute_query(
+            "SELECT id, artist_id, venue_id, type_id FROM events WHERE id = %s", (event_id,), fetch='one'
+        )
         if not existing_event:
             return jsonify({'error': 'Event not found'}), 404
         
@@ -152,6 +169,8 @@ def update_event(event_id):
                     VALUES (%s, %s, %s, %s)
                 """, (event_id, ticket['location'], ticket['price'], ticket['quantity']))
         
+        autocomplete.refresh_event(event_id, existing_event, data)
+        
         return jsonify({'message': 'Event updated successfully'}), 200
         
     except Exception as e:
@@ -163,19 +182,57 @@ def update_event(event_id):
 def delete_event(event_id):
     try:
         # Check if event exists
-        existing_event = db.execute_query("SELECT id FROM events WHERE id = %s", (event_id,), fetch='one')
+        existing_event = db.execute_query(
+            "SELECT id, artist_id, venue_id, type_id FROM events WHERE id = %s", (event_id,), fetch='one'
+        )
         if not existing_event:
             return jsonify({'error': 'Event not found'}), 404
         
         # Delete event (cascade will handle tickets)
         db.execute_query("DELETE FROM events WHERE id = %s", (event_id,))
         
+        autocomplete.refresh_event(event_id, existing_event)
+        
         return jsonify({'message': 'Event deleted successfully'}), 200
         
     except Exception as e:
         print(f"Delete event error: {e}")
         return jsonify({'error': 'Internal server error'}), 500
 
+@admin_bp.route('/tickets/<int:ticket_id>/stripes', methods=['PUT'])
+@require_admin
+def update_ticket_stripes(ticket_id):
+    try:
+        data = request.get_json()
+        stripes = data.get('stripes')
+        
+        if not isinstance(stripes, int) or stripes < 0:
+            return jsonify({'error': 'stripes must be a non-negative integer'}), 400
+        
+        if not inventory.enable_striping(ticket_id, stripes):
+            return jsonify({'error': 'Ticket not found'}), 404
+        
+        return jsonify({
+            'message': 'Ticket stripes updated successfully',
+            'stripes': inventory.get_stripes(ticket_id) or []
+        }), 200
+        
+    except Exception as e:
+        print(f"Update ticket stripes error: {e}")
+        return jsonify({'error': 'Internal server error'}), 500
+
+@admin_bp.route('/tickets/<int:ticket_id>/stripes/rebalance', methods=['POST'])
+@require_admin
+def rebalance_ticket_stripes(ticket_id):
+    try:
+        inventory.rebalance(ticket_id)
+        
+        return jsonify({'stripes': inventory.get_stripes(ticket_id) or []}), 200
+        
+    except Exception as e:
+        print(f"Rebalance ticket stripes error: {e}")
+        return jsonify({'error': 'Internal server error'}), 500
+
 # Event Types Management
 @admin_bp.route('/event-types', methods=['GET'])
 @require_admin
@@ -229,6 +286,8 @@ def update_event_type(type_id):
             WHERE id = %s
         """, (data.get('name'), data.get('description'), type_id))
         
+        autocomplete.refresh('event_type', type_id)
+        
         return jsonify({'message': 'Event type updated successfully'}), 200
         
     except Exception as e:
@@ -246,6 +305,8 @@ def delete_event_type(type_id):
         
         db.execute_query("DELETE FROM event_types WHERE id = %s", (type_id,))
         
+        autocomplete.refresh('event_type', type_id)
+        
         return jsonify({'message': 'Event type deleted successfully'}), 200
         
     except Exception as e:
@@ -307,6 +368,8 @@ def update_venue(venue_id):
             WHERE id = %s
         """, (data.get('name'), data.get('address'), data.get('city'), data.get('capacity'), venue_id))
         
+        autocomplete.refresh('venue', venue_id)
+        
         return jsonify({'message': 'Venue updated successfully'}), 200
         
     except Exception as e:
@@ -324,12 +387,72 @@ def delete_venue(venue_id):
         
         db.execute_query("DELETE FROM venues WHERE id = %s", (venue_id,))
         
+        autocomplete.refresh('venue', venue_id)
+        
         return jsonify({'message': 'Venue deleted successfully'}), 200
         
     except Exception as e:
         print(f"Delete venue error: {e}")
         return jsonify({'error': 'Internal server error'}), 500
 
+@admin_bp.route('/venues/<int:venue_id>/seat-map', methods=['GET'])
+@require_admin
+def get_venue_seat_map(venue_id):
+    try:
+        return jsonify({'venue_id': venue_id, 'sections': seat_map.get_venue_layout(venue_id)}), 200
+        
+    except Exception as e:
+        print(f"Get venue seat map error: {e}")
+        return jsonify({'error': 'Internal server error'}), 500
+
+@admin_bp.route('/venues/<int:venue_id>/seat-map', methods=['PUT'])
+@require_admin
+def update_venue_seat_map(venue_id):
+    try:
+        data = request.get_json()
+        sections = data.get('sections')
+        
+        if not sections or not isinstance(sections, list):
+            return jsonify({'error': 'sections is required'}), 400
+        
+        for section in sections:
+            if not section.get('name') or not section.get('rows'):
+                return jsonify({'error': 'Each section needs a name and rows'}), 400
+            for row in section['rows']:
+                if not row.get('label') or not isinstance(row.get('seats'), int) or row['seats'] <= 0:
+                    return jsonify({'error': 'Each row needs a label and a positive number of seats'}), 400
+        
+        existing_venue = db.execute_query("SELECT id FROM venues WHERE id = %s", (venue_id,), fetch='one')
+        if not existing_venue:
+            return jsonify({'error': 'Venue not found'}), 404
+        
+        try:
+            seat_map.save_venue_layout(venue_id, sections)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 409
+        
+        return jsonify({'message': 'Seat map updated successfully'}), 200
+        
+    except Exception as e:
+        print(f"Update venue seat map error: {e}")
+        return jsonify({'error': 'Internal server error'}), 500
+
+@admin_bp.route('/events/<int:event_id>/seats', methods=['POST'])
+@require_admin
+def init_event_seats(event_id):
+    try:
+        data = request.get_json(silent=True) or {}
+        section_tickets = {int(k): v for k, v in (data.get('section_tickets') or {}).items()}
+        
+        if not seat_map.init_event_seats(event_id, section_tickets):
+            return jsonify({'error': 'Event not found or its venue has no seat map'}), 404
+        
+        return jsonify({'message': 'Event seats created successfully'}), 201
+        
+    except Exception as e:
+        print(f"Init event seats error: {e}")
+        return jsonify({'error': 'Internal server error'}), 500
+
 # Artists Management
 @admin_bp.route('/artists', methods=['GET'])
 @require_admin
@@ -383,6 +506,8 @@ def update_artist(artist_id):
             WHERE id = %s
         """, (data.get('name'), data.get('bio'), data.get('image_url'), artist_id))
         
+        autocomplete.refresh('artist', artist_id)
+        
         return jsonify({'message': 'Artist updated successfully'}), 200
         
     except Exception as e:
@@ -400,6 +525,8 @@ def delete_artist(artist_id):
         
         db.execute_query("DELETE FROM artists WHERE id = %s", (artist_id,))
         
+        autocomplete.refresh('artist', artist_id)
+        
         return jsonify({'message': 'Artist deleted successfully'}), 200
         
     except Exception as e:
@@ -469,52 +596,82 @@ def get_all_orders():
         page = int(request.args.get('page', 1))
         per_page = int(request.args.get('per_page', 20))
         status = request.args.get('status')
+        needs_review = request.args.get('needs_review') == 'true'
         
         offset = (page - 1) * per_page
         
+        # Items are counted per order of the page only, so the newest orders
+        # are read from the latest monthly partitions through idx_orders_date
         query = """
             SELECT 
-                o.id, o.order_date, o.status, o.total_amount,
+                o.id, o.order_date, o.status, o.total_amount, o.needs_review,
                 u.name as user_name, u.email as user_email,
-                COUNT(oi.id) as total_tickets
+                (SELECT COUNT(*) FROM order_items oi
+                 WHERE oi.order_id = o.id AND oi.order_date = o.order_date) as total_tickets
             FROM orders o
             JOIN users u ON o.user_id = u.id
-            LEFT JOIN order_items oi ON o.id = oi.order_id
         """
         
+        conditions = []
         params = []
         if status:
-            query += " WHERE o.status = %s"
+            conditions.append("o.status = %s")
             params.append(status)
+        if needs_review:
+            # Paid orders that oversold a tier (see complete_payment)
+            conditions.append("o.needs_review")
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
         
         query += """
-            GROUP BY o.id, o.order_date, o.status, o.total_amount, u.name, u.email
             ORDER BY o.order_date DESC
             LIMIT %s OFFSET %s
         """
         params.extend([per_page, offset])
         
-        orders = db.execute_query(query, params, fetch=True)
-        
         # Get total count
-        count_query = "SELECT COUNT(*) FROM orders"
-        count_params = []
-        if status:
-            count_query += " WHERE status = %s"
-            count_params.append(status)
+        count_query = "SELECT COUNT(*) FROM orders o"
+        count_params = params[:-2]
+        if conditions:
+            count_query += " WHERE " + " AND ".join(conditions)
         
         total_count = db.execute_query(count_query, count_params, fetch='one')['count']
+        pagination = {
+            'page': page,
+            'per_page': per_page,
+            'total': total_count,
+            'pages': (total_count + per_page - 1) // per_page
+        }
+        
+        # Large pages are sent row by row from a server-side cursor
+        if per_page >= Config.DB_STREAM_MIN_ROWS:
+            return stream_json({'pagination': pagination}, 'orders', db.stream(query, params))
+        
+        orders = db.execute_query(query, params, fetch=True)
         
         return jsonify({
             'orders': orders or [],
-            'pagination': {
-                'page': page,
-                'per_page': per_page,
-                'total': total_count,
-                'pages': (total_count + per_page - 1) // per_page
-            }
+            'pagination': pagination
         }), 200
         
     except Exception as e:
         print(f"Get all orders error: {e}")
         return jsonify({'error': 'Internal server error'}), 500
+
+@admin_bp.route('/orders/reconcile', methods=['POST'])
+@require_admin
+def reconcile_orders():
+    try:
+        data = request.get_json(silent=True) or {}
+        
+        summary = reconcile_pending_orders(
+            stale_minutes=data.get('stale_minutes'),
+            batch_size=data.get('batch_size'),
+            concurrency=data.get('concurrency')
+        )
+        
+        return jsonify(summary), 200
+        
+    except Exception as e:
+        print(f"Reconcile orders error: {e}")
+        return jsonify({'error': 'Internal server error'}), 500
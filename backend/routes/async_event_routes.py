@@ -0,0 +1,368 @@
+import asyncio
+import json
+import time
+from functools import wraps
+import jwt
+from starlette.responses import Response, StreamingResponse
+from starlette.routing import Route
+from config import Config
+from utils.async_db import async_db
+from utils.async_payments import async_gateway, start_payment, cancel_order
+from utils import availability, seat_map
+from utils.circuit_breaker import CallRejectedError
+from utils.payments import PaymentError, payment_queue, order_key
+from routes.event_routes import (
+    EVENTS_QUERY, EVENT_DETAILS_QUERY, EVENT_TICKETS_QUERY,
+    CART_QUERY, CART_TICKET_QUERY, CHECKOUT_CART_QUERY, catalog_cache
+)
+from routes.waiting_room_routes import admission_required, spend_admissions, ADMISSION_SPENT_ERROR
+from app import JSONProvider
+
+# Async variants of the catalog, availability stream, cart and checkout routes
+# of event_routes.py, served by asgi.py. Same URLs, SQL and JSON; everything
+# else stays on the sync blueprints.
+
+def render_json(data):
+    """JSON exactly as the sync app's jsonify() writes it"""
+    return json.dumps(data, default=JSONProvider.default, sort_keys=True, separators=(',', ':')) + '\n'
+
+def json_response(data, status=200, headers=None):
+    return Response(render_json(data), status, headers, media_type='application/json')
+
+async def cached_json(key, compute):
+    """
+    JSON response for await compute() -> (data, status), kept in the sync
+    routes' catalog_cache under the same key, so both invalidate together
+    """
+    async def render():
+        data, status = await compute()
+        return render_json(data), status
+
+    body, status = await catalog_cache.get_async(key, render)
+    return Response(body, status, media_type='application/json')
+
+def require_auth(f):
+    """Decorator to require authentication"""
+    @wraps(f)
+    async def decorated_function(request):
+        token = request.headers.get('Authorization')
+        if not token:
+            return json_response({'error': 'Token is required'}, 401)
+
+        if token.startswith('Bearer '):
+            token = token[7:]
+
+        try:
+            request.state.user = jwt.decode(token, Config.JWT_SECRET_KEY, algorithms=['HS256'])
+        except jwt.ExpiredSignatureError:
+            return json_response({'error': 'Token has expired'}, 401)
+        except jwt.InvalidTokenError:
+            return json_response({'error': 'Invalid token'}, 401)
+
+        return await f(request)
+
+    return decorated_function
+
+def payment_unavailable(error):
+    """Fast failure response used while the payment provider is degraded"""
+    return json_response({'error': 'Payment service temporarily unavailable'}, 503, {
+        'Retry-After': str(error.retry_after)
+    })
+
+def admission_error(request, event_ids):
+    error = admission_required(event_ids, request.headers.get('X-Admission-Token'), request.state.user['user_id'])
+    return json_response(error, 429) if error else None
+
+async def get_events(request):
+    try:
+        return await cached_json(('events',), list_events)
+    except Exception as e:
+        print(f"Get events error: {e}")
+        return json_response({'error': 'Internal server error'}, 500)
+
+async def list_events():
+    events = await async_db.execute_query(EVENTS_QUERY, fetch=True)
+
+    return {
+        'events': events,
+        'pagination': {
+            'page': 1,
+            'per_page': len(events),
+            'total': len(events),
+            'pages': 1
+        }
+    }, 200
+
+async def get_event_details(request):
+    event_id = request.path_params['event_id']
+    try:
+        return await cached_json(('event', event_id), lambda: event_details(event_id))
+    except Exception as e:
+        print(f"Get event details error: {e}")
+        return json_response({'error': 'Internal server error'}, 500)
+
+async def event_details(event_id):
+    event = await async_db.execute_query(EVENT_DETAILS_QUERY, (event_id,), fetch='one')
+
+    if not event:
+        return {'error': 'Event not found'}, 404
+
+    tickets = []
+    if not event['sold_out']:
+        tickets = await async_db.execute_query(EVENT_TICKETS_QUERY, (event_id,), fetch=True)
+
+    event['tickets'] = tickets
+    return event, 200
+
+async def stream_availability(request):
+    event_id = request.path_params['event_id']
+    try:
+        event = await async_db.execute_query(
+            "SELECT id FROM events WHERE id = %s AND status = 'active'", (event_id,), fetch='one'
+        )
+        if not event:
+            return json_response({'error': 'Event not found'}, 404)
+
+        # The first viewer of an event reads its availability with the sync db
+        loop = asyncio.get_running_loop()
+        subscription, snapshot = await loop.run_in_executor(None, availability.feed.subscribe, event_id, loop)
+
+    except Exception as e:
+        print(f"Availability stream error: {e}")
+        return json_response({'error': 'Internal server error'}, 500)
+
+    async def generate():
+        # Same messages as the sync stream; a viewer waiting for changes
+        # holds no thread
+        try:
+            yield f"retry: 2000\n{availability.format_sse('snapshot', snapshot)}"
+            deadline = time.time() + Config.AVAILABILITY_STREAM_MAX_SECONDS
+            while time.time() < deadline:
+                message = await subscription.next(timeout=Config.AVAILABILITY_HEARTBEAT)
+                if message is None:
+                    yield ": keep-alive\n\n"
+                else:
+                    yield availability.format_sse(*message)
+        finally:
+            availability.feed.unsubscribe(subscription)
+
+    return StreamingResponse(generate(), media_type='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
+@require_auth
+async def get_cart(request):
+    try:
+        cart_items = await async_db.execute_query(CART_QUERY, (request.state.user['user_id'],), fetch=True)
+
+        total = sum(item['price'] * item['quantity'] for item in cart_items)
+
+        return json_response({
+            'items': cart_items,
+            'total': float(total)
+        })
+
+    except Exception as e:
+        print(f"Get cart error: {e}")
+        return json_response({'error': 'Internal server error'}, 500)
+
+@require_auth
+async def add_to_cart(request):
+    try:
+        user_id = request.state.user['user_id']
+        data = await request.json()
+
+        ticket_id = data.get('ticket_id')
+        quantity = data.get('quantity', 1)
+        seat_hold_id = data.get('seat_hold_id')
+
+        # Held seats go in as one item, priced by the tier of their sections
+        if seat_hold_id:
+            hold = await async_db.execute_query(seat_map.CART_HOLD_QUERY, (seat_hold_id, user_id), fetch='one')
+            if not hold:
+                return json_response({'error': 'Seat hold not found or expired'}, 404)
+            ticket_id, quantity = seat_map.hold_cart_item(hold)
+            if not ticket_id:
+                return json_response({'error': 'The held seats are not priced by a single ticket tier'}, 400)
+
+        if not ticket_id or quantity <= 0:
+            return json_response({'error': 'Invalid ticket_id or quantity'}, 400)
+
+        ticket = await async_db.execute_query(CART_TICKET_QUERY, (ticket_id,), fetch='one')
+
+        if not ticket:
+            return json_response({'error': 'Ticket not found'}, 404)
+
+        # Flash sales only let admitted buyers through
+        admission_response = admission_error(request, [ticket['event_id']])
+        if admission_response:
+            return admission_response
+
+        available = ticket['quantity_available'] - ticket['quantity_sold']
+        if available < quantity:
+            return json_response({'error': f'Only {available} tickets available'}, 400)
+
+        if seat_hold_id:
+            await async_db.execute_query("""
+                INSERT INTO cart_items (user_id, ticket_id, quantity, seat_hold_id)
+                VALUES (%s, %s, %s, %s)
+                ON CONFLICT (seat_hold_id) DO NOTHING
+            """, (user_id, ticket_id, quantity, seat_hold_id))
+            return json_response({'message': 'Item added to cart successfully'})
+
+        existing_item = await async_db.execute_query("""
+            SELECT id, quantity FROM cart_items
+            WHERE user_id = %s AND ticket_id = %s AND seat_hold_id IS NULL
+        """, (user_id, ticket_id), fetch='one')
+
+        if existing_item:
+            new_quantity = existing_item['quantity'] + quantity
+            if available < new_quantity:
+                return json_response({'error': f'Only {available} tickets available'}, 400)
+
+            await async_db.execute_query("""
+                UPDATE cart_items SET quantity = %s
+                WHERE user_id = %s AND ticket_id = %s AND seat_hold_id IS NULL
+            """, (new_quantity, user_id, ticket_id))
+        else:
+            await async_db.execute_query("""
+                INSERT INTO cart_items (user_id, ticket_id, quantity)
+                VALUES (%s, %s, %s)
+            """, (user_id, ticket_id, quantity))
+
+        return json_response({'message': 'Item added to cart successfully'})
+
+    except Exception as e:
+        print(f"Add to cart error: {e}")
+        return json_response({'error': 'Internal server error'}, 500)
+
+@require_auth
+async def remove_from_cart(request):
+    item_id = request.path_params['item_id']
+    user_id = request.state.user['user_id']
+    try:
+        removed = await async_db.execute_query("""
+            DELETE FROM cart_items
+            WHERE id = %s AND user_id = %s
+            RETURNING seat_hold_id
+        """, (item_id, user_id))
+
+        if removed and removed[0]['seat_hold_id']:
+            # Seat bitmaps are only updated by the sync seat_map module
+            await asyncio.get_running_loop().run_in_executor(
+                None, seat_map.release_hold, removed[0]['seat_hold_id'], user_id
+            )
+
+        return json_response({'message': 'Item removed from cart'})
+
+    except Exception as e:
+        print(f"Remove from cart error: {e}")
+        return json_response({'error': 'Internal server error'}, 500)
+
+@require_auth
+async def checkout(request):
+    try:
+        user_id = request.state.user['user_id']
+
+        # Fail fast, before touching the database, while the provider is down
+        if not payment_queue:
+            try:
+                async_gateway.ensure_available()
+            except CallRejectedError as e:
+                return payment_unavailable(e)
+
+        cart_items = await async_db.execute_query(CHECKOUT_CART_QUERY, (user_id,), fetch=True)
+
+        if not cart_items:
+            return json_response({'error': 'Cart is empty'}, 400)
+
+        # Flash sales only let admitted buyers through
+        admission_response = admission_error(request, [item['event_id'] for item in cart_items])
+        if admission_response:
+            return admission_response
+
+        total_amount = 0
+        for item in cart_items:
+            available = item['quantity_available'] - item['quantity_sold']
+            if available < item['quantity']:
+                return json_response({'error': 'Insufficient tickets available'}, 400)
+            total_amount += item['price'] * item['quantity']
+
+        # Create the order and its items (in the order's monthly partition),
+        # and keep the held seats in the cart held for the order
+        hold_ids = [item['seat_hold_id'] for item in cart_items if item['seat_hold_id']]
+        try:
+            async with async_db.transaction() as cursor:
+                await cursor.execute("""
+                    INSERT INTO orders (user_id, total_amount, status)
+                    VALUES (%s, %s, 'pending') RETURNING id, order_date
+                """, (user_id, total_amount))
+                order = cursor.fetchone()
+                for item in cart_items:
+                    await cursor.execute("""
+                        INSERT INTO order_items (order_id, order_date, ticket_id, quantity, price)
+                        VALUES (%s, %s, %s, %s, %s)
+                    """, (order['id'], order['order_date'], item['ticket_id'], item['quantity'], item['price']))
+                if hold_ids:
+                    await cursor.execute(seat_map.ORDER_HOLDS_QUERY, (order['id'], hold_ids, user_id))
+                    if len(cursor.fetchall()) != len(hold_ids):
+                        raise seat_map.HoldExpiredError('Some of the held seats are no longer held')
+        except seat_map.HoldExpiredError:
+            # Releasing the expired holds takes them out of the cart
+            for event_id in {item['event_id'] for item in cart_items if item['seat_hold_id']}:
+                await asyncio.get_running_loop().run_in_executor(None, seat_map.release_expired_holds, event_id)
+            return json_response({'error': 'Some seat holds in the cart expired and were removed from it'}, 409)
+        order_id = order['id']
+
+        # Each waiting room admission buys once
+        if not await asyncio.get_running_loop().run_in_executor(
+                None, spend_admissions, [item['event_id'] for item in cart_items],
+                request.headers.get('X-Admission-Token'), user_id):
+            await cancel_order(order_id)
+            return json_response(ADMISSION_SPENT_ERROR, 429)
+
+        # Hand the gateway call to the background workers when the queue is enabled
+        if payment_queue:
+            payment_queue.enqueue('create_payment', {
+                'order_id': order_id,
+                'user_id': user_id,
+                'amount': total_amount
+            }, key=order_key(order_id))
+
+            return json_response({
+                'order_id': order_id,
+                'status': 'queued',
+                'status_url': f'/api/orders/{order_id}/payment',
+                'total_amount': float(total_amount)
+            }, 202)
+
+        try:
+            payment = await start_payment(order_id, total_amount)
+        except CallRejectedError as e:
+            await cancel_order(order_id)
+            return payment_unavailable(e)
+        except PaymentError:
+            await cancel_order(order_id)
+            return json_response({'error': 'Failed to create payment'}, 500)
+
+        return json_response({
+            'order_id': order_id,
+            'payment_id': payment['payment_id'],
+            'approval_url': payment['approval_url'],
+            'total_amount': float(total_amount)
+        })
+
+    except Exception as e:
+        print(f"Checkout error: {e}")
+        return json_response({'error': 'Internal server error'}, 500)
+
+async_event_routes = [
+    Route('/api/events', get_events, methods=['GET']),
+    Route('/api/events/{event_id:int}', get_event_details, methods=['GET']),
+    Route('/api/events/{event_id:int}/availability/stream', stream_availability, methods=['GET']),
+    Route('/api/cart', get_cart, methods=['GET']),
+    Route('/api/cart', add_to_cart, methods=['POST']),
+    Route('/api/cart/{item_id:int}', remove_from_cart, methods=['DELETE']),
+    Route('/api/checkout', checkout, methods=['POST']),
+]
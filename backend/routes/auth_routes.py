@@ -3,11 +3,20 @@ import bcrypt
 import jwt
 from datetime import datetime, timedelta
 from config import Config
-from utils.db import get_db
+from utils.db import get_db, register_query
 
 auth_bp = Blueprint('auth', __name__)
 db = get_db()
 
+USER_BY_EMAIL_QUERY = register_query('user_by_email', """
+    SELECT id, email, hashed_password, name, role FROM users WHERE email = %s
+""", prepare=True)
+
+# On the primary: a replica may not have the account yet
+EMAIL_TAKEN_QUERY = register_query('email_taken', """
+    SELECT id FROM users WHERE email = %s
+""", read_only=False)
+
 @auth_bp.route('/register', methods=['POST'])
 def register():
     try:
@@ -24,11 +33,7 @@ def register():
         name = data['name'].strip()
         
         # Check if user already exists
-        existing_user = db.execute_query(
-            "SELECT id FROM users WHERE email = %s",
-            (email,),
-            fetch='one'
-        )
+        existing_user = db.fetch_value(EMAIL_TAKEN_QUERY, (email,))
         
         if existing_user:
             return jsonify({'error': 'User already exists with this email'}), 400
@@ -36,12 +41,15 @@ def register():
         # Hash password
         hashed_password = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
         
-        # Insert new user
-        db.execute_query(
-            "INSERT INTO users (email, hashed_password, name) VALUES (%s, %s, %s)",
+        # Insert new user (unless a concurrent registration got there first)
+        inserted = db.execute(
+            "INSERT INTO users (email, hashed_password, name) VALUES (%s, %s, %s) ON CONFLICT (email) DO NOTHING",
             (email, hashed_password, name)
         )
         
+        if not inserted:
+            return jsonify({'error': 'User already exists with this email'}), 400
+        
         return jsonify({'message': 'User registered successfully'}), 201
         
     except Exception as e:
@@ -61,11 +69,7 @@ def login():
         password = data['password']
         
         # Get user from database
-        user = db.execute_query(
-            "SELECT id, email, hashed_password, name, role FROM users WHERE email = %s",
-            (email,),
-            fetch='one'
-        )
+        user = db.fetch_one(USER_BY_EMAIL_QUERY, (email,))
         
         if not user:
             return jsonify({'error': 'Invalid credentials'}), 401
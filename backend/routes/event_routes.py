@@ -1,110 +1,490 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, Response, current_app, request, jsonify, stream_with_context
 from datetime import datetime, date
-from utils.db import get_db
-from utils.paypal_integration import paypal
+import threading
+import time
+from config import Config
+from utils.db import get_db, register_query
+from utils.payments import (
+    payment_queue, order_key, start_payment, cancel_order,
+    execute_payment as execute_gateway_payment, apply_webhook_event, gateway, PaymentError
+)
+from utils.circuit_breaker import CallRejectedError
+from utils import seat_map, seat_search, autocomplete, availability, change_feed
+from utils.single_flight import SingleFlightCache
 from routes.auth_routes import require_auth
+from routes.waiting_room_routes import admission_error, spend_admissions, ADMISSION_SPENT_ERROR
 
 event_bp = Blueprint('events', __name__)
 db = get_db()
 
+# Hot queries, shared with the async routes (routes/async_event_routes.py)
+EVENTS_QUERY = register_query('events', """
+    SELECT 
+        e.id, e.title, e.description, e.event_date::text, e.event_time::text, 
+        e.image_url, e.status,
+        COALESCE(et.name, '') as event_type,
+        COALESCE(v.name, '') as venue_name,
+        COALESCE(v.city, '') as venue_city,
+        COALESCE(a.name, '') as artist_name,
+        COALESCE(s.min_price, 0)::float as min_price,
+        COALESCE(s.max_price, 0)::float as max_price,
+        s.remaining_inventory, s.sold_out
+    FROM events e
+    JOIN live_event_summaries s ON s.event_id = e.id
+    LEFT JOIN event_types et ON e.type_id = et.id
+    LEFT JOIN venues v ON e.venue_id = v.id
+    LEFT JOIN artists a ON e.artist_id = a.id
+    WHERE e.status = 'active'
+    ORDER BY e.event_date
+""")
+
+EVENT_DETAILS_QUERY = register_query('event_details', """
+    SELECT 
+        e.id, e.title, e.description, e.event_date, e.event_time, 
+        e.image_url, e.status,
+        et.name as event_type, et.description as type_description,
+        v.name as venue_name, v.address as venue_address, 
+        v.city as venue_city, v.capacity as venue_capacity,
+        a.name as artist_name, a.bio as artist_bio, a.image_url as artist_image,
+        s.min_price, s.max_price, s.total_inventory, s.remaining_inventory, s.sold_out
+    FROM events e
+    LEFT JOIN event_types et ON e.type_id = et.id
+    LEFT JOIN venues v ON e.venue_id = v.id
+    LEFT JOIN artists a ON e.artist_id = a.id
+    LEFT JOIN live_event_summaries s ON s.event_id = e.id
+    WHERE e.id = %s AND e.status = 'active'
+""", prepare=True)
+
+EVENT_TICKETS_QUERY = register_query('event_tickets', """
+    SELECT 
+        id, location, price, quantity_available, quantity_sold,
+        (quantity_available - quantity_sold) as available
+    FROM ticket_inventory 
+    WHERE event_id = %s AND (quantity_available - quantity_sold) > 0
+    ORDER BY price ASC
+""", prepare=True)
+
+CART_QUERY = register_query('cart', """
+    SELECT 
+        ci.id, ci.quantity, ci.seat_hold_id,
+        t.id as ticket_id, t.location, t.price,
+        e.id as event_id, e.title as event_title, 
+        e.event_date, e.event_time,
+        v.name as venue_name
+    FROM cart_items ci
+    JOIN tickets t ON ci.ticket_id = t.id
+    JOIN events e ON t.event_id = e.id
+    JOIN venues v ON e.venue_id = v.id
+    WHERE ci.user_id = %s
+    ORDER BY ci.created_at DESC
+""", prepare=True)
+
+CART_TICKET_QUERY = register_query('cart_ticket', """
+    SELECT id, event_id, location, price, quantity_available, quantity_sold
+    FROM ticket_inventory 
+    WHERE id = %s
+""", prepare=True)
+
+CHECKOUT_CART_QUERY = register_query('checkout_cart', """
+    SELECT 
+        ci.id, ci.quantity, ci.seat_hold_id,
+        t.id as ticket_id, t.event_id, t.price, t.quantity_available, t.quantity_sold
+    FROM cart_items ci
+    JOIN ticket_inventory t ON ci.ticket_id = t.id
+    WHERE ci.user_id = %s
+""")
+
+def payment_unavailable(error):
+    """Fast failure response used while the payment provider is degraded"""
+    return jsonify({'error': 'Payment service temporarily unavailable'}), 503, {
+        'Retry-After': str(error.retry_after)
+    }
+
+# Responses of the catalog endpoints, shared by concurrent identical requests
+# and dropped as soon as the events behind them change on any worker
+catalog_cache = SingleFlightCache(
+    Config.CATALOG_CACHE_TTL, Config.CATALOG_CACHE_STALE_TTL, Config.CATALOG_CACHE_MAX_ENTRIES
+)
+
+def _on_catalog_changed(change):
+    if change['ids'] is None or change['table'] in ('venues', 'artists', 'event_types'):
+        keys = ()
+    else:
+        event_ids = change['ids'] if change['table'] == 'events' else change.get('event_ids', [])
+        keys = (('events',), *[('event', event_id) for event_id in event_ids])
+    catalog_cache.invalidate(*keys)
+    if Config.DATABASE_REPLICA_URLS:
+        # Responses recomputed meanwhile may have been read from a replica
+        # that hadn't replayed the change yet
+        timer = threading.Timer(Config.REPLICA_MAX_LAG_SECONDS, catalog_cache.invalidate, keys)
+        timer.daemon = True
+        timer.start()
+
+for table in ('events', 'tickets', 'venues', 'artists', 'event_types'):
+    change_feed.subscribe(table, _on_catalog_changed)
+
+def cached_json(key, compute):
+    """
+    JSON response for compute() -> (data, status), serialized once and
+    shared through catalog_cache
+    """
+    def render():
+        data, status = compute()
+        return current_app.json.dumps(data, separators=(',', ':')) + '\n', status
+
+    body, status = catalog_cache.get(key, render)
+    return Response(body, status, mimetype='application/json')
+
 @event_bp.route('/events', methods=['GET'])
 def get_events():
     try:
-        # Get all events using Supabase API
-        events_data = db.execute_query('events')
-        
-        # Get related data
-        event_types = {et['id']: et for et in db.execute_query('event_types')}
-        venues = {v['id']: v for v in db.execute_query('venues')}
-        artists = {a['id']: a for a in db.execute_query('artists')}
-        tickets = db.execute_query('tickets')
-        
-        # Process events
-        events = []
-        for event in events_data:
-            if event['status'] == 'active':
-                # Get related data
-                event_type = event_types.get(event['type_id'], {})
-                venue = venues.get(event['venue_id'], {})
-                artist = artists.get(event['artist_id'], {})
-                
-                # Get ticket prices for this event
-                event_tickets = [t for t in tickets if t['event_id'] == event['id']]
-                prices = [t['price'] for t in event_tickets] if event_tickets else [0]
-                
-                processed_event = {
-                    'id': event['id'],
-                    'title': event['title'],
-                    'description': event['description'],
-                    'event_date': event['event_date'],
-                    'event_time': event['event_time'],
-                    'image_url': event['image_url'],
-                    'status': event['status'],
-                    'event_type': event_type.get('name', ''),
-                    'venue_name': venue.get('name', ''),
-                    'venue_city': venue.get('city', ''),
-                    'artist_name': artist.get('name', ''),
-                    'min_price': min(prices) if prices else 0,
-                    'max_price': max(prices) if prices else 0
-                }
-                events.append(processed_event)
-        
-        # Sort by date
-        events.sort(key=lambda x: x['event_date'])
-        
+        return cached_json(('events',), list_events)
+    except Exception as e:
+        print(f"Get events error: {e}")
+        return jsonify({'error': 'Internal server error'}), 500
+
+def list_events():
+    # Prices and stock come from event_summaries, one row per event
+    # whatever the number of ticket tiers
+    events = db.fetch_all(EVENTS_QUERY)
+    
+    return {
+        'events': events,
+        'pagination': {
+            'page': 1,
+            'per_page': len(events),
+            'total': len(events),
+            'pages': 1
+        }
+    }, 200
+
+_trigram_enabled = None
+
+def trigram_enabled():
+    """Whether pg_trgm is installed (migration 007 skips it where it isn't available)"""
+    global _trigram_enabled
+    if _trigram_enabled is None:
+        _trigram_enabled = bool(db.execute_query(
+            "SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'", fetch='one'
+        ))
+    return _trigram_enabled
+
+@event_bp.route('/search', methods=['GET'])
+def search_events():
+    try:
+        term = (request.args.get('q') or '').strip()
+        if not term:
+            return jsonify({'error': 'Search query is required'}), 400
+        if len(term) > Config.SEARCH_MAX_QUERY_LENGTH:
+            return jsonify({'error': f'Search query is limited to {Config.SEARCH_MAX_QUERY_LENGTH} characters'}), 400
+
+        page = max(request.args.get('page', 1, type=int), 1)
+        per_page = min(max(request.args.get('per_page', 20, type=int), 1), Config.SEARCH_MAX_PER_PAGE)
+        offset = (page - 1) * per_page
+
+        # Matches come from the GIN indexes of event_search: full-text on the
+        # weighted vector, plus trigram similarity for misspelled names
+        if trigram_enabled():
+            matches = """
+                SELECT es.event_id,
+                       ts_rank_cd(es.search_vector, q.query, 32) + word_similarity(t.term, es.document) as rank
+                FROM event_search es,
+                     websearch_to_tsquery('spanish', search_normalize(%s)) q(query),
+                     search_normalize(%s) t(term)
+                WHERE es.search_vector @@ q.query OR t.term <%% es.document
+            """
+            match_params = (term, term)
+        else:
+            matches = """
+                SELECT es.event_id, ts_rank_cd(es.search_vector, q.query, 32) as rank
+                FROM event_search es, websearch_to_tsquery('spanish', search_normalize(%s)) q(query)
+                WHERE es.search_vector @@ q.query
+            """
+            match_params = (term,)
+
+        events = db.execute_query(f"""
+            SELECT
+                e.id, e.title, e.description, e.event_date::text, e.event_time::text,
+                e.image_url, e.status,
+                COALESCE(et.name, '') as event_type,
+                COALESCE(v.name, '') as venue_name,
+                COALESCE(v.city, '') as venue_city,
+                COALESCE(a.name, '') as artist_name,
+                COALESCE(s.min_price, 0)::float as min_price,
+                COALESCE(s.max_price, 0)::float as max_price,
+                s.remaining_inventory, s.sold_out,
+                m.rank::float as rank,
+                COUNT(*) OVER () as total_count
+            FROM ({matches}) m
+            JOIN events e ON e.id = m.event_id
+            JOIN live_event_summaries s ON s.event_id = e.id
+            LEFT JOIN event_types et ON e.type_id = et.id
+            LEFT JOIN venues v ON e.venue_id = v.id
+            LEFT JOIN artists a ON e.artist_id = a.id
+            WHERE e.status = 'active'
+            ORDER BY m.rank DESC, e.event_date, e.id
+            LIMIT %s OFFSET %s
+        """, match_params + (per_page, offset), fetch=True)
+
+        total_count = events[0]['total_count'] if events else 0
+        for event in events:
+            del event['total_count']
+
         return jsonify({
+            'query': term,
             'events': events,
             'pagination': {
-                'page': 1,
-                'per_page': len(events),
-                'total': len(events),
-                'pages': 1
+                'page': page,
+                'per_page': per_page,
+                'total': total_count,
+                'pages': (total_count + per_page - 1) // per_page
             }
         }), 200
-        
+
     except Exception as e:
-        print(f"Get events error: {e}")
+        print(f"Search events error: {e}")
+        return jsonify({'error': 'Internal server error'}), 500
+
+@event_bp.route('/autocomplete', methods=['GET'])
+def autocomplete_events():
+    try:
+        # Served from the worker's in-memory prefix index, no database access
+        term = (request.args.get('q') or '')[:Config.SEARCH_MAX_QUERY_LENGTH]
+        limit = request.args.get('limit', Config.AUTOCOMPLETE_MAX_RESULTS, type=int)
+        return jsonify({
+            'query': term,
+            'suggestions': autocomplete.suggest(term, max(limit, 1))
+        }), 200
+
+    except Exception as e:
+        print(f"Autocomplete error: {e}")
         return jsonify({'error': 'Internal server error'}), 500
 
 @event_bp.route('/events/<int:event_id>', methods=['GET'])
 def get_event_details(event_id):
     try:
-        # Get event details
-        event = db.execute_query("""
-            SELECT 
-                e.id, e.title, e.description, e.event_date, e.event_time, 
-                e.image_url, e.status,
-                et.name as event_type, et.description as type_description,
-                v.name as venue_name, v.address as venue_address, 
-                v.city as venue_city, v.capacity as venue_capacity,
-                a.name as artist_name, a.bio as artist_bio, a.image_url as artist_image
-            FROM events e
-            LEFT JOIN event_types et ON e.type_id = et.id
-            LEFT JOIN venues v ON e.venue_id = v.id
-            LEFT JOIN artists a ON e.artist_id = a.id
-            WHERE e.id = %s AND e.status = 'active'
-        """, (event_id,), fetch='one')
+        return cached_json(('event', event_id), lambda: event_details(event_id))
+    except Exception as e:
+        print(f"Get event details error: {e}")
+        return jsonify({'error': 'Internal server error'}), 500
+
+def event_details(event_id):
+    # Get event details
+    event = db.fetch_one(EVENT_DETAILS_QUERY, (event_id,))
+    
+    if not event:
+        return {'error': 'Event not found'}, 404
+    
+    # Get available tickets (none to look up once the event is sold out)
+    tickets = []
+    if not event['sold_out']:
+        tickets = db.fetch_all(EVENT_TICKETS_QUERY, (event_id,))
+    
+    event['tickets'] = tickets
+    
+    return event, 200
+
+@event_bp.route('/events/<int:event_id>/availability/stream', methods=['GET'])
+def stream_availability(event_id):
+    try:
+        event = db.execute_query(
+            "SELECT id FROM events WHERE id = %s AND status = 'active'", (event_id,), fetch='one'
+        )
+        if not event:
+            return jsonify({'error': 'Event not found'}), 404
         
+        subscription, snapshot = availability.feed.subscribe(event_id)
+        
+    except Exception as e:
+        print(f"Availability stream error: {e}")
+        return jsonify({'error': 'Internal server error'}), 500
+    
+    def generate():
+        # A snapshot first, then only the tiers and sections that changed.
+        # Streams end after AVAILABILITY_STREAM_MAX_SECONDS; EventSource
+        # reconnects on its own and gets a fresh snapshot.
+        try:
+            yield f"retry: 2000\n{availability.format_sse('snapshot', snapshot)}"
+            deadline = time.time() + Config.AVAILABILITY_STREAM_MAX_SECONDS
+            while time.time() < deadline:
+                message = subscription.next(timeout=Config.AVAILABILITY_HEARTBEAT)
+                if message is None:
+                    yield ": keep-alive\n\n"
+                else:
+                    yield availability.format_sse(*message)
+        finally:
+            availability.feed.unsubscribe(subscription)
+    
+    return Response(stream_with_context(generate()), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
+@event_bp.route('/events/<int:event_id>/seats', methods=['GET'])
+def get_event_seats(event_id):
+    try:
+        event = db.execute_query(
+            "SELECT id, venue_id FROM events WHERE id = %s AND status = 'active'",
+            (event_id,), fetch='one'
+        )
         if not event:
             return jsonify({'error': 'Event not found'}), 404
         
-        # Get available tickets
-        tickets = db.execute_query("""
-            SELECT 
-                id, location, price, quantity_available, quantity_sold,
-                (quantity_available - quantity_sold) as available
-            FROM tickets 
-            WHERE event_id = %s AND (quantity_available - quantity_sold) > 0
-            ORDER BY price ASC
-        """, (event_id,), fetch=True)
+        seats = seat_map.get_event_seats(event_id)
+        if seats is None:
+            return jsonify({'error': 'Event has no seat map'}), 404
+        
+        sections = []
+        for section in seat_map.get_venue_layout(event['venue_id']):
+            state = seats.get(section['id'])
+            if not state:
+                continue
+            sections.append({
+                'id': section['id'],
+                'name': section['name'],
+                'preference': section['preference'],
+                'ticket_id': state['ticket_id'],
+                'seat_count': section['seat_count'],
+                'rows': [
+                    {'label': row['label'], 'seat_count': row['seat_count'], 'first_seat': row['first_seat']}
+                    for row in section['rows']
+                ],
+                # Base64 little-endian bitmaps, bit n = seat n of the section
+                'sold': state['sold'].to_base64(),
+                'held': state['held'].to_base64(),
+                'available': section['seat_count'] - state['sold'].count() - state['held'].count()
+            })
+        
+        return jsonify({'event_id': event_id, 'sections': sections}), 200
         
-        event_data = dict(event)
-        event_data['tickets'] = tickets or []
+    except Exception as e:
+        print(f"Get event seats error: {e}")
+        return jsonify({'error': 'Internal server error'}), 500
+
+@event_bp.route('/events/<int:event_id>/seats/hold', methods=['POST'])
+@require_auth
+def hold_event_seats(event_id):
+    try:
+        user_id = request.user['user_id']
+        data = request.get_json()
+        seats = data.get('seats')
         
-        return jsonify(event_data), 200
+        if not seats or not isinstance(seats, list):
+            return jsonify({'error': 'seats is required'}), 400
+        
+        event = db.execute_query(
+            "SELECT id, venue_id FROM events WHERE id = %s AND status = 'active'",
+            (event_id,), fetch='one'
+        )
+        if not event:
+            return jsonify({'error': 'Event not found'}), 404
+        
+        layout = seat_map.get_venue_layout(event['venue_id'])
+        try:
+            seats_by_section = seat_map.resolve_seats(layout, seats)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        hold_id = seat_map.hold_seats(event_id, user_id, seats_by_section, Config.SEAT_HOLD_TTL)
+        if not hold_id:
+            return jsonify({'error': 'Some of the seats are no longer available'}), 409
+        
+        return jsonify({
+            'hold_id': hold_id,
+            'seats': seat_map.describe_seats(layout, seats_by_section),
+            'expires_in': Config.SEAT_HOLD_TTL
+        }), 201
         
     except Exception as e:
-        print(f"Get event details error: {e}")
+        print(f"Hold seats error: {e}")
+        return jsonify({'error': 'Internal server error'}), 500
+
+def _best_seats_params(data):
+    """Read quantity and optional section ids. Returns (quantity, section_ids, error)"""
+    try:
+        quantity = int(data.get('quantity', 1))
+        sections = data.get('sections') or []
+        if isinstance(sections, str):
+            sections = sections.split(',')
+        section_ids = {int(s) for s in sections if str(s).strip()}
+    except (TypeError, ValueError):
+        return None, None, 'quantity and sections must be integers'
+    
+    if quantity < 1 or quantity > Config.SEAT_BEST_MAX_QUANTITY:
+        return None, None, f'quantity must be between 1 and {Config.SEAT_BEST_MAX_QUANTITY}'
+    return quantity, section_ids or None, None
+
+@event_bp.route('/events/<int:event_id>/seats/best', methods=['GET'])
+def get_best_seats(event_id):
+    try:
+        quantity, section_ids, error = _best_seats_params(request.args)
+        if error:
+            return jsonify({'error': error}), 400
+        
+        event = db.execute_query(
+            "SELECT id, venue_id FROM events WHERE id = %s AND status = 'active'",
+            (event_id,), fetch='one'
+        )
+        if not event:
+            return jsonify({'error': 'Event not found'}), 404
+        
+        seats_by_section = seat_search.find_best_seats(event_id, quantity, section_ids)
+        if not seats_by_section:
+            return jsonify({'error': f'No block of {quantity} seats together is available'}), 404
+        
+        layout = seat_map.get_venue_layout(event['venue_id'])
+        return jsonify({'seats': seat_map.describe_seats(layout, seats_by_section)}), 200
+        
+    except Exception as e:
+        print(f"Get best seats error: {e}")
+        return jsonify({'error': 'Internal server error'}), 500
+
+@event_bp.route('/events/<int:event_id>/seats/best/hold', methods=['POST'])
+@require_auth
+def hold_best_seats(event_id):
+    try:
+        user_id = request.user['user_id']
+        quantity, section_ids, error = _best_seats_params(request.get_json() or {})
+        if error:
+            return jsonify({'error': error}), 400
+        
+        event = db.execute_query(
+            "SELECT id, venue_id FROM events WHERE id = %s AND status = 'active'",
+            (event_id,), fetch='one'
+        )
+        if not event:
+            return jsonify({'error': 'Event not found'}), 404
+        
+        hold_id, seats_by_section = seat_search.hold_best_seats(
+            event_id, user_id, quantity, Config.SEAT_HOLD_TTL, section_ids
+        )
+        if not hold_id:
+            return jsonify({'error': f'No block of {quantity} seats together is available'}), 409
+        
+        layout = seat_map.get_venue_layout(event['venue_id'])
+        return jsonify({
+            'hold_id': hold_id,
+            'seats': seat_map.describe_seats(layout, seats_by_section),
+            'expires_in': Config.SEAT_HOLD_TTL
+        }), 201
+        
+    except Exception as e:
+        print(f"Hold best seats error: {e}")
+        return jsonify({'error': 'Internal server error'}), 500
+
+@event_bp.route('/seat-holds/<int:hold_id>', methods=['DELETE'])
+@require_auth
+def release_seat_hold(hold_id):
+    try:
+        user_id = request.user['user_id']
+        
+        if not seat_map.release_hold(hold_id, user_id):
+            return jsonify({'error': 'Seat hold not found'}), 404
+        
+        return jsonify({'message': 'Seats released'}), 200
+        
+    except Exception as e:
+        print(f"Release seat hold error: {e}")
         return jsonify({'error': 'Internal server error'}), 500
 
 @event_bp.route('/event-types', methods=['GET'])
@@ -139,20 +519,7 @@ def get_cart():
     try:
         user_id = request.user['user_id']
         
-        cart_items = db.execute_query("""
-            SELECT 
-                ci.id, ci.quantity,
-                t.id as ticket_id, t.location, t.price,
-                e.id as event_id, e.title as event_title, 
-                e.event_date, e.event_time,
-                v.name as venue_name
-            FROM cart_items ci
-            JOIN tickets t ON ci.ticket_id = t.id
-            JOIN events e ON t.event_id = e.id
-            JOIN venues v ON e.venue_id = v.id
-            WHERE ci.user_id = %s
-            ORDER BY ci.created_at DESC
-        """, (user_id,), fetch=True)
+        cart_items = db.fetch_all(CART_QUERY, (user_id,))
         
         total = sum(item['price'] * item['quantity'] for item in cart_items or [])
         
@@ -174,28 +541,47 @@ def add_to_cart():
         
         ticket_id = data.get('ticket_id')
         quantity = data.get('quantity', 1)
+        seat_hold_id = data.get('seat_hold_id')
+        
+        # Held seats go in as one item, priced by the tier of their sections
+        if seat_hold_id:
+            hold = db.fetch_one(seat_map.CART_HOLD_QUERY, (seat_hold_id, user_id))
+            if not hold:
+                return jsonify({'error': 'Seat hold not found or expired'}), 404
+            ticket_id, quantity = seat_map.hold_cart_item(hold)
+            if not ticket_id:
+                return jsonify({'error': 'The held seats are not priced by a single ticket tier'}), 400
         
         if not ticket_id or quantity <= 0:
             return jsonify({'error': 'Invalid ticket_id or quantity'}), 400
         
         # Check if ticket exists and has availability
-        ticket = db.execute_query("""
-            SELECT id, event_id, location, price, quantity_available, quantity_sold
-            FROM tickets 
-            WHERE id = %s
-        """, (ticket_id,), fetch='one')
+        ticket = db.fetch_one(CART_TICKET_QUERY, (ticket_id,))
         
         if not ticket:
             return jsonify({'error': 'Ticket not found'}), 404
         
+        # Flash sales only let admitted buyers through
+        admission_response = admission_error([ticket['event_id']])
+        if admission_response:
+            return admission_response
+        
         available = ticket['quantity_available'] - ticket['quantity_sold']
         if available < quantity:
             return jsonify({'error': f'Only {available} tickets available'}), 400
         
+        if seat_hold_id:
+            db.execute_query("""
+                INSERT INTO cart_items (user_id, ticket_id, quantity, seat_hold_id) 
+                VALUES (%s, %s, %s, %s)
+                ON CONFLICT (seat_hold_id) DO NOTHING
+            """, (user_id, ticket_id, quantity, seat_hold_id))
+            return jsonify({'message': 'Item added to cart successfully'}), 200
+        
         # Check if item already in cart
         existing_item = db.execute_query("""
             SELECT id, quantity FROM cart_items 
-            WHERE user_id = %s AND ticket_id = %s
+            WHERE user_id = %s AND ticket_id = %s AND seat_hold_id IS NULL
         """, (user_id, ticket_id), fetch='one')
         
         if existing_item:
@@ -206,7 +592,7 @@ def add_to_cart():
             
             db.execute_query("""
                 UPDATE cart_items SET quantity = %s 
-                WHERE user_id = %s AND ticket_id = %s
+                WHERE user_id = %s AND ticket_id = %s AND seat_hold_id IS NULL
             """, (new_quantity, user_id, ticket_id))
         else:
             # Add new item
@@ -227,11 +613,15 @@ def remove_from_cart(item_id):
     try:
         user_id = request.user['user_id']
         
-        db.execute_query("""
+        removed = db.execute_query("""
             DELETE FROM cart_items 
             WHERE id = %s AND user_id = %s
+            RETURNING seat_hold_id
         """, (item_id, user_id))
         
+        if removed and removed[0]['seat_hold_id']:
+            seat_map.release_hold(removed[0]['seat_hold_id'], user_id)
+        
         return jsonify({'message': 'Item removed from cart'}), 200
         
     except Exception as e:
@@ -244,19 +634,24 @@ def checkout():
     try:
         user_id = request.user['user_id']
         
+        # Fail fast, before touching the database, while the provider is down
+        if not payment_queue:
+            try:
+                gateway.ensure_available()
+            except CallRejectedError as e:
+                return payment_unavailable(e)
+        
         # Get cart items
-        cart_items = db.execute_query("""
-            SELECT 
-                ci.id, ci.quantity,
-                t.id as ticket_id, t.price, t.quantity_available, t.quantity_sold
-            FROM cart_items ci
-            JOIN tickets t ON ci.ticket_id = t.id
-            WHERE ci.user_id = %s
-        """, (user_id,), fetch=True)
+        cart_items = db.fetch_all(CHECKOUT_CART_QUERY, (user_id,))
         
         if not cart_items:
             return jsonify({'error': 'Cart is empty'}), 400
         
+        # Flash sales only let admitted buyers through
+        admission_response = admission_error([item['event_id'] for item in cart_items])
+        if admission_response:
+            return admission_response
+        
         # Validate availability and calculate total
         total_amount = 0
         for item in cart_items:
@@ -265,33 +660,66 @@ def checkout():
                 return jsonify({'error': f'Insufficient tickets available'}), 400
             total_amount += item['price'] * item['quantity']
         
-        # Create PayPal payment
-        payment = paypal.create_payment(
-            amount=total_amount,
-            return_url="http://localhost:3000/payment/success",
-            cancel_url="http://localhost:3000/payment/cancel"
-        )
-        
-        if not payment:
-            return jsonify({'error': 'Failed to create payment'}), 500
-        
         # Create order in database
-        order_id = db.execute_query("""
-            INSERT INTO orders (user_id, total_amount, status, paypal_payment_id) 
-            VALUES (%s, %s, 'pending', %s) RETURNING id
-        """, (user_id, total_amount, payment['id']), fetch='one')['id']
+        order = db.execute_query("""
+            INSERT INTO orders (user_id, total_amount, status) 
+            VALUES (%s, %s, 'pending') RETURNING id, order_date
+        """, (user_id, total_amount), fetch='one')
+        order_id = order['id']
         
-        # Create order items
+        # Create order items (in the same monthly partition as the order)
         for item in cart_items:
             db.execute_query("""
-                INSERT INTO order_items (order_id, ticket_id, quantity, price) 
-                VALUES (%s, %s, %s, %s)
-            """, (order_id, item['ticket_id'], item['quantity'], item['price']))
+                INSERT INTO order_items (order_id, order_date, ticket_id, quantity, price) 
+                VALUES (%s, %s, %s, %s, %s)
+            """, (order_id, order['order_date'], item['ticket_id'], item['quantity'], item['price']))
+        
+        # Held seats stay held for the order until it is paid or cancelled
+        hold_ids = [item['seat_hold_id'] for item in cart_items if item['seat_hold_id']]
+        if hold_ids:
+            try:
+                seat_map.order_holds(order_id, user_id, hold_ids)
+            except seat_map.HoldExpiredError:
+                cancel_order(order_id)
+                # Releasing the expired holds takes them out of the cart
+                for event_id in {item['event_id'] for item in cart_items if item['seat_hold_id']}:
+                    seat_map.release_expired_holds(event_id)
+                return jsonify({'error': 'Some seat holds in the cart expired and were removed from it'}), 409
+        
+        # Each waiting room admission buys once
+        if not spend_admissions([item['event_id'] for item in cart_items], request.headers.get('X-Admission-Token'), user_id):
+            cancel_order(order_id)
+            return jsonify(ADMISSION_SPENT_ERROR), 429
+        
+        # Hand the gateway call to a background worker when the queue is enabled
+        if payment_queue:
+            payment_queue.enqueue('create_payment', {
+                'order_id': order_id,
+                'user_id': user_id,
+                'amount': total_amount
+            }, key=order_key(order_id))
+            
+            return jsonify({
+                'order_id': order_id,
+                'status': 'queued',
+                'status_url': f'/api/orders/{order_id}/payment',
+                'total_amount': float(total_amount)
+            }), 202
+        
+        # Create payment with the gateway
+        try:
+            payment = start_payment(order_id, total_amount)
+        except CallRejectedError as e:
+            cancel_order(order_id)
+            return payment_unavailable(e)
+        except PaymentError:
+            cancel_order(order_id)
+            return jsonify({'error': 'Failed to create payment'}), 500
         
         return jsonify({
             'order_id': order_id,
-            'payment_id': payment['id'],
-            'approval_url': payment.get('approval_url'),
+            'payment_id': payment['payment_id'],
+            'approval_url': payment['approval_url'],
             'total_amount': float(total_amount)
         }), 200
         
@@ -310,44 +738,126 @@ def execute_payment():
         if not payment_id or not payer_id:
             return jsonify({'error': 'Payment ID and Payer ID are required'}), 400
         
-        # Execute PayPal payment
-        result = paypal.execute_payment(payment_id, payer_id)
-        
-        if not result or result.get('state') != 'approved':
+        if payment_queue:
+            user_id = request.user['user_id']
+            
+            order = db.execute_query("""
+                SELECT id FROM orders 
+                WHERE paypal_payment_id = %s AND user_id = %s
+            """, (payment_id, user_id), fetch='one')
+            
+            if not order:
+                return jsonify({'error': 'Order not found'}), 404
+            
+            payment_queue.enqueue('execute_payment', {
+                'order_id': order['id'],
+                'user_id': user_id,
+                'payment_id': payment_id,
+                'payer_id': payer_id
+            }, key=order_key(order['id']))
+            
+            return jsonify({
+                'order_id': order['id'],
+                'status': 'queued',
+                'status_url': f"/api/orders/{order['id']}/payment"
+            }), 202
+        
+        # Execute payment with the gateway and complete the order
+        try:
+            execute_gateway_payment(payment_id, payer_id)
+        except CallRejectedError as e:
+            return payment_unavailable(e)
+        except PaymentError:
             return jsonify({'error': 'Payment execution failed'}), 400
         
-        # Update order status
-        db.execute_query("""
-            UPDATE orders 
-            SET status = 'completed', paypal_payer_id = %s 
-            WHERE paypal_payment_id = %s
-        """, (payer_id, payment_id))
+        return jsonify({'message': 'Payment completed successfully'}), 200
         
-        # Update ticket quantities and clear cart
-        user_id = request.user['user_id']
+    except Exception as e:
+        print(f"Execute payment error: {e}")
+        return jsonify({'error': 'Internal server error'}), 500
+
+@event_bp.route('/payment/webhook', methods=['POST'])
+def payment_webhook():
+    try:
+        if not Config.PAYPAL_WEBHOOK_ID:
+            return jsonify({'error': 'Webhook not configured'}), 503
         
-        # Get order items to update ticket quantities
-        order_items = db.execute_query("""
-            SELECT oi.ticket_id, oi.quantity
-            FROM order_items oi
-            JOIN orders o ON oi.order_id = o.id
-            WHERE o.paypal_payment_id = %s
-        """, (payment_id,), fetch=True)
+        event = request.get_json(silent=True)
+        if not event:
+            return jsonify({'error': 'Invalid webhook payload'}), 400
         
-        for item in order_items:
-            db.execute_query("""
-                UPDATE tickets 
-                SET quantity_sold = quantity_sold + %s 
-                WHERE id = %s
-            """, (item['quantity'], item['ticket_id']))
+        try:
+            verified = gateway.verify_webhook_signature(request.headers, event, Config.PAYPAL_WEBHOOK_ID)
+        except CallRejectedError as e:
+            # PayPal retries failed deliveries, so it is safe to refuse for now
+            return payment_unavailable(e)
         
-        # Clear user's cart
-        db.execute_query("DELETE FROM cart_items WHERE user_id = %s", (user_id,))
+        if verified is None:
+            # PayPal could not check the signature; it redelivers the event later
+            return jsonify({'error': 'Payment service temporarily unavailable'}), 503
+        if not verified:
+            return jsonify({'error': 'Invalid webhook signature'}), 400
         
-        return jsonify({'message': 'Payment completed successfully'}), 200
+        # Acknowledge quickly and apply the event in the background when possible
+        if payment_queue:
+            payment_queue.enqueue('webhook_event', event, key=f"webhook:{event.get('id')}")
+            return jsonify({'message': 'Event accepted'}), 202
+        
+        order_id = apply_webhook_event(event)
+        
+        return jsonify({'message': 'Event processed', 'order_id': order_id}), 200
         
     except Exception as e:
-        print(f"Execute payment error: {e}")
+        print(f"Payment webhook error: {e}")
+        return jsonify({'error': 'Internal server error'}), 500
+
+@event_bp.route('/orders/<int:order_id>/payment', methods=['GET'])
+@require_auth
+def get_payment_status(order_id):
+    try:
+        user_id = request.user['user_id']
+        
+        if not payment_queue:
+            order = db.execute_query("""
+                SELECT id, status, paypal_payment_id
+                FROM orders 
+                WHERE id = %s AND user_id = %s
+            """, (order_id, user_id), fetch='one')
+            
+            if not order:
+                return jsonify({'error': 'Order not found'}), 404
+            
+            return jsonify({
+                'order_id': order['id'],
+                'status': order['status'],
+                'payment_id': order['paypal_payment_id']
+            }), 200
+        
+        # Long-poll: wait up to `wait` seconds for the payment job to finish.
+        # Served from the job queue so polling never touches PostgreSQL.
+        wait = min(float(request.args.get('wait', 0)), Config.PAYMENT_STATUS_MAX_WAIT)
+        job = payment_queue.wait(order_key(order_id), max(wait, 0))
+        
+        if not job or job['payload'].get('user_id') != user_id:
+            return jsonify({'error': 'Order not found'}), 404
+        
+        status = job['status']
+        if status == 'completed':
+            status = 'awaiting_approval' if job['kind'] == 'create_payment' else 'completed'
+        
+        result = job['result'] or {}
+        return jsonify({
+            'order_id': order_id,
+            'status': status,
+            'payment_id': result.get('payment_id'),
+            'approval_url': result.get('approval_url'),
+            'error': job['error'] if job['status'] == 'failed' else None
+        }), 200
+        
+    except ValueError:
+        return jsonify({'error': 'Invalid wait parameter'}), 400
+    except Exception as e:
+        print(f"Get payment status error: {e}")
         return jsonify({'error': 'Internal server error'}), 500
 
 @event_bp.route('/orders', methods=['GET'])
@@ -356,14 +866,14 @@ def get_user_orders():
     try:
         user_id = request.user['user_id']
         
+        # Counting per order lets each count prune to the order's monthly partition
         orders = db.execute_query("""
             SELECT 
                 o.id, o.order_date, o.status, o.total_amount,
-                COUNT(oi.id) as total_tickets
+                (SELECT COUNT(*) FROM order_items oi
+                 WHERE oi.order_id = o.id AND oi.order_date = o.order_date) as total_tickets
             FROM orders o
-            LEFT JOIN order_items oi ON o.id = oi.order_id
             WHERE o.user_id = %s
-            GROUP BY o.id, o.order_date, o.status, o.total_amount
             ORDER BY o.order_date DESC
         """, (user_id,), fetch=True)
         
@@ -400,8 +910,8 @@ def get_order_details(order_id):
             JOIN tickets t ON oi.ticket_id = t.id
             JOIN events e ON t.event_id = e.id
             JOIN venues v ON e.venue_id = v.id
-            WHERE oi.order_id = %s
-        """, (order_id,), fetch=True)
+            WHERE oi.order_id = %s AND oi.order_date = %s
+        """, (order_id, order['order_date']), fetch=True)
         
         order_data = dict(order)
         order_data['items'] = items or []
@@ -0,0 +1,98 @@
+from flask import Blueprint, request, jsonify
+import jwt
+from utils.waiting_room import waiting_room
+from routes.auth_routes import require_auth
+
+waiting_room_bp = Blueprint('waiting_room', __name__)
+
+# Queue endpoints only use the in-memory waiting room, never the database;
+# only spending an admission at checkout does
+
+@waiting_room_bp.route('/events/<int:event_id>/queue', methods=['POST'])
+@require_auth
+def join_queue(event_id):
+    try:
+        if not waiting_room or not waiting_room.is_gated(event_id):
+            return jsonify({'event_id': event_id, 'admitted': True, 'gated': False}), 200
+        
+        return jsonify(waiting_room.join(event_id, request.user['user_id'])), 201
+        
+    except Exception as e:
+        print(f"Join queue error: {e}")
+        return jsonify({'error': 'Internal server error'}), 500
+
+@waiting_room_bp.route('/events/<int:event_id>/queue', methods=['GET'])
+@require_auth
+def get_queue_status(event_id):
+    try:
+        if not waiting_room or not waiting_room.is_gated(event_id):
+            return jsonify({'event_id': event_id, 'admitted': True, 'gated': False}), 200
+        
+        token = request.args.get('token') or request.headers.get('X-Queue-Token')
+        if not token:
+            return jsonify({'error': 'Queue token is required'}), 400
+        
+        return jsonify(waiting_room.status(event_id, token, request.user['user_id'])), 200
+        
+    except jwt.InvalidTokenError:
+        return jsonify({'error': 'Invalid queue token'}), 400
+    except Exception as e:
+        print(f"Get queue status error: {e}")
+        return jsonify({'error': 'Internal server error'}), 500
+
+def _admissions(admission_tokens, user_id):
+    """The user's valid admissions in X-Admission-Token (comma separated), by event"""
+    admissions = {}
+    for token in (admission_tokens or '').split(','):
+        admission = waiting_room.check_admission(token.strip(), user_id)
+        if admission:
+            admissions[admission['event_id']] = admission
+    return admissions
+
+def admission_required(event_ids, admission_tokens, user_id):
+    """
+    The body of a 429 response unless admission_tokens (X-Admission-Token,
+    comma separated) admit user_id to every gated event in event_ids, or None
+    """
+    if not waiting_room:
+        return None
+    
+    gated = sorted({event_id for event_id in event_ids if waiting_room.is_gated(event_id)})
+    if not gated:
+        return None
+    
+    admitted = _admissions(admission_tokens, user_id)
+    missing = [event_id for event_id in gated if event_id not in admitted]
+    if not missing:
+        return None
+    
+    return {
+        'error': 'Waiting room admission required',
+        'event_id': missing[0],
+        'queue_url': f'/api/events/{missing[0]}/queue'
+    }
+
+def spend_admissions(event_ids, admission_tokens, user_id):
+    """
+    Spend the admissions a checkout for event_ids used, so they can't buy
+    again. Returns False if one of them was already spent
+    """
+    if not waiting_room:
+        return True
+    admissions = _admissions(admission_tokens, user_id)
+    fresh = True
+    for event_id in set(event_ids):
+        if event_id in admissions and not waiting_room.spend(admissions[event_id]):
+            fresh = False
+    return fresh
+
+ADMISSION_SPENT_ERROR = {'error': 'Waiting room admission was already used, please queue again'}
+
+def admission_error(event_ids):
+    """
+    Return a 429 response unless the request carries admission tokens
+    (X-Admission-Token, comma separated) of the signed in user for every
+    gated event in event_ids. Returns None when the request may continue.
+    """
+    error = admission_required(event_ids, request.headers.get('X-Admission-Token'), request.user['user_id'])
+    return (jsonify(error), 429) if error else None
@@ -0,0 +1,193 @@
+import asyncio
+from contextlib import asynccontextmanager
+import psycopg2
+from psycopg2 import extensions
+from psycopg2.extras import RealDictCursor
+from config import Config
+from utils.db import prepared_statements
+
+async def _wait(conn):
+    """Wait on the event loop until an asynchronous connection is ready"""
+    loop = asyncio.get_running_loop()
+    while True:
+        state = conn.poll()
+        if state == extensions.POLL_OK:
+            return
+        ready = loop.create_future()
+        fd = conn.fileno()
+
+        def wake():
+            if not ready.done():
+                ready.set_result(None)
+
+        if state == extensions.POLL_READ:
+            loop.add_reader(fd, wake)
+            try:
+                await ready
+            finally:
+                loop.remove_reader(fd)
+        elif state == extensions.POLL_WRITE:
+            loop.add_writer(fd, wake)
+            try:
+                await ready
+            finally:
+                loop.remove_writer(fd)
+        else:
+            raise psycopg2.OperationalError(f"Unexpected poll state {state}")
+
+class AsyncCursor:
+    """
+    Cursor of an asynchronous connection returning dict rows. Registered
+    queries marked prepare run as prepared statements, like SupabaseDB's
+    """
+
+    def __init__(self, conn):
+        self._cursor = conn.cursor(cursor_factory=RealDictCursor)
+        self._conn = conn
+
+    async def execute(self, query, params=None):
+        if prepared_statements.applies(query):
+            # A pool connection serves one coroutine at a time, so unlike
+            # the shared sync connection it needs no lock around the PREPARE
+            if prepared_statements.needed(self._conn, query):
+                self._cursor.execute(query.prepare_sql)
+                await _wait(self._conn)
+                prepared_statements.prepared(self._conn, query)
+            query = query.execute_sql
+        self._cursor.execute(query, params)
+        await _wait(self._conn)
+
+    def fetchone(self):
+        return self._cursor.fetchone()
+
+    def fetchall(self):
+        return self._cursor.fetchall()
+
+    @property
+    def description(self):
+        return self._cursor.description
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+    def close(self):
+        self._cursor.close()
+
+class AsyncDB:
+    """
+    Connection pool for asyncio request handlers.
+
+    Uses psycopg2's asynchronous connections, waited on with the event
+    loop's reader/writer callbacks, so the SQL (and its %s placeholders) is
+    the same as SupabaseDB's and a handler waiting on Postgres doesn't hold a
+    thread. Asynchronous connections are always in autocommit; transaction()
+    issues BEGIN/COMMIT itself.
+    """
+
+    def __init__(self, dsn, min_size=2, max_size=20):
+        self.dsn = dsn
+        self.min_size = min_size
+        self.max_size = max_size
+        self._idle = []
+        self._size = 0
+        self._available = None
+
+    async def open(self):
+        self._available = asyncio.Condition()
+        for _ in range(self.min_size):
+            self._idle.append(await self._connect())
+
+    async def close(self):
+        while self._idle:
+            self._idle.pop().close()
+            self._size -= 1
+
+    async def _connect(self):
+        conn = psycopg2.connect(self.dsn, async_=True)
+        self._size += 1
+        try:
+            await _wait(conn)
+        except Exception:
+            self._size -= 1
+            conn.close()
+            raise
+        return conn
+
+    @asynccontextmanager
+    async def connection(self):
+        """Borrow a connection, waiting for one when max_size are in use"""
+        if self._available is None:
+            await self.open()
+        async with self._available:
+            while not self._idle and self._size >= self.max_size:
+                await self._available.wait()
+            conn = self._idle.pop() if self._idle else None
+        if conn is None:
+            conn = await self._connect()
+
+        try:
+            yield conn
+        finally:
+            # Connections interrupted mid-query or left inside a transaction
+            # (e.g. a cancelled request) aren't reusable
+            if not conn.closed and (conn.isexecuting() or
+                    conn.get_transaction_status() != extensions.TRANSACTION_STATUS_IDLE):
+                conn.close()
+            async with self._available:
+                if conn.closed:
+                    self._size -= 1
+                else:
+                    self._idle.append(conn)
+                self._available.notify()
+
+    async def execute_query(self, query, params=None, fetch=None):
+        """
+        Same contract as SupabaseDB.execute_query for SQL: fetch='one' returns
+        a dict or None, fetch=True a list, no fetch the RETURNING rows or True
+        """
+        try:
+            async with self.connection() as conn:
+                cursor = AsyncCursor(conn)
+                try:
+                    await cursor.execute(query, params)
+                    if fetch == 'one':
+                        result = cursor.fetchone()
+                        return dict(result) if result else None
+                    if fetch == True or fetch == 'all' or cursor.description:
+                        return [dict(row) for row in cursor.fetchall()]
+                    return True
+                finally:
+                    cursor.close()
+        except Exception as e:
+            print(f"Async SQL execution error: {e}")
+            raise
+
+    @asynccontextmanager
+    async def transaction(self):
+        """
+        Run several SQL statements atomically.
+        Yields an AsyncCursor; commits on success, rolls back on error.
+        """
+        async with self.connection() as conn:
+            cursor = AsyncCursor(conn)
+            await cursor.execute("BEGIN")
+            try:
+                yield cursor
+                await cursor.execute("COMMIT")
+            except BaseException as e:
+                if not conn.closed and not conn.isexecuting():
+                    try:
+                        await cursor.execute("ROLLBACK")
+                    except Exception:
+                        conn.close()
+                if not isinstance(e, asyncio.CancelledError):
+                    print(f"Async transaction error: {e}")
+                raise
+            finally:
+                cursor.close()
+
+    def stats(self):
+        return {'size': self._size, 'idle': len(self._idle), 'max_size': self.max_size}
+
+async_db = AsyncDB(Config.DATABASE_URL, Config.ASYNC_DB_POOL_MIN, Config.ASYNC_DB_POOL_MAX)
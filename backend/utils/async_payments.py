@@ -0,0 +1,75 @@
+import asyncio
+from config import Config
+from utils.async_db import async_db
+from utils import seat_map
+from utils.circuit_breaker import AsyncBulkhead, AsyncProtectedGateway
+from utils.paypal_integration import AsyncPayPalIntegration
+from utils.payments import PaymentError, provider, gateway
+
+class ThreadedGateway:
+    """
+    Async face of a sync gateway, running its calls in the default executor.
+    Used for the fake gateway so its in-memory payments are the same ones
+    the sync routes see.
+    """
+
+    def __init__(self, gateway):
+        self.gateway = gateway
+
+    async def _run(self, method, *args):
+        return await asyncio.get_running_loop().run_in_executor(None, method, *args)
+
+    async def create_payment(self, amount, currency='USD', return_url=None, cancel_url=None):
+        return await self._run(self.gateway.create_payment, amount, currency, return_url, cancel_url)
+
+    async def execute_payment(self, payment_id, payer_id):
+        return await self._run(self.gateway.execute_payment, payment_id, payer_id)
+
+    async def get_payment_details(self, payment_id):
+        return await self._run(self.gateway.get_payment_details, payment_id)
+
+    async def close(self):
+        pass
+
+# Same provider, and same circuit breaker, as the sync purchase path
+async_provider = AsyncPayPalIntegration() if Config.PAYMENT_GATEWAY == 'paypal' else ThreadedGateway(provider)
+async_gateway = AsyncProtectedGateway(
+    async_provider,
+    gateway.breaker,
+    AsyncBulkhead(
+        max_concurrent=Config.PAYMENT_BULKHEAD_MAX_CONCURRENT,
+        max_wait=Config.PAYMENT_BULKHEAD_MAX_WAIT
+    )
+)
+
+async def start_payment(order_id, amount):
+    """Create the payment for a pending order and attach it to the order"""
+    payment = await async_gateway.create_payment(
+        amount=amount,
+        return_url=Config.PAYPAL_RETURN_URL,
+        cancel_url=Config.PAYPAL_CANCEL_URL
+    )
+
+    if not payment:
+        raise PaymentError('Failed to create payment')
+
+    await async_db.execute_query("""
+        UPDATE orders SET paypal_payment_id = %s
+        WHERE id = %s AND status = 'pending'
+    """, (payment['id'], order_id))
+
+    return {
+        'order_id': order_id,
+        'payment_id': payment['id'],
+        'approval_url': payment.get('approval_url')
+    }
+
+async def cancel_order(order_id):
+    """Cancel a pending order whose payment could not be created"""
+    if await async_db.execute_query("""
+        UPDATE orders SET status = 'cancelled'
+        WHERE id = %s AND status = 'pending'
+        RETURNING id
+    """, (order_id,)):
+        # Seat bitmaps are only updated by the sync seat_map module
+        await asyncio.get_running_loop().run_in_executor(None, seat_map.release_order_holds, order_id)
@@ -0,0 +1,301 @@
+import bisect
+import heapq
+import threading
+import time
+import unicodedata
+from config import Config
+from utils.db import get_db
+from utils import change_feed
+
+db = get_db()
+
+# Changes touching more suggestions than this rebuild the index instead
+MAX_REFRESHES = 50
+# Prefixes matching more entries than this get their top suggestions
+# precomputed, so one or two letters don't rank thousands of entries
+DENSE_RANGE = 64
+KEY_END = '\U0010ffff'
+
+# Suggestions of each type with their score: tickets sold for the active
+# events they cover, so popular events, artists and venues come first
+SUGGESTION_QUERIES = {
+    'event': """
+        SELECT e.id, e.title as text, s.total_inventory - s.remaining_inventory as score
+        FROM events e
+        JOIN live_event_summaries s ON s.event_id = e.id
+        WHERE e.status = 'active'
+    """,
+    'artist': """
+        SELECT a.id, a.name as text, SUM(s.total_inventory - s.remaining_inventory) as score
+        FROM artists a
+        JOIN events e ON e.artist_id = a.id AND e.status = 'active'
+        JOIN live_event_summaries s ON s.event_id = e.id
+    """,
+    'venue': """
+        SELECT v.id, v.name as text, SUM(s.total_inventory - s.remaining_inventory) as score
+        FROM venues v
+        JOIN events e ON e.venue_id = v.id AND e.status = 'active'
+        JOIN live_event_summaries s ON s.event_id = e.id
+    """,
+    'event_type': """
+        SELECT et.id, et.name as text, SUM(s.total_inventory - s.remaining_inventory) as score
+        FROM event_types et
+        JOIN events e ON e.type_id = et.id AND e.status = 'active'
+        JOIN live_event_summaries s ON s.event_id = e.id
+    """
+}
+ID_COLUMNS = {'event': 'e.id', 'artist': 'a.id', 'venue': 'v.id', 'event_type': 'et.id'}
+
+def normalize(text):
+    """Lower case without accents or repeated spaces, so 'acus' matches 'Acústico'"""
+    text = text or ''
+    if not text.isascii():
+        text = ''.join(c for c in unicodedata.normalize('NFKD', text) if not unicodedata.combining(c))
+    return ' '.join(text.lower().split())
+
+def suggestion_keys(text):
+    """The normalized text from each of its words on, so 'noche' finds 'Gran Noche Rock'"""
+    words = normalize(text).split()
+    return {' '.join(words[i:]) for i in range(len(words))}
+
+def _rank_of(suggestion):
+    return (-suggestion['score'], suggestion['text'], suggestion['type'], suggestion['id'])
+
+class PrefixIndex:
+    """
+    Type-ahead index over suggestions {'type', 'id', 'text', 'score'}.
+
+    Keys are kept in one sorted array of (key, type, id), so the entries
+    starting with a prefix are a contiguous range found with two binary
+    searches. A parallel array holds each entry's rank (-score, text, type,
+    id), so the best suggestions of a range are its smallest ranks. Ranges
+    longer than DENSE_RANGE have their best suggestions precomputed; adding,
+    renaming or removing a suggestion updates only the entries and
+    precomputed prefixes of its keys.
+    """
+
+    def __init__(self, suggestions=(), size=None):
+        self.built_at = time.time()
+        self.size = size or Config.AUTOCOMPLETE_MAX_RESULTS
+        self._lock = threading.Lock()
+        self._suggestions = {}
+        self._entries = []
+        self._ranks = []
+        self._top = {}
+        entries = []
+        for suggestion in suggestions:
+            ref = (suggestion['type'], suggestion['id'])
+            self._suggestions[ref] = suggestion
+            rank = _rank_of(suggestion)
+            entries.extend(((key, *ref), rank) for key in suggestion_keys(suggestion['text']))
+        entries.sort()
+        self._entries = [entry for entry, _ in entries]
+        self._ranks = [rank for _, rank in entries]
+        self._index_dense('', 0, len(self._entries))
+
+    def __len__(self):
+        return len(self._suggestions)
+
+    def _range(self, prefix, lo=0, hi=None):
+        hi = len(self._entries) if hi is None else hi
+        start = bisect.bisect_left(self._entries, (prefix,), lo, hi)
+        return start, bisect.bisect_left(self._entries, (prefix + KEY_END,), start, hi)
+
+    def _rank(self, lo, hi):
+        """Best suggestions among entries[lo:hi], as (type, id)"""
+        return [rank[2:] for rank in heapq.nsmallest(self.size, set(self._ranks[lo:hi]))]
+
+    def _index_dense(self, prefix, lo, hi):
+        """Precompute the top suggestions of prefix and of its dense extensions"""
+        if prefix:
+            self._top[prefix] = self._rank(lo, hi)
+        depth = len(prefix)
+        i = lo
+        while i < hi:
+            key = self._entries[i][0]
+            if len(key) <= depth:
+                i += 1
+                continue
+            child = key[:depth + 1]
+            _, end = self._range(child, i, hi)
+            if end - i > DENSE_RANGE:
+                self._index_dense(child, i, end)
+            i = end
+
+    def search(self, prefix, limit=None):
+        """Best suggestions whose text, or one of its words onwards, starts with prefix"""
+        prefix = normalize(prefix)
+        if not prefix:
+            return []
+        limit = min(limit or self.size, self.size)
+        with self._lock:
+            top = self._top.get(prefix)
+            if top is None:
+                top = self._rank(*self._range(prefix))
+            return [self._suggestions[ref] for ref in top[:limit]]
+
+    def _prefixes(self, keys):
+        return {key[:length] for key in keys for length in range(1, len(key) + 1)} & self._top.keys()
+
+    def put(self, suggestion):
+        """Add a suggestion or replace the one with the same type and id"""
+        ref = (suggestion['type'], suggestion['id'])
+        with self._lock:
+            touched = self._remove(ref)
+            self._suggestions[ref] = suggestion
+            keys = suggestion_keys(suggestion['text'])
+            rank = _rank_of(suggestion)
+            for key in keys:
+                position = bisect.bisect_left(self._entries, (key, *ref))
+                self._entries.insert(position, (key, *ref))
+                self._ranks.insert(position, rank)
+            # Prefixes that listed it are re-ranked (its score may have dropped),
+            # the others it now matches only need it merged in
+            for prefix in touched:
+                self._top[prefix] = self._rank(*self._range(prefix))
+            for prefix in self._prefixes(keys) - touched:
+                ranks = [_rank_of(self._suggestions[r]) for r in self._top[prefix]] + [rank]
+                self._top[prefix] = [r[2:] for r in sorted(ranks)[:self.size]]
+
+    def remove(self, kind, item_id):
+        """Drop a suggestion, if indexed"""
+        with self._lock:
+            for prefix in self._remove((kind, item_id)):
+                self._top[prefix] = self._rank(*self._range(prefix))
+
+    def _remove(self, ref):
+        """Delete ref's entries. Returns the precomputed prefixes that listed it"""
+        suggestion = self._suggestions.pop(ref, None)
+        if not suggestion:
+            return set()
+        keys = suggestion_keys(suggestion['text'])
+        for key in keys:
+            position = bisect.bisect_left(self._entries, (key, *ref))
+            if position < len(self._entries) and self._entries[position] == (key, *ref):
+                del self._entries[position]
+                del self._ranks[position]
+        return {prefix for prefix in self._prefixes(keys) if ref in self._top[prefix]}
+
+def load_suggestions(kind=None, item_id=None):
+    """Suggestions of every type (or of one item) from the database"""
+    suggestions = []
+    for query_kind, sql in SUGGESTION_QUERIES.items():
+        if kind and query_kind != kind:
+            continue
+        params = None
+        if item_id is not None:
+            sql += f" {'AND' if query_kind == 'event' else 'WHERE'} {ID_COLUMNS[query_kind]} = %s"
+            params = (item_id,)
+        if query_kind != 'event':
+            sql += " GROUP BY 1, 2"
+        for row in db.execute_query(sql, params, fetch=True) or []:
+            suggestions.append({
+                'type': query_kind,
+                'id': row['id'],
+                'text': row['text'],
+                'score': int(row['score'] or 0)
+            })
+    return suggestions
+
+# One index per worker, rebuilt in the background every AUTOCOMPLETE_INDEX_TTL
+# seconds as sales change the scores. Catalog writes made on any worker are
+# applied as they happen (see _on_catalog_changed)
+_index = None
+_index_lock = threading.Lock()
+_rebuilding = False
+
+def _rebuild():
+    global _index, _rebuilding
+    index = None
+    try:
+        index = PrefixIndex(load_suggestions())
+    except Exception as e:
+        print(f"Autocomplete index rebuild error: {e}")
+    finally:
+        with _index_lock:
+            if index is not None:
+                _index = index
+            _rebuilding = False
+
+def _start_rebuild():
+    """Rebuild the index in the background, unless already rebuilding. Needs _index_lock"""
+    global _rebuilding
+    if not _rebuilding:
+        _rebuilding = True
+        threading.Thread(target=_rebuild, daemon=True).start()
+
+def get_index():
+    """The worker's index, built on first use and refreshed when stale"""
+    global _index
+    with _index_lock:
+        index = _index
+        if index is not None and time.time() - index.built_at >= Config.AUTOCOMPLETE_INDEX_TTL:
+            _start_rebuild()
+    if index is None:
+        index = PrefixIndex(load_suggestions())
+        with _index_lock:
+            _index = index
+    return index
+
+def refresh(kind, item_id):
+    """Re-read one suggestion after an admin write, removing it when no longer listed"""
+    with _index_lock:
+        index = _index
+    if index is None:
+        return
+    try:
+        suggestions = load_suggestions(kind, item_id)
+        if suggestions:
+            index.put(suggestions[0])
+        else:
+            index.remove(kind, item_id)
+    except Exception as e:
+        print(f"Autocomplete refresh error: {e}")
+
+def suggest(prefix, limit=None):
+    """Top suggestions for what the user has typed so far"""
+    return [
+        {'type': s['type'], 'id': s['id'], 'text': s['text']}
+        for s in get_index().search(prefix, limit)
+    ]
+
+def refresh_event(event_id, *events):
+    """
+    Refresh an event's suggestion and the artists, venues and event types of
+    the given event rows (before and after a write, as their scores change)
+    """
+    refresh('event', event_id)
+    related = set()
+    for event in events:
+        for kind, column in (('artist', 'artist_id'), ('venue', 'venue_id'), ('event_type', 'type_id')):
+            if event and event.get(column):
+                related.add((kind, int(event[column])))
+    for kind, item_id in sorted(related):
+        refresh(kind, item_id)
+
+def invalidate():
+    """Rebuild the index in the background, if built"""
+    with _index_lock:
+        if _index is not None:
+            _start_rebuild()
+
+RELATED_IDS = (('artist', 'artist_ids'), ('venue', 'venue_ids'), ('event_type', 'type_ids'))
+TABLE_KINDS = {'events': 'event', 'artists': 'artist', 'venues': 'venue', 'event_types': 'event_type'}
+
+def _on_catalog_changed(change):
+    """Apply catalog writes made on any worker (see change_feed)"""
+    if _index is None:
+        return
+    refs = None
+    if change['ids'] is not None:
+        refs = [(TABLE_KINDS[change['table']], item_id) for item_id in change['ids']]
+        if change['table'] == 'events':
+            refs += [(kind, item_id) for kind, key in RELATED_IDS for item_id in change.get(key, [])]
+    if refs is None or len(refs) > MAX_REFRESHES:
+        invalidate()
+        return
+    for kind, item_id in refs:
+        refresh(kind, item_id)
+
+for table in TABLE_KINDS:
+    change_feed.subscribe(table, _on_catalog_changed)
@@ -0,0 +1,223 @@
+import asyncio
+import json
+import queue
+import threading
+import time
+from config import Config
+from utils.db import get_db, register_query
+from utils import inventory, seat_map, change_feed
+
+db = get_db()
+
+def format_sse(event, data):
+    """One Server-Sent Events message"""
+    return f"event: {event}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n"
+
+def _snapshot_message(event_id, state):
+    return {
+        'event_id': event_id,
+        'remaining': sum(max(available, 0) for available in state['tickets'].values()),
+        'tickets': [{'id': i, 'available': a} for i, a in sorted(state['tickets'].items())],
+        'sections': [{'id': i, 'available': a} for i, a in sorted(state['sections'].items())]
+    }
+
+def _delta_message(event_id, old, new):
+    """Changed tiers and sections between two states, or None. Removed ones report 0"""
+    changes = {}
+    for kind in ('tickets', 'sections'):
+        changed = [
+            {'id': i, 'available': new[kind].get(i, 0)}
+            for i in sorted(set(old[kind]) | set(new[kind]))
+            if old[kind].get(i) != new[kind].get(i)
+        ]
+        if changed:
+            changes[kind] = changed
+    if not changes:
+        return None
+    changes['event_id'] = event_id
+    changes['remaining'] = sum(max(available, 0) for available in new['tickets'].values())
+    return changes
+
+# Rows of (event_id, kind, id, available)
+AVAILABILITY_QUERY = register_query('availability', """
+    SELECT event_id, 'tickets' as kind, id, quantity_available - quantity_sold as available
+    FROM ticket_inventory
+    WHERE event_id = ANY(%s)
+    UNION ALL
+    SELECT ess.event_id, 'sections', ess.section_id,
+           vs.seat_count - bit_count(ess.sold) - bit_count(ess.held)
+    FROM event_section_seats ess
+    JOIN venue_sections vs ON vs.id = ess.section_id
+    WHERE ess.event_id = ANY(%s)
+""", row=tuple)
+
+def read_availability(event_ids):
+    """{event_id: {'tickets': {ticket_id: available}, 'sections': {section_id: available}}}"""
+    states = {event_id: {'tickets': {}, 'sections': {}} for event_id in event_ids}
+    rows = db.fetch_all(AVAILABILITY_QUERY, (list(event_ids), list(event_ids)))
+    for event_id, kind, item_id, available in rows:
+        states[event_id][kind][item_id] = int(available)
+    return states
+
+class Subscription:
+    """A viewer of one event's availability: a bounded queue of messages"""
+
+    def __init__(self, feed, event_id):
+        self.feed = feed
+        self.event_id = event_id
+        self.queue = queue.Queue(maxsize=Config.AVAILABILITY_QUEUE_SIZE)
+        self.resync = False
+
+    def push(self, message):
+        try:
+            self.queue.put_nowait(message)
+        except queue.Full:
+            # Too slow to keep up: drop the backlog and send a snapshot instead
+            self.resync = True
+
+    def next(self, timeout):
+        """Next (event, data) to send, or None when nothing happened within timeout"""
+        if self.resync:
+            self.resync = False
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            return 'snapshot', self.feed.snapshot(self.event_id)
+        try:
+            return 'availability', self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+class AsyncSubscription(Subscription):
+    """
+    Subscription read by a coroutine (see async_event_routes.py): the feed
+    thread hands messages over to the viewer's event loop
+    """
+
+    def __init__(self, feed, event_id, loop):
+        super().__init__(feed, event_id)
+        self.loop = loop
+        self.queue = None
+
+    def _messages(self):
+        # Created on the loop: before Python 3.10 asyncio queues bind to the
+        # loop of the thread that creates them
+        if self.queue is None:
+            self.queue = asyncio.Queue(maxsize=Config.AVAILABILITY_QUEUE_SIZE)
+        return self.queue
+
+    def push(self, message):
+        try:
+            self.loop.call_soon_threadsafe(self._put, message)
+        except RuntimeError:
+            # The loop is closed, the stream is going away
+            pass
+
+    def _put(self, message):
+        try:
+            self._messages().put_nowait(message)
+        except asyncio.QueueFull:
+            self.resync = True
+
+    async def next(self, timeout):
+        messages = self._messages()
+        if self.resync:
+            self.resync = False
+            while not messages.empty():
+                messages.get_nowait()
+            return 'snapshot', self.feed.snapshot(self.event_id)
+        try:
+            return 'availability', await asyncio.wait_for(messages.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+class AvailabilityFeed:
+    """
+    Live availability of the events someone is watching, one feed per worker.
+
+    A background thread reads the ticket tiers and seat sections of every
+    watched event in a single query, every AVAILABILITY_POLL_INTERVAL
+    seconds or as soon as this worker sells tickets or holds seats, diffs
+    them with the previous state and pushes the changes to the subscribers.
+    The number of viewers never changes the number of queries.
+    """
+
+    def __init__(self, interval, min_interval):
+        self.interval = interval
+        self.min_interval = min_interval
+        self._lock = threading.Lock()
+        self._watched = {}  # event_id -> {'state': ..., 'subscribers': set()}
+        self._wake = threading.Event()
+        self._thread = None
+
+    def subscribe(self, event_id, loop=None):
+        """
+        Start watching an event. Returns (subscription, snapshot message).
+        With an event loop the subscription is an AsyncSubscription for it.
+        """
+        with self._lock:
+            watched = self._watched.get(event_id)
+        state = watched['state'] if watched else read_availability([event_id])[event_id]
+
+        subscription = AsyncSubscription(self, event_id, loop) if loop else Subscription(self, event_id)
+        with self._lock:
+            watched = self._watched.setdefault(event_id, {'state': state, 'subscribers': set()})
+            watched['subscribers'].add(subscription)
+            snapshot = _snapshot_message(event_id, watched['state'])
+            if not self._thread:
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+        return subscription, snapshot
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            watched = self._watched.get(subscription.event_id)
+            if watched:
+                watched['subscribers'].discard(subscription)
+                if not watched['subscribers']:
+                    del self._watched[subscription.event_id]
+
+    def snapshot(self, event_id):
+        with self._lock:
+            watched = self._watched.get(event_id)
+            return _snapshot_message(event_id, watched['state']) if watched else None
+
+    def viewers(self):
+        """{event_id: number of subscribers}"""
+        with self._lock:
+            return {event_id: len(w['subscribers']) for event_id, w in self._watched.items()}
+
+    def wake(self, *args):
+        """Read availability now instead of at the next interval"""
+        self._wake.set()
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            started = time.time()
+            with self._lock:
+                event_ids = list(self._watched)
+            if event_ids:
+                try:
+                    self._publish(read_availability(event_ids))
+                except Exception as e:
+                    print(f"Availability feed error: {e}")
+            # Bursts of local sales share one read
+            time.sleep(max(self.min_interval - (time.time() - started), 0))
+
+    def _publish(self, states):
+        with self._lock:
+            for event_id, state in states.items():
+                watched = self._watched.get(event_id)
+                if not watched:
+                    continue
+                message = _delta_message(event_id, watched['state'], state)
+                watched['state'] = state
+                if message:
+                    for subscription in watched['subscribers']:
+                        subscription.push(message)
+
+feed = AvailabilityFeed(Config.AVAILABILITY_POLL_INTERVAL, Config.AVAILABILITY_MIN_INTERVAL)
+inventory.add_listener(feed.wake)
+seat_map.add_listener(feed.wake)
+change_feed.subscribe('tickets', feed.wake)
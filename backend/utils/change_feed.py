@@ -0,0 +1,101 @@
+import json
+import select
+import threading
+import psycopg2
+from config import Config
+
+CHANNEL = 'catalog_changes'
+
+# table -> functions called as handler(change) for each notification, where
+# change is {'table', 'ids', ...related ids}. ids is None when anything in
+# the table may have changed (large statements, or notifications missed
+# while the listener was reconnecting)
+_handlers = {}
+
+def subscribe(table, handler):
+    """Get notified when rows of a catalog table change on any worker"""
+    _handlers.setdefault(table, []).append(handler)
+
+def dispatch(change):
+    for handler in _handlers.get(change.get('table'), []):
+        try:
+            handler(change)
+        except Exception as e:
+            print(f"Change handler error ({change.get('table')}): {e}")
+
+def dispatch_all():
+    """Tell every handler that anything may have changed"""
+    for table in list(_handlers):
+        dispatch({'table': table, 'ids': None})
+
+class ChangeListener:
+    """
+    Listens for the catalog change notifications sent by migration 008's
+    triggers and dispatches them to the handlers of this worker.
+
+    LISTEN needs a session of its own, so the listener keeps a dedicated
+    autocommit connection (not the shared one, and not through a
+    transaction pooler). When the connection drops it reconnects with
+    backoff and then invalidates everything, since notifications sent in
+    between are lost.
+    """
+
+    def __init__(self, database_url, keepalive=30):
+        self.database_url = database_url
+        self.keepalive = keepalive
+        self._thread = None
+        self._stop = threading.Event()
+        self.connected = False
+
+    def start(self):
+        if self._thread:
+            return
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        backoff = 1
+        first = True
+        while not self._stop.is_set():
+            conn = None
+            try:
+                conn = psycopg2.connect(self.database_url)
+                conn.autocommit = True
+                conn.cursor().execute(f"LISTEN {CHANNEL}")
+                self.connected = True
+                if not first:
+                    dispatch_all()
+                first = False
+                backoff = 1
+                self._listen(conn)
+            except Exception as e:
+                print(f"Change listener error: {e}")
+            finally:
+                self.connected = False
+                if conn:
+                    try:
+                        conn.close()
+                    except Exception:
+                        pass
+            self._stop.wait(backoff)
+            backoff = min(backoff * 2, 30)
+
+    def _listen(self, conn):
+        while not self._stop.is_set():
+            if select.select([conn], [], [], self.keepalive) == ([], [], []):
+                # Idle: make sure the connection is still alive
+                conn.cursor().execute("SELECT 1")
+            conn.poll()
+            while conn.notifies:
+                notification = conn.notifies.pop(0)
+                try:
+                    change = json.loads(notification.payload)
+                except ValueError:
+                    print(f"Invalid change notification: {notification.payload}")
+                    continue
+                dispatch(change)
+
+listener = ChangeListener(Config.CHANGE_NOTIFICATIONS_URL) if Config.CHANGE_NOTIFICATIONS_ENABLED else None
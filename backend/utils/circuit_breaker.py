@@ -0,0 +1,262 @@
+import asyncio
+import threading
+import time
+from collections import deque
+from utils.payment_gateway import PaymentGateway
+
+class CallRejectedError(Exception):
+    """Raised when a protected call is rejected without being attempted"""
+
+    retry_after = 1
+
+class CircuitOpenError(CallRejectedError):
+    """Raised when the circuit breaker is open"""
+
+class BulkheadFullError(CallRejectedError):
+    """Raised when too many calls are already in flight"""
+
+class CircuitBreaker:
+    """
+    Circuit breaker over a sliding window of recent calls.
+
+    The circuit opens when, over the last window_size calls (and at least
+    min_calls), the failure rate or the slow call rate reaches its threshold.
+    While open every call is rejected. After open_seconds the circuit goes
+    half-open and lets half_open_calls probe calls through: if they all
+    succeed it closes again, otherwise it re-opens.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_rate=0.5, slow_call_ms=5000, slow_call_rate=0.5,
+                 window_size=20, min_calls=10, open_seconds=30, half_open_calls=3):
+        self.failure_rate = failure_rate
+        self.slow_call_ms = slow_call_ms
+        self.slow_call_rate = slow_call_rate
+        self.window_size = window_size
+        self.min_calls = min_calls
+        self.open_seconds = open_seconds
+        self.half_open_calls = half_open_calls
+        self._lock = threading.Lock()
+        self._window = deque(maxlen=window_size)
+        self._state = self.CLOSED
+        self._opened_at = 0
+        self._probes_started = 0
+        self._probes_succeeded = 0
+
+    @property
+    def state(self):
+        with self._lock:
+            self._refresh()
+            return self._state
+
+    def retry_after(self):
+        """Seconds until the circuit will let probe calls through"""
+        with self._lock:
+            if self._state != self.OPEN:
+                return 0
+            return max(self.open_seconds - (time.time() - self._opened_at), 0)
+
+    def allow_request(self):
+        """Return True if a call may be attempted now"""
+        with self._lock:
+            self._refresh()
+            if self._state == self.CLOSED:
+                return True
+            if self._state == self.HALF_OPEN and self._probes_started < self.half_open_calls:
+                self._probes_started += 1
+                return True
+            return False
+
+    def record(self, failed, duration_ms):
+        """Record the outcome of a call that allow_request() let through"""
+        slow = duration_ms >= self.slow_call_ms
+        with self._lock:
+            if self._state == self.HALF_OPEN:
+                if failed or slow:
+                    self._open()
+                else:
+                    self._probes_succeeded += 1
+                    if self._probes_succeeded >= self.half_open_calls:
+                        self._state = self.CLOSED
+                        self._window.clear()
+                return
+
+            if self._state == self.OPEN:
+                return
+
+            self._window.append((failed, slow))
+            calls = len(self._window)
+            if calls < self.min_calls:
+                return
+
+            failures = sum(1 for f, _ in self._window if f)
+            slow_calls = sum(1 for _, s in self._window if s)
+            if failures / calls >= self.failure_rate or slow_calls / calls >= self.slow_call_rate:
+                self._open()
+
+    def stats(self):
+        with self._lock:
+            self._refresh()
+            calls = len(self._window)
+            return {
+                'state': self._state,
+                'calls': calls,
+                'failures': sum(1 for f, _ in self._window if f),
+                'slow_calls': sum(1 for _, s in self._window if s)
+            }
+
+    def _open(self):
+        self._state = self.OPEN
+        self._opened_at = time.time()
+        self._window.clear()
+
+    def _refresh(self):
+        if self._state == self.OPEN and time.time() - self._opened_at >= self.open_seconds:
+            self._state = self.HALF_OPEN
+            self._probes_started = 0
+            self._probes_succeeded = 0
+
+class Bulkhead:
+    """Limits how many calls can be in flight at the same time"""
+
+    def __init__(self, max_concurrent=10, max_wait=0.5):
+        self.max_concurrent = max_concurrent
+        self.max_wait = max_wait
+        self._semaphore = threading.BoundedSemaphore(max_concurrent)
+
+    def acquire(self):
+        """Take a slot, waiting at most max_wait seconds. Returns False if none was free"""
+        return self._semaphore.acquire(timeout=self.max_wait) if self.max_wait else self._semaphore.acquire(blocking=False)
+
+    def release(self):
+        self._semaphore.release()
+
+class ProtectedGateway(PaymentGateway):
+    """
+    Wraps a PaymentGateway with a bulkhead and a circuit breaker.
+
+    Calls that return None (the gateway failure contract) or raise count as
+    failures. Rejected calls raise CircuitOpenError or BulkheadFullError
+    immediately instead of tying up a worker on a struggling provider.
+    """
+
+    def __init__(self, gateway, breaker, bulkhead):
+        self.gateway = gateway
+        self.breaker = breaker
+        self.bulkhead = bulkhead
+
+    def ensure_available(self):
+        """Raise CircuitOpenError if the circuit is open"""
+        if self.breaker.state == CircuitBreaker.OPEN:
+            raise self._circuit_open()
+
+    def stats(self):
+        stats = self.breaker.stats()
+        stats['retry_after'] = self.breaker.retry_after()
+        stats['max_concurrent'] = self.bulkhead.max_concurrent
+        return stats
+
+    def create_payment(self, amount, currency='USD', return_url=None, cancel_url=None):
+        return self._call(self.gateway.create_payment, amount, currency, return_url, cancel_url)
+
+    def execute_payment(self, payment_id, payer_id):
+        return self._call(self.gateway.execute_payment, payment_id, payer_id)
+
+    def get_payment_details(self, payment_id):
+        return self._call(self.gateway.get_payment_details, payment_id)
+
+    def verify_webhook_signature(self, headers, event, webhook_id):
+        # An invalid signature (False) is a normal answer, not a provider
+        # failure; None (could not verify) is
+        return self._call(self.gateway.verify_webhook_signature, headers, event, webhook_id)
+
+    def __getattr__(self, name):
+        # Gateway specific helpers (e.g. FakePaymentGateway.approve) pass through
+        return getattr(self.gateway, name)
+
+    def _circuit_open(self):
+        error = CircuitOpenError('Payment provider unavailable')
+        error.retry_after = max(int(self.breaker.retry_after()), 1)
+        return error
+
+    def _call(self, method, *args):
+        if not self.bulkhead.acquire():
+            raise BulkheadFullError('Too many payment requests in progress')
+
+        try:
+            if not self.breaker.allow_request():
+                raise self._circuit_open()
+
+            started = time.time()
+            try:
+                result = method(*args)
+            except Exception:
+                self.breaker.record(True, (time.time() - started) * 1000)
+                raise
+
+            self.breaker.record(result is None, (time.time() - started) * 1000)
+            return result
+        finally:
+            self.bulkhead.release()
+
+class AsyncBulkhead:
+    """Bulkhead for coroutines: limits the calls in flight on one event loop"""
+
+    def __init__(self, max_concurrent=10, max_wait=0.5):
+        self.max_concurrent = max_concurrent
+        self.max_wait = max_wait
+        self._semaphore = None
+
+    async def acquire(self):
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrent)
+        if self._semaphore.locked() and not self.max_wait:
+            return False
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), self.max_wait or None)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    def release(self):
+        self._semaphore.release()
+
+class AsyncProtectedGateway(ProtectedGateway):
+    """
+    ProtectedGateway for an async gateway (e.g. AsyncPayPalIntegration).
+
+    Pass it the sync gateway's circuit breaker so failures seen by either
+    path open the circuit for both.
+    """
+
+    async def create_payment(self, amount, currency='USD', return_url=None, cancel_url=None):
+        return await self._call(self.gateway.create_payment, amount, currency, return_url, cancel_url)
+
+    async def execute_payment(self, payment_id, payer_id):
+        return await self._call(self.gateway.execute_payment, payment_id, payer_id)
+
+    async def get_payment_details(self, payment_id):
+        return await self._call(self.gateway.get_payment_details, payment_id)
+
+    async def _call(self, method, *args):
+        if not await self.bulkhead.acquire():
+            raise BulkheadFullError('Too many payment requests in progress')
+
+        try:
+            if not self.breaker.allow_request():
+                raise self._circuit_open()
+
+            started = time.time()
+            try:
+                result = await method(*args)
+            except Exception:
+                self.breaker.record(True, (time.time() - started) * 1000)
+                raise
+
+            self.breaker.record(result is None, (time.time() - started) * 1000)
+            return result
+        finally:
+            self.bulkhead.release()
@@ -1,12 +1,216 @@
+from collections import Counter
+from contextlib import contextmanager
+from itertools import count
+import re
+import threading
+import time
+import weakref
+from flask import g, has_request_context, request
 from supabase import create_client
 from config import Config
 import psycopg2
 from psycopg2.extras import RealDictCursor
+from psycopg2.pool import ThreadedConnectionPool
+
+# Row locks (FOR UPDATE/SHARE and their variants), data-modifying CTEs and
+# sequence calls make a SELECT or WITH a write
+_WRITE_CLAUSE = re.compile(
+    r'\bFOR\s+(?:NO\s+KEY\s+)?UPDATE\b|\bFOR\s+(?:KEY\s+)?SHARE\b'
+    r'|\b(?:INSERT|UPDATE|DELETE)\b|\b(?:NEXTVAL|SETVAL)\s*\('
+)
+
+def is_read_only(query):
+    """Whether a statement only reads, so a replica can run it"""
+    statement = query.lstrip().upper()
+    if not statement.startswith(('SELECT', 'WITH')):
+        return False
+    return not _WRITE_CLAUSE.search(statement)
+
+def _read_only(query):
+    """is_read_only(), already worked out for registered queries"""
+    return query.read_only if isinstance(query, Query) else is_read_only(query)
+
+class Query(str):
+    """
+    SQL text registered under a name (see register_query), carrying what
+    execute_query otherwise works out on every call: whether it only reads,
+    and the type of its rows. Being a str, it can be passed anywhere SQL is.
+    """
+
+    def __new__(cls, name, sql, row=dict, prepare=False, read_only=None):
+        query = super().__new__(cls, sql)
+        query.name = name
+        query.read_only = is_read_only(sql) if read_only is None else read_only
+        query.row = row
+        query.prepare = prepare
+        if prepare:
+            if not re.fullmatch(r'[a-z_][a-z0-9_]*', name) or '%(' in sql:
+                raise ValueError(f"Query '{name}' can't be prepared: it needs a lowercase identifier name and %s placeholders")
+            body, params = _numbered(sql)
+            query.prepare_sql = f"PREPARE {name} AS {body}"
+            query.execute_sql = f"EXECUTE {name} ({', '.join(['%s'] * params)})" if params else f"EXECUTE {name}"
+        return query
+
+def _numbered(sql):
+    """SQL with psycopg2's %s placeholders as PREPARE's $1, $2..., and their count"""
+    params = 0
+    parts = []
+    for part in re.split(r'(%%|%s)', sql):
+        if part == '%s':
+            params += 1
+            part = f"${params}"
+        elif part == '%%':
+            part = '%'
+        parts.append(part)
+    return ''.join(parts), params
+
+_queries = {}
+
+def register_query(name, sql, row=dict, prepare=False, read_only=None):
+    """
+    Register a named query. row is the default row type of fetch_one and
+    fetch_all: dict, tuple, or a class built from the column values in
+    order (e.g. a namedtuple). prepare=True runs it as a server-side
+    prepared statement, parsed and planned once per connection.
+    read_only=False keeps a SELECT on the primary, e.g. one calling a
+    function that writes or one that must not see replica lag
+    """
+    query = _queries.get(name)
+    if query is not None:
+        if query != sql:
+            raise ValueError(f"Query '{name}' is already registered with different SQL")
+        return query
+    query = _queries[name] = Query(name, sql, row, prepare, read_only)
+    return query
+
+def get_query(name):
+    return _queries[name]
+
+def registered_queries():
+    return dict(_queries)
+
+def _shape(values, row):
+    """A fetched row (a RealDictRow for dict, a tuple otherwise) as row type"""
+    if values is None or row is dict or row is tuple:
+        return values
+    return row(*values)
+
+class PreparedStatements:
+    """
+    Which registered queries are prepared on which connections, and how many
+    runs reused a statement instead of having Postgres parse and plan it
+    """
+
+    def __init__(self):
+        self._names = weakref.WeakKeyDictionary()  # connection -> names prepared on it
+        self._conn_locks = weakref.WeakKeyDictionary()  # connection -> threading.Lock
+        self._lock = threading.Lock()
+        self.prepares = Counter()
+        self.hits = Counter()
+
+    def applies(self, query):
+        return isinstance(query, Query) and query.prepare and Config.PREPARED_STATEMENTS_ENABLED
+
+    def lock(self, conn):
+        """
+        Lock to hold from needed() to prepared() on a connection several
+        threads share, or two first runs would both PREPARE and the second
+        would fail (and roll back the shared connection)
+        """
+        with self._lock:
+            lock = self._conn_locks.get(conn)
+            if lock is None:
+                lock = self._conn_locks[conn] = threading.Lock()
+            return lock
+
+    def needed(self, conn, query):
+        """Whether query must be prepared on conn first; counts a hit when not"""
+        with self._lock:
+            if query.name in self._names.get(conn, ()):
+                self.hits[query.name] += 1
+                return False
+            return True
+
+    def prepared(self, conn, query):
+        with self._lock:
+            self._names.setdefault(conn, set()).add(query.name)
+            self.prepares[query.name] += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                name: {'prepares': self.prepares[name], 'hits': self.hits[name]}
+                for name in sorted(self.prepares)
+            }
+
+prepared_statements = PreparedStatements()
+
+def _execute(conn, cursor, query, params):
+    """Run query on cursor, as a prepared statement when it is registered as one"""
+    if not prepared_statements.applies(query):
+        cursor.execute(query, params)
+        return
+    with prepared_statements.lock(conn):
+        if prepared_statements.needed(conn, query):
+            cursor.execute(query.prepare_sql)
+            prepared_statements.prepared(conn, query)
+    cursor.execute(query.execute_sql, params)
+
+class Replica:
+    """A read replica connection and its replication lag, checked every so often"""
+
+    LAG_QUERY = """
+        SELECT CASE
+            WHEN NOT pg_is_in_recovery() THEN 0
+            WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+            ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+        END as lag
+    """
+
+    def __init__(self, url):
+        self.url = url
+        self.conn = None
+        self.lag = None
+        self.checked_at = 0
+        self.reads = 0
+        self._lock = threading.Lock()
+
+    def connection(self):
+        if not self.conn or self.conn.closed:
+            # Fail fast so a dead replica doesn't stall requests until its next check
+            self.conn = psycopg2.connect(self.url, connect_timeout=3)
+            self.conn.set_session(readonly=True, autocommit=True)
+        return self.conn
+
+    def usable(self):
+        """Whether the replica is up and within REPLICA_MAX_LAG_SECONDS of the primary"""
+        with self._lock:
+            if time.time() - self.checked_at >= Config.REPLICA_LAG_CHECK_INTERVAL:
+                self.checked_at = time.time()
+                try:
+                    with self.connection().cursor() as cursor:
+                        cursor.execute(self.LAG_QUERY)
+                        self.lag = float(cursor.fetchone()[0])
+                except Exception as e:
+                    print(f"Replica check error: {e}")
+                    self.lag = None
+            return self.lag is not None and self.lag <= Config.REPLICA_MAX_LAG_SECONDS
+
+    def failed(self):
+        """Skip the replica until its next check"""
+        with self._lock:
+            self.lag = None
+            self.checked_at = time.time()
 
 class SupabaseDB:
     _instance = None
     _client = None
     _pg_conn = None
+    _replicas = None
+    _transaction_pool = None
+    _pool_lock = threading.Lock()
+    _connect_lock = threading.Lock()
+    _stream_names = count()
 
     def __new__(cls):
         if cls._instance is None:
@@ -21,6 +225,11 @@ class SupabaseDB:
                 self._pg_conn = psycopg2.connect(Config.DATABASE_URL)
             except Exception as e:
                 print(f"PostgreSQL connection error: {e}")
+        if self._replicas is None:
+            self._replicas = [Replica(url) for url in Config.DATABASE_REPLICA_URLS]
+            self._next_replica = count()
+            self._sticky_users = {}  # user_id -> time until which their reads use the primary
+            self._primary_reads = 0
 
     def get_client(self):
         return self._client
@@ -32,8 +241,11 @@ class SupabaseDB:
         Otherwise, use the table-based approach.
         """
         try:
-            # If it's a SQL query (contains spaces and SQL keywords)
-            if ' ' in table_or_query and any(keyword in table_or_query.upper() for keyword in ['SELECT', 'INSERT', 'UPDATE', 'DELETE']):
+            # If it's a SQL query (registered, or contains spaces and SQL keywords)
+            if isinstance(table_or_query, Query) or ' ' in table_or_query and any(keyword in table_or_query.upper() for keyword in ['SELECT', 'INSERT', 'UPDATE', 'DELETE']):
+                # SQL parameters are passed as the second positional argument
+                if query_params is None and not isinstance(query_type, str):
+                    query_params = query_type
                 return self._execute_sql(table_or_query, query_params, fetch)
             
             # Otherwise, use table-based approach
@@ -57,28 +269,58 @@ class SupabaseDB:
             print(f"Supabase query error: {e}")
             raise
 
+    def _connection(self):
+        """The primary connection, reconnecting if it was closed"""
+        if not self._pg_conn or self._pg_conn.closed:
+            # One reconnect however many threads notice the closed connection
+            with self._connect_lock:
+                if not self._pg_conn or self._pg_conn.closed:
+                    self._pg_conn = psycopg2.connect(Config.DATABASE_URL)
+        return self._pg_conn
+
+    def _read_replica(self, read):
+        """
+        Run read(connection) on a replica when the request may use one.
+        Returns (True, result), or (False, None) when the primary must run it
+        """
+        replica = self._pick_replica()
+        if replica:
+            try:
+                result = read(replica.connection())
+                replica.reads += 1
+                return True, result
+            except psycopg2.errors.ReadOnlySqlTransaction:
+                pass
+            except psycopg2.Error as e:
+                print(f"Replica query error, using primary: {e}")
+                replica.failed()
+        self._primary_reads += 1
+        return False, None
+
     def _execute_sql(self, query, params=None, fetch=None):
         """Execute raw SQL query using PostgreSQL connection"""
+        read_only = _read_only(query)
+        if read_only and fetch in ('one', 'all', True):
+            done, result = self._read_replica(lambda conn: self._fetch(conn, query, params, fetch))
+            if done:
+                return result
+        else:
+            self._note_write()
+
         try:
-            if not self._pg_conn or self._pg_conn.closed:
-                self._pg_conn = psycopg2.connect(Config.DATABASE_URL)
+            conn = self._connection()
             
-            with self._pg_conn.cursor(cursor_factory=RealDictCursor) as cursor:
-                cursor.execute(query, params)
-                
-                if fetch == 'one':
-                    result = cursor.fetchone()
-                    return dict(result) if result else None
-                elif fetch == True or fetch == 'all':
+            if fetch == 'one' or fetch == True or fetch == 'all':
+                return self._fetch(conn, query, params, fetch)
+
+            with conn.cursor(cursor_factory=RealDictCursor) as cursor:
+                _execute(conn, cursor, query, params)
+                # For INSERT/UPDATE/DELETE operations
+                conn.commit()
+                if cursor.description:  # If query returns data
                     results = cursor.fetchall()
                     return [dict(row) for row in results] if results else []
-                else:
-                    # For INSERT/UPDATE/DELETE operations
-                    self._pg_conn.commit()
-                    if cursor.description:  # If query returns data
-                        results = cursor.fetchall()
-                        return [dict(row) for row in results] if results else []
-                    return True
+                return True
                     
         except Exception as e:
             if self._pg_conn:
@@ -86,6 +328,183 @@ class SupabaseDB:
             print(f"SQL execution error: {e}")
             raise
 
+    def _fetch(self, conn, query, params, fetch):
+        with conn.cursor(cursor_factory=RealDictCursor) as cursor:
+            _execute(conn, cursor, query, params)
+            if fetch == 'one':
+                result = cursor.fetchone()
+                return dict(result) if result else None
+            results = cursor.fetchall()
+            return [dict(row) for row in results] if results else []
+
+    # Typed query API: one method per result shape, for SQL text or
+    # registered queries. Rows are returned as fetched (RealDictRow for dict
+    # rows) instead of copied, and statements that write are committed.
+
+    def fetch_one(self, query, params=None, row=None):
+        """The first row, or None"""
+        return self._run(query, params, row or getattr(query, 'row', dict), 'one')
+
+    def fetch_all(self, query, params=None, row=None):
+        """All rows, as a list"""
+        return self._run(query, params, row or getattr(query, 'row', dict), 'all')
+
+    def fetch_value(self, query, params=None):
+        """The first column of the first row, or None"""
+        values = self._run(query, params, tuple, 'one')
+        return values[0] if values else None
+
+    def execute(self, query, params=None):
+        """Run a statement on the primary and commit it. Returns the row count"""
+        return self._run(query, params, None, 'count')
+
+    def stream(self, query, params=None, row=None, fetch_size=None):
+        """
+        Yield the rows of a read-only query, fetched fetch_size at a time from
+        a server-side (named) cursor, so memory stays flat however many rows
+        it returns. Runs on a connection of its own, as a commit on the
+        shared one would close the cursor; closing the generator closes it
+        """
+        if not _read_only(query):
+            raise ValueError('Only read-only queries can be streamed')
+        row = row or getattr(query, 'row', dict)
+        conn = self._stream_connection()
+        try:
+            conn.set_session(readonly=True)
+            with conn.cursor(
+                name=f"stream_{next(self._stream_names)}",
+                cursor_factory=RealDictCursor if row is dict else None
+            ) as cursor:
+                cursor.itersize = fetch_size or Config.DB_STREAM_FETCH_SIZE
+                cursor.execute(query, params)
+                for values in cursor:
+                    yield values if row is dict or row is tuple else row(*values)
+            conn.rollback()
+        finally:
+            conn.close()
+
+    def _stream_connection(self):
+        """A new connection to a replica the request may read from, or to the primary"""
+        replica = self._pick_replica()
+        if replica:
+            try:
+                conn = psycopg2.connect(replica.url, connect_timeout=3)
+                replica.reads += 1
+                return conn
+            except psycopg2.Error as e:
+                print(f"Replica connection error, using primary: {e}")
+                replica.failed()
+        self._primary_reads += 1
+        return psycopg2.connect(Config.DATABASE_URL)
+
+    def _run(self, query, params, row, result):
+        read_only = _read_only(query)
+        if read_only and result != 'count':
+            done, rows = self._read_replica(lambda conn: self._cursor_result(conn, query, params, row, result))
+            if done:
+                return rows
+        else:
+            self._note_write()
+
+        conn = self._connection()
+        try:
+            rows = self._cursor_result(conn, query, params, row, result)
+            if not read_only or result == 'count':
+                conn.commit()
+            return rows
+        except Exception as e:
+            conn.rollback()
+            print(f"SQL execution error ({getattr(query, 'name', 'sql')}): {e}")
+            raise
+
+    def _cursor_result(self, conn, query, params, row, result):
+        with conn.cursor(cursor_factory=RealDictCursor if row is dict else None) as cursor:
+            _execute(conn, cursor, query, params)
+            if result == 'count':
+                return cursor.rowcount
+            if result == 'one':
+                return _shape(cursor.fetchone(), row)
+            rows = cursor.fetchall()
+            if row is dict or row is tuple:
+                return rows
+            return [row(*values) for values in rows]
+
+    def _pick_replica(self):
+        """
+        A replica for a read of the current request, or None for the primary:
+        outside requests, once the request has written, for users who wrote
+        in the last REPLICA_STICKY_SECONDS (so they see their own cart and
+        orders) and when every replica is down or lagging
+        """
+        if not self._replicas or not has_request_context() or g.get('db_wrote'):
+            return None
+        user = getattr(request, 'user', None)
+        if user and self._sticky_users.get(user.get('user_id'), 0) > time.time():
+            return None
+        for _ in range(len(self._replicas)):
+            replica = self._replicas[next(self._next_replica) % len(self._replicas)]
+            if replica.usable():
+                return replica
+        return None
+
+    def _note_write(self):
+        if not self._replicas or not has_request_context():
+            return
+        g.db_wrote = True
+        user = getattr(request, 'user', None)
+        if user and user.get('user_id') is not None:
+            now = time.time()
+            if len(self._sticky_users) > 10000:
+                self._sticky_users = {u: t for u, t in self._sticky_users.items() if t > now}
+            self._sticky_users[user['user_id']] = now + Config.REPLICA_STICKY_SECONDS
+
+    def replica_stats(self):
+        """Reads served by each replica and by the primary"""
+        return {
+            'primary_reads': self._primary_reads,
+            'replicas': [
+                {'reads': r.reads, 'lag': r.lag, 'usable': r.lag is not None and r.lag <= Config.REPLICA_MAX_LAG_SECONDS}
+                for r in self._replicas
+            ]
+        }
+
+    @contextmanager
+    def transaction(self):
+        """
+        Run several SQL statements atomically.
+        Yields a cursor returning dict rows; commits on success, rolls back on error.
+        Each transaction has a pooled connection to itself, so statements other
+        threads run on the shared connection (and their commits) stay out of it.
+        """
+        if self._transaction_pool is None:
+            with self._pool_lock:
+                if self._transaction_pool is None:
+                    SupabaseDB._transaction_slots = threading.BoundedSemaphore(Config.DB_TRANSACTION_POOL_MAX)
+                    SupabaseDB._transaction_pool = ThreadedConnectionPool(
+                        0, Config.DB_TRANSACTION_POOL_MAX, Config.DATABASE_URL
+                    )
+        # The pool raises instead of waiting when every connection is in use
+        self._transaction_slots.acquire()
+        try:
+            conn = self._transaction_pool.getconn()
+        except Exception:
+            self._transaction_slots.release()
+            raise
+        self._note_write()
+        
+        try:
+            with conn.cursor(cursor_factory=RealDictCursor) as cursor:
+                yield cursor
+            conn.commit()
+        except Exception as e:
+            if not conn.closed:
+                conn.rollback()
+            print(f"Transaction error: {e}")
+            raise
+        finally:
+            self._transaction_pool.putconn(conn, close=bool(conn.closed))
+            self._transaction_slots.release()
+
 # Global Supabase client instance
 supabase_db = SupabaseDB()
 
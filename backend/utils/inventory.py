@@ -0,0 +1,191 @@
+from utils.db import get_db
+
+db = get_db()
+
+# Ticket inventory updates.
+#
+# A tier is either plain (tickets.quantity_sold is the counter) or striped
+# (tickets.stripes > 0): its capacity is split over ticket_stripes rows and
+# each purchase updates one randomly chosen stripe with enough stock, skipping
+# stripes locked by concurrent purchases. The ticket_inventory view sums the
+# stripes so readers see the live totals either way.
+
+# Functions called as listener(ticket_id, quantity) after this worker records
+# a sale (quantity > 0) or gives tickets back (quantity < 0)
+_listeners = []
+
+def add_listener(listener):
+    """Get notified when the sold counter of a tier changes"""
+    _listeners.append(listener)
+
+def notify(ticket_id, quantity):
+    """Tell the listeners that a tier's sold counter changed by quantity"""
+    for listener in _listeners:
+        try:
+            listener(ticket_id, quantity)
+        except Exception as e:
+            print(f"Inventory listener error: {e}")
+
+def _split(total, parts):
+    """Split total into parts nearly equal integers"""
+    return [total // parts + (1 if i < total % parts else 0) for i in range(parts)]
+
+def enable_striping(ticket_id, stripes):
+    """
+    Spread a tier's inventory over the given number of stripes (0 turns
+    striping off). Returns False if the ticket does not exist.
+    """
+    with db.transaction() as cursor:
+        cursor.execute("""
+            SELECT id, quantity_available, quantity_sold, stripes
+            FROM tickets WHERE id = %s FOR UPDATE
+        """, (ticket_id,))
+        ticket = cursor.fetchone()
+        if not ticket:
+            return False
+
+        sold = ticket['quantity_sold']
+        if ticket['stripes'] > 0:
+            cursor.execute("""
+                SELECT COALESCE(SUM(quantity_sold), 0) as sold
+                FROM ticket_stripes WHERE ticket_id = %s
+            """, (ticket_id,))
+            sold = cursor.fetchone()['sold']
+            cursor.execute("DELETE FROM ticket_stripes WHERE ticket_id = %s", (ticket_id,))
+
+        if stripes > 0:
+            remaining = max(ticket['quantity_available'] - sold, 0)
+            for stripe, share in enumerate(_split(remaining, stripes)):
+                # Stripe 0 carries the tickets sold before striping
+                stripe_sold = sold if stripe == 0 else 0
+                cursor.execute("""
+                    INSERT INTO ticket_stripes (ticket_id, stripe, quantity_available, quantity_sold)
+                    VALUES (%s, %s, %s, %s)
+                """, (ticket_id, stripe, share + stripe_sold, stripe_sold))
+
+        cursor.execute("""
+            UPDATE tickets SET stripes = %s, quantity_sold = %s WHERE id = %s
+        """, (stripes, sold, ticket_id))
+
+    return True
+
+def rebalance(ticket_id, need=0):
+    """
+    Redistribute a striped tier's remaining stock evenly over its stripes,
+    making sure one stripe can hold `need` tickets when there is enough stock.
+    """
+    with db.transaction() as cursor:
+        _rebalance(cursor, ticket_id, need)
+
+def _rebalance(cursor, ticket_id, need):
+    cursor.execute("""
+        SELECT stripe, quantity_available, quantity_sold
+        FROM ticket_stripes WHERE ticket_id = %s
+        ORDER BY stripe FOR UPDATE
+    """, (ticket_id,))
+    stripes = cursor.fetchall()
+    if not stripes:
+        return
+
+    remaining = max(sum(s['quantity_available'] - s['quantity_sold'] for s in stripes), 0)
+    if need and remaining >= need and remaining // len(stripes) < need:
+        shares = [need] + _split(remaining - need, len(stripes) - 1) if len(stripes) > 1 else [remaining]
+    else:
+        shares = _split(remaining, len(stripes))
+
+    for s, share in zip(stripes, shares):
+        cursor.execute("""
+            UPDATE ticket_stripes SET quantity_available = %s
+            WHERE ticket_id = %s AND stripe = %s
+        """, (s['quantity_sold'] + share, ticket_id, s['stripe']))
+
+def _claim_stripe(cursor, ticket_id, quantity, skip_locked):
+    cursor.execute(f"""
+        UPDATE ticket_stripes SET quantity_sold = quantity_sold + %s
+        WHERE ticket_id = %s AND stripe = (
+            SELECT stripe FROM ticket_stripes
+            WHERE ticket_id = %s AND quantity_available - quantity_sold >= %s
+            ORDER BY random()
+            LIMIT 1
+            FOR UPDATE{' SKIP LOCKED' if skip_locked else ''}
+        )
+        RETURNING stripe
+    """, (quantity, ticket_id, ticket_id, quantity))
+    return cursor.fetchone() is not None
+
+def claim(ticket_id, quantity, cursor=None):
+    """
+    Record the sale of `quantity` tickets of a tier.
+    Returns False, recording nothing, if not enough stock remains.
+    With the cursor of a db.transaction() the sale is part of that
+    transaction, and the caller calls notify() once it has committed.
+    """
+    if cursor is not None:
+        return _claim(cursor, ticket_id, quantity)
+
+    with db.transaction() as cursor:
+        claimed = _claim(cursor, ticket_id, quantity)
+    if claimed:
+        notify(ticket_id, quantity)
+    return claimed
+
+def _claim(cursor, ticket_id, quantity):
+    cursor.execute("""
+        UPDATE tickets SET quantity_sold = quantity_sold + %s
+        WHERE id = %s AND stripes = 0 AND quantity_available - quantity_sold >= %s
+        RETURNING id
+    """, (quantity, ticket_id, quantity))
+    if cursor.fetchone():
+        return True
+    cursor.execute("SELECT stripes FROM tickets WHERE id = %s", (ticket_id,))
+    ticket = cursor.fetchone()
+    if not ticket or not ticket['stripes']:
+        return False
+
+    # Striped tier: any free stripe, then wait for locked ones, then rebalance
+    if _claim_stripe(cursor, ticket_id, quantity, skip_locked=True):
+        return True
+    if _claim_stripe(cursor, ticket_id, quantity, skip_locked=False):
+        return True
+    _rebalance(cursor, ticket_id, quantity)
+    return _claim_stripe(cursor, ticket_id, quantity, skip_locked=False)
+
+def release(ticket_id, quantity):
+    """Give back `quantity` sold tickets of a tier (e.g. after a refund)"""
+    try:
+        _release(ticket_id, quantity)
+    finally:
+        notify(ticket_id, -quantity)
+
+def _release(ticket_id, quantity):
+    rows = db.execute_query("""
+        UPDATE tickets SET quantity_sold = GREATEST(quantity_sold - %s, 0)
+        WHERE id = %s AND stripes = 0
+        RETURNING id
+    """, (quantity, ticket_id))
+    if rows:
+        return
+
+    with db.transaction() as cursor:
+        cursor.execute("""
+            SELECT stripe, quantity_sold FROM ticket_stripes
+            WHERE ticket_id = %s AND quantity_sold > 0
+            ORDER BY quantity_sold DESC FOR UPDATE
+        """, (ticket_id,))
+        for s in cursor.fetchall():
+            if quantity <= 0:
+                break
+            taken = min(s['quantity_sold'], quantity)
+            cursor.execute("""
+                UPDATE ticket_stripes SET quantity_sold = quantity_sold - %s
+                WHERE ticket_id = %s AND stripe = %s
+            """, (taken, ticket_id, s['stripe']))
+            quantity -= taken
+
+def get_stripes(ticket_id):
+    """Get the stripes of a tier"""
+    return db.execute_query("""
+        SELECT stripe, quantity_available, quantity_sold,
+               (quantity_available - quantity_sold) as available
+        FROM ticket_stripes WHERE ticket_id = %s ORDER BY stripe
+    """, (ticket_id,), fetch=True)
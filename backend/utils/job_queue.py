@@ -0,0 +1,232 @@
+import json
+import sqlite3
+import threading
+import time
+import uuid
+
+class JobQueue:
+    """
+    Small durable job queue backed by SQLite.
+
+    Jobs are stored in a local SQLite file (or ':memory:' for a purely
+    in-process queue) and processed by a pool of background worker threads.
+    Each job can carry a lookup key (e.g. 'order:42') so request handlers can
+    poll or long-poll its status without touching PostgreSQL.
+
+    A failed job is retried up to max_attempts times, no sooner than the
+    exception's retry_after seconds (if it has one) after it failed.
+
+    Several processes can share one queue file. A worker claims a job with a
+    lease of `lease` seconds, which is renewed while the job runs; a job
+    whose lease ran out (its process died) is claimed again by any worker.
+    """
+
+    def __init__(self, path=':memory:', workers=4, max_attempts=3, poll_interval=1.0, lease=60):
+        self.path = path
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.poll_interval = poll_interval
+        self.lease = lease
+        self._handlers = {}
+        self._threads = []
+        self._running = {}  # job id -> claim token, for the jobs this process runs
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+        self._stopping = False
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                kind TEXT NOT NULL,
+                job_key TEXT,
+                payload TEXT NOT NULL,
+                status TEXT NOT NULL DEFAULT 'queued',
+                result TEXT,
+                error TEXT,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                run_after REAL NOT NULL DEFAULT 0,
+                claim TEXT,
+                lease_until REAL NOT NULL DEFAULT 0,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL
+            )
+        """)
+        # Queue files created before retries were delayed or jobs leased
+        columns = [row['name'] for row in self._conn.execute("PRAGMA table_info(jobs)")]
+        if 'run_after' not in columns:
+            self._conn.execute("ALTER TABLE jobs ADD COLUMN run_after REAL NOT NULL DEFAULT 0")
+        if 'lease_until' not in columns:
+            self._conn.execute("ALTER TABLE jobs ADD COLUMN claim TEXT")
+            self._conn.execute("ALTER TABLE jobs ADD COLUMN lease_until REAL NOT NULL DEFAULT 0")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs(status, id)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_key ON jobs(job_key, id)")
+
+    def register(self, kind, handler):
+        """Register the function that processes jobs of the given kind"""
+        self._handlers[kind] = handler
+
+    def enqueue(self, kind, payload, key=None):
+        """Add a job to the queue and return its id"""
+        now = time.time()
+        with self._changed:
+            cursor = self._conn.execute(
+                "INSERT INTO jobs (kind, job_key, payload, created_at, updated_at) VALUES (?, ?, ?, ?, ?)",
+                (kind, key, json.dumps(payload, default=str), now, now)
+            )
+            self._changed.notify_all()
+            return cursor.lastrowid
+
+    def get(self, job_id):
+        """Get a job by id"""
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._to_dict(row)
+
+    def latest(self, key, kind=None):
+        """Get the most recent job for a key, optionally filtered by kind"""
+        query = "SELECT * FROM jobs WHERE job_key = ?"
+        params = [key]
+        if kind:
+            query += " AND kind = ?"
+            params.append(kind)
+        query += " ORDER BY id DESC LIMIT 1"
+        with self._lock:
+            row = self._conn.execute(query, params).fetchone()
+        return self._to_dict(row)
+
+    def wait(self, key, timeout, kind=None):
+        """
+        Block until the latest job for a key has finished or timeout expires.
+        Returns the job as it was last seen (None if there is no such job).
+        """
+        deadline = time.time() + timeout
+        job = self.latest(key, kind)
+        while job and job['status'] in ('queued', 'running'):
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                break
+            with self._changed:
+                self._changed.wait(min(remaining, self.poll_interval))
+            job = self.latest(key, kind)
+        return job
+
+    def start(self):
+        """Start the background worker threads"""
+        if self._threads:
+            return
+        self._stopping = False
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._worker, name=f"job-worker-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        thread = threading.Thread(target=self._heartbeat, name="job-heartbeat", daemon=True)
+        thread.start()
+        self._threads.append(thread)
+
+    def stop(self, timeout=5):
+        """Stop the worker threads after their current job"""
+        with self._changed:
+            self._stopping = True
+            self._changed.notify_all()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    # A job is claimable when it is due, or its worker's lease has run out
+    _CLAIMABLE = "(status = 'queued' AND run_after <= ? OR status = 'running' AND lease_until < ?)"
+
+    def _claim(self):
+        """
+        Claim the next claimable job. The UPDATE only succeeds if the job is
+        still claimable, so a worker in another process that got there first
+        makes it claim the next one instead
+        """
+        with self._changed:
+            while True:
+                now = time.time()
+                row = self._conn.execute(
+                    f"SELECT * FROM jobs WHERE {self._CLAIMABLE} ORDER BY id LIMIT 1", (now, now)
+                ).fetchone()
+                if row is None:
+                    return None
+                claim = uuid.uuid4().hex
+                claimed = self._conn.execute(
+                    "UPDATE jobs SET status = 'running', attempts = attempts + 1, claim = ?, lease_until = ?, updated_at = ?"
+                    f" WHERE id = ? AND {self._CLAIMABLE}",
+                    (claim, now + self.lease, now, row['id'], now, now)
+                ).rowcount
+                if claimed:
+                    self._running[row['id']] = claim
+                    job = self._to_dict(row)
+                    job['attempts'] += 1
+                    job['status'] = 'running'
+                    return job
+
+    def _finish(self, job_id, status, result=None, error=None, delay=0):
+        """Record a job's outcome, unless another worker claimed it since"""
+        now = time.time()
+        with self._changed:
+            claim = self._running.pop(job_id, None)
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, result = ?, error = ?, run_after = ?, lease_until = 0, updated_at = ?"
+                " WHERE id = ? AND claim = ?",
+                (status, json.dumps(result, default=str) if result is not None else None,
+                 error, now + delay, now, job_id, claim)
+            )
+            self._changed.notify_all()
+
+    def _heartbeat(self):
+        """Renew the leases of the jobs this process runs"""
+        renew_at = time.time() + self.lease / 3
+        while True:
+            with self._changed:
+                if self._stopping:
+                    return
+                self._changed.wait(max(renew_at - time.time(), 0))
+                now = time.time()
+                if now < renew_at:
+                    continue
+                renew_at = now + self.lease / 3
+                for job_id, claim in self._running.items():
+                    self._conn.execute(
+                        "UPDATE jobs SET lease_until = ? WHERE id = ? AND claim = ?",
+                        (now + self.lease, job_id, claim)
+                    )
+
+    def _worker(self):
+        while True:
+            with self._changed:
+                if self._stopping:
+                    return
+            job = self._claim()
+            if job is None:
+                with self._changed:
+                    if not self._stopping:
+                        self._changed.wait(self.poll_interval)
+                continue
+
+            handler = self._handlers.get(job['kind'])
+            if handler is None:
+                self._finish(job['id'], 'failed', error=f"No handler for job kind '{job['kind']}'")
+                continue
+
+            try:
+                result = handler(job['payload'])
+                self._finish(job['id'], 'completed', result=result)
+            except Exception as e:
+                print(f"Job {job['id']} ({job['kind']}) error: {e}")
+                if job['attempts'] < self.max_attempts and getattr(e, 'retryable', True):
+                    self._finish(job['id'], 'queued', error=str(e), delay=getattr(e, 'retry_after', 0))
+                else:
+                    self._finish(job['id'], 'failed', error=str(e))
+
+    @staticmethod
+    def _to_dict(row):
+        if row is None:
+            return None
+        job = dict(row)
+        job['payload'] = json.loads(job['payload'])
+        job['result'] = json.loads(job['result']) if job['result'] else None
+        return job
@@ -0,0 +1,173 @@
+import hashlib
+import os
+import re
+import time
+import psycopg2
+from config import Config
+
+# Versioned SQL migrations.
+#
+# Files in migrations/ are named NNN_description.sql and applied in version
+# order, each exactly once. schema_migrations records the version and a
+# checksum of every applied file, so edits to a migration that already ran
+# are detected instead of silently diverging between environments.
+#
+# A migration runs in a single transaction unless its first lines contain
+# "-- migrate: no-transaction" (needed for CREATE INDEX CONCURRENTLY); such
+# files are split on semicolons ending a line and run statement by statement,
+# so they must be safe to re-run.
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'migrations')
+NO_TRANSACTION = '-- migrate: no-transaction'
+# Arbitrary key for pg_advisory_lock, so two runners never apply migrations at once
+LOCK_KEY = 727274
+
+class MigrationError(Exception):
+    """Raised when migrations cannot be applied safely"""
+
+def discover(directory=MIGRATIONS_DIR):
+    """Return the migration files ordered by version"""
+    migrations = []
+    for filename in sorted(os.listdir(directory)):
+        match = re.match(r'^(\d+)_(\w+)\.sql$', filename)
+        if not match:
+            continue
+        with open(os.path.join(directory, filename), encoding='utf-8') as f:
+            sql = f.read()
+        migrations.append({
+            'version': int(match.group(1)),
+            'name': match.group(2),
+            'filename': filename,
+            'sql': sql,
+            'checksum': hashlib.sha256(sql.encode('utf-8')).hexdigest(),
+            'transactional': NO_TRANSACTION not in sql.split('\n\n', 1)[0]
+        })
+
+    versions = [m['version'] for m in migrations]
+    duplicates = sorted({v for v in versions if versions.count(v) > 1})
+    if duplicates:
+        raise MigrationError(f"Duplicate migration versions: {', '.join(map(str, duplicates))}")
+    return sorted(migrations, key=lambda m: m['version'])
+
+def split_statements(sql):
+    """Split a script on semicolons that end a line, dropping comment-only chunks"""
+    statements = []
+    for chunk in re.split(r';[ \t]*$', sql, flags=re.M):
+        code = '\n'.join(line for line in chunk.split('\n') if not line.strip().startswith('--')).strip()
+        if code:
+            statements.append(chunk.strip())
+    return statements
+
+def _ensure_table(cursor):
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version INTEGER PRIMARY KEY,
+            name VARCHAR(255) NOT NULL,
+            checksum CHAR(64) NOT NULL,
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            duration_ms INTEGER
+        )
+    """)
+
+def _applied(cursor):
+    cursor.execute("SELECT version, name, checksum, applied_at FROM schema_migrations ORDER BY version")
+    return {row[0]: {'name': row[1], 'checksum': row[2], 'applied_at': row[3]} for row in cursor.fetchall()}
+
+def status(database_url=None, directory=MIGRATIONS_DIR):
+    """
+    Return [{'version', 'filename', 'state'}] where state is 'applied',
+    'pending', 'changed' (file edited after it ran) or 'missing' (no file).
+    """
+    conn = psycopg2.connect(database_url or Config.DATABASE_URL)
+    conn.autocommit = True
+    try:
+        with conn.cursor() as cursor:
+            _ensure_table(cursor)
+            applied = _applied(cursor)
+    finally:
+        conn.close()
+
+    result = []
+    files = {m['version']: m for m in discover(directory)}
+    for version in sorted(set(files) | set(applied)):
+        migration = files.get(version)
+        record = applied.get(version)
+        if not migration:
+            state = 'missing'
+        elif not record:
+            state = 'pending'
+        elif record['checksum'] != migration['checksum']:
+            state = 'changed'
+        else:
+            state = 'applied'
+        result.append({
+            'version': version,
+            'filename': migration['filename'] if migration else f"{version:03d}_{record['name']}.sql",
+            'state': state,
+            'applied_at': record['applied_at'] if record else None
+        })
+    return result
+
+def migrate(database_url=None, directory=MIGRATIONS_DIR, target=None, baseline=False, log=print):
+    """
+    Apply pending migrations up to `target` (all by default). With baseline=True
+    they are recorded as applied without running, for databases created before
+    the runner existed. Returns the applied versions.
+    Raises MigrationError if an applied migration was edited afterwards.
+    """
+    migrations = discover(directory)
+    conn = psycopg2.connect(database_url or Config.DATABASE_URL)
+    conn.autocommit = True
+    done = []
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT pg_advisory_lock(%s)", (LOCK_KEY,))
+            try:
+                _ensure_table(cursor)
+                applied = _applied(cursor)
+
+                changed = [m['filename'] for m in migrations
+                           if m['version'] in applied and applied[m['version']]['checksum'] != m['checksum']]
+                if changed:
+                    raise MigrationError(f"Applied migrations were modified: {', '.join(changed)}")
+
+                for migration in migrations:
+                    if migration['version'] in applied:
+                        continue
+                    if target is not None and migration['version'] > target:
+                        break
+
+                    log(f"{'Marking' if baseline else 'Applying'} {migration['filename']}...")
+                    _apply(conn, migration, run=not baseline)
+                    done.append(migration['version'])
+            finally:
+                cursor.execute("SELECT pg_advisory_unlock(%s)", (LOCK_KEY,))
+    finally:
+        conn.close()
+    return done
+
+def _apply(conn, migration, run=True):
+    """Run a migration and record it; transactional ones commit both together"""
+    started = time.time()
+    try:
+        conn.autocommit = not migration['transactional']
+        with conn.cursor() as cursor:
+            if run and migration['transactional']:
+                cursor.execute(migration['sql'])
+            elif run:
+                for statement in split_statements(migration['sql']):
+                    cursor.execute(statement)
+
+            cursor.execute("""
+                INSERT INTO schema_migrations (version, name, checksum, duration_ms)
+                VALUES (%s, %s, %s, %s)
+            """, (migration['version'], migration['name'], migration['checksum'],
+                  int((time.time() - started) * 1000)))
+        if not conn.autocommit:
+            conn.commit()
+    except Exception as e:
+        if not conn.autocommit:
+            conn.rollback()
+        raise MigrationError(f"{migration['filename']} failed: {e}")
+    finally:
+        conn.autocommit = True
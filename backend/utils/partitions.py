@@ -0,0 +1,144 @@
+import gzip
+import os
+import re
+from datetime import date
+import psycopg2
+from config import Config
+
+# Monthly partitions of orders and order_items (migration 005).
+#
+# Each month is a pair of tables, orders_pYYYY_MM and order_items_pYYYY_MM.
+# ensure_partitions() creates the coming months ahead of time so inserts
+# never land in the default partitions; archive_partitions() detaches the
+# months older than the retention period, exports them as gzipped CSV and
+# drops them, which keeps the live tables, their indexes and vacuum work
+# bounded. Both are run periodically by manage_partitions.py.
+
+PARTITION_NAME = re.compile(r'^orders_p(\d{4})_(\d{2})$')
+
+def _connect(database_url):
+    conn = psycopg2.connect(database_url or Config.DATABASE_URL)
+    conn.autocommit = True
+    return conn
+
+def _month_start(months_ago):
+    today = date.today()
+    month = today.year * 12 + today.month - 1 - months_ago
+    return date(month // 12, month % 12 + 1, 1)
+
+def ensure_partitions(months_ahead=None, database_url=None):
+    """Create the partitions from this month to `months_ahead` months ahead. Returns the months added"""
+    months_ahead = Config.ORDER_PARTITIONS_AHEAD if months_ahead is None else months_ahead
+    conn = _connect(database_url)
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT create_order_partitions(%s, %s)",
+                           (_month_start(0), _month_start(-months_ahead)))
+            return cursor.fetchone()[0]
+    finally:
+        conn.close()
+
+def list_partitions(database_url=None):
+    """
+    Return [{'month', 'orders', 'order_items', 'attached', 'rows'}] for every
+    monthly orders table, including ones detached by an interrupted archive run.
+    rows is the planner estimate.
+    """
+    conn = _connect(database_url)
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("""
+                SELECT c.relname, c.relispartition, c.reltuples::bigint
+                FROM pg_class c
+                WHERE c.relkind = 'r' AND c.relnamespace = 'public'::regnamespace
+                  AND c.relname ~ '^orders_p[0-9]{4}_[0-9]{2}$'
+                ORDER BY c.relname
+            """)
+            rows = cursor.fetchall()
+    finally:
+        conn.close()
+
+    partitions = []
+    for name, attached, estimate in rows:
+        match = PARTITION_NAME.match(name)
+        partitions.append({
+            'month': date(int(match.group(1)), int(match.group(2)), 1),
+            'orders': name,
+            'order_items': 'order_items_' + name[len('orders_'):],
+            'attached': attached,
+            'rows': max(estimate, 0)
+        })
+    return partitions
+
+def _export(cursor, table, path):
+    """COPY a table to a gzipped CSV file. Returns the rows written"""
+    temporary = path + '.tmp'
+    with gzip.open(temporary, 'wb') as f:
+        cursor.copy_expert(f'COPY (SELECT * FROM "{table}" ORDER BY id) TO STDOUT WITH CSV HEADER', f)
+    written = cursor.rowcount
+    cursor.execute(f'SELECT COUNT(*) FROM "{table}"')
+    if cursor.fetchone()[0] != written:
+        os.remove(temporary)
+        raise RuntimeError(f"Export of {table} is incomplete")
+    os.replace(temporary, path)
+    return written
+
+def _detach(conn, partition):
+    """Detach a month from both parents in one transaction"""
+    conn.autocommit = False
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute(f'ALTER TABLE order_items DETACH PARTITION "{partition["order_items"]}"')
+            # The detached items keep a standalone copy of the foreign key to
+            # orders, which would block detaching the orders of the month
+            cursor.execute("""
+                SELECT conname FROM pg_constraint
+                WHERE conrelid = %s::regclass AND confrelid = 'orders'::regclass
+            """, (partition['order_items'],))
+            for (constraint,) in cursor.fetchall():
+                cursor.execute(f'ALTER TABLE "{partition["order_items"]}" DROP CONSTRAINT "{constraint}"')
+            cursor.execute(f'ALTER TABLE orders DETACH PARTITION "{partition["orders"]}"')
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.autocommit = True
+
+def archive_partitions(keep_months=None, directory=None, dry_run=False, database_url=None, log=print):
+    """
+    Detach the months older than `keep_months`, export each table to
+    <directory>/<table>.csv.gz and drop it. A table is only dropped once its
+    export is complete, so an interrupted run is finished by the next one.
+    Returns the archived months.
+    """
+    keep_months = Config.ORDER_RETENTION_MONTHS if keep_months is None else keep_months
+    directory = directory or Config.ORDER_ARCHIVE_DIR
+    cutoff = _month_start(keep_months)
+
+    candidates = [p for p in list_partitions(database_url) if p['month'] < cutoff]
+    if dry_run:
+        for partition in candidates:
+            log(f"Would archive {partition['month']:%Y-%m} (~{partition['rows']} orders)")
+        return [p['month'] for p in candidates]
+
+    os.makedirs(directory, exist_ok=True)
+    archived = []
+    conn = _connect(database_url)
+    try:
+        for partition in candidates:
+            if partition['attached']:
+                _detach(conn, partition)
+
+            with conn.cursor() as cursor:
+                for table in (partition['order_items'], partition['orders']):
+                    cursor.execute("SELECT to_regclass(%s)", (table,))
+                    if cursor.fetchone()[0] is None:
+                        continue  # already exported and dropped
+                    rows = _export(cursor, table, os.path.join(directory, f"{table}.csv.gz"))
+                    cursor.execute(f'DROP TABLE "{table}"')
+                    log(f"Archived {table}: {rows} rows")
+            archived.append(partition['month'])
+    finally:
+        conn.close()
+    return archived
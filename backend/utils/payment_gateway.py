@@ -0,0 +1,155 @@
+from abc import ABC, abstractmethod
+import random
+import threading
+import time
+import uuid
+
+class PaymentGateway(ABC):
+    """
+    Interface implemented by every payment provider.
+
+    Methods follow the PayPal REST v1 payment shapes and return None when the
+    provider call fails, so callers can swap gateways without changes.
+    """
+
+    @abstractmethod
+    def create_payment(self, amount, currency='USD', return_url=None, cancel_url=None):
+        """Create a payment and return it with an 'approval_url'"""
+
+    @abstractmethod
+    def execute_payment(self, payment_id, payer_id):
+        """Execute a payment the buyer has approved"""
+
+    @abstractmethod
+    def get_payment_details(self, payment_id):
+        """Get the current state of a payment"""
+
+    @abstractmethod
+    def verify_webhook_signature(self, headers, event, webhook_id):
+        """
+        Return True if a webhook notification really comes from the provider,
+        False if it doesn't, and None if that could not be checked
+        """
+
+class FakePaymentGateway(PaymentGateway):
+    """
+    In-process payment gateway for local development and load testing.
+
+    Payments live in memory. Every call sleeps for the configured latency and
+    fails with probability error_rate. approval decides what the simulated
+    buyer does: 'approve' (pays), 'decline' (payment fails on execution) or
+    'cancel' (approval link goes to the cancel URL and the payment expires).
+    """
+
+    APPROVALS = ('approve', 'decline', 'cancel')
+
+    def __init__(self, latency_ms=0, latency_jitter_ms=0, error_rate=0.0, approval='approve', seed=None):
+        if approval not in self.APPROVALS:
+            raise ValueError(f"approval must be one of {', '.join(self.APPROVALS)}")
+        self.latency_ms = latency_ms
+        self.latency_jitter_ms = latency_jitter_ms
+        self.error_rate = error_rate
+        self.approval = approval
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._payments = {}
+
+    def create_payment(self, amount, currency='USD', return_url=None, cancel_url=None):
+        if not self._simulate_call():
+            return None
+
+        payment_id = f"PAY-FAKE-{uuid.uuid4().hex[:20].upper()}"
+        payer_id = f"FAKEPAYER{uuid.uuid4().hex[:8].upper()}"
+        return_url = return_url or "http://localhost:3000/payment/success"
+        cancel_url = cancel_url or "http://localhost:3000/payment/cancel"
+
+        if self.approval == 'cancel':
+            approval_url = f"{cancel_url}?token=EC-{payment_id}"
+        else:
+            approval_url = f"{return_url}?paymentId={payment_id}&token=EC-{payment_id}&PayerID={payer_id}"
+
+        payment = {
+            'id': payment_id,
+            'intent': 'sale',
+            'state': 'created',
+            'create_time': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+            'payer': {'payment_method': 'paypal'},
+            'transactions': [{
+                'amount': {'currency': currency, 'total': str(amount)},
+                'related_resources': []
+            }],
+            'links': [{'href': approval_url, 'rel': 'approval_url', 'method': 'REDIRECT'}],
+            'approval_url': approval_url
+        }
+
+        with self._lock:
+            self._payments[payment_id] = payment
+            return self._copy(payment)
+
+    def approve(self, payment_id, payer_id):
+        """Simulate the buyer approving a payment without executing it"""
+        with self._lock:
+            payment = self._payments.get(payment_id)
+            if not payment or payment['state'] != 'created':
+                return False
+            payment['payer']['payer_info'] = {'payer_id': payer_id}
+            return True
+
+    def execute_payment(self, payment_id, payer_id):
+        if not self._simulate_call():
+            return None
+
+        with self._lock:
+            payment = self._payments.get(payment_id)
+            if not payment or payment['state'] != 'created' or self.approval == 'cancel':
+                return None
+
+            payment['payer']['payer_info'] = {'payer_id': payer_id}
+            if self.approval == 'decline':
+                payment['state'] = 'failed'
+            else:
+                payment['state'] = 'approved'
+                payment['transactions'][0]['related_resources'] = [{
+                    'sale': {
+                        'id': f"SALE-FAKE-{uuid.uuid4().hex[:16].upper()}",
+                        'state': 'completed',
+                        'parent_payment': payment_id
+                    }
+                }]
+            return self._copy(payment)
+
+    def get_payment_details(self, payment_id):
+        if not self._simulate_call():
+            return None
+
+        with self._lock:
+            payment = self._payments.get(payment_id)
+            return self._copy(payment) if payment else None
+
+    def verify_webhook_signature(self, headers, event, webhook_id):
+        # Accepts anything: utils/payments.py refuses the fake gateway when a
+        # PayPal webhook is configured
+        return True
+
+    def reset(self):
+        """Forget all payments"""
+        with self._lock:
+            self._payments.clear()
+
+    def _simulate_call(self):
+        """Sleep for the simulated latency, return False if the call should fail"""
+        with self._lock:
+            jitter = self._random.uniform(-self.latency_jitter_ms, self.latency_jitter_ms) if self.latency_jitter_ms else 0
+            failed = self.error_rate > 0 and self._random.random() < self.error_rate
+
+        delay = max(self.latency_ms + jitter, 0) / 1000.0
+        if delay:
+            time.sleep(delay)
+        return not failed
+
+    @staticmethod
+    def _copy(payment):
+        copy = dict(payment)
+        copy['payer'] = dict(payment['payer'])
+        copy['transactions'] = [dict(t) for t in payment['transactions']]
+        return copy
@@ -0,0 +1,324 @@
+from concurrent.futures import ThreadPoolExecutor
+from config import Config
+from utils.db import get_db
+from utils import inventory, seat_map
+from utils.job_queue import JobQueue
+from utils.payment_gateway import FakePaymentGateway
+from utils.circuit_breaker import CircuitBreaker, Bulkhead, ProtectedGateway, CallRejectedError
+from utils.paypal_integration import paypal
+
+db = get_db()
+
+# Payment provider used by the purchase path
+if Config.PAYMENT_GATEWAY == 'fake':
+    # The fake gateway accepts every webhook, so it must never sit behind a
+    # registered PayPal webhook
+    if Config.PAYPAL_WEBHOOK_ID:
+        raise ValueError("PAYMENT_GATEWAY 'fake' can't be used while PAYPAL_WEBHOOK_ID is set")
+    provider = FakePaymentGateway(
+        latency_ms=Config.FAKE_GATEWAY_LATENCY_MS,
+        latency_jitter_ms=Config.FAKE_GATEWAY_LATENCY_JITTER_MS,
+        error_rate=Config.FAKE_GATEWAY_ERROR_RATE,
+        approval=Config.FAKE_GATEWAY_APPROVAL
+    )
+elif Config.PAYMENT_GATEWAY == 'paypal':
+    provider = paypal
+else:
+    raise ValueError(f"Unknown PAYMENT_GATEWAY '{Config.PAYMENT_GATEWAY}'")
+
+# Calls to the provider go through a circuit breaker and a bulkhead so a slow
+# or failing provider only degrades checkout
+gateway = ProtectedGateway(
+    provider,
+    CircuitBreaker(
+        failure_rate=Config.PAYMENT_BREAKER_FAILURE_RATE,
+        slow_call_ms=Config.PAYMENT_BREAKER_SLOW_CALL_MS,
+        slow_call_rate=Config.PAYMENT_BREAKER_SLOW_CALL_RATE,
+        window_size=Config.PAYMENT_BREAKER_WINDOW,
+        min_calls=Config.PAYMENT_BREAKER_MIN_CALLS,
+        open_seconds=Config.PAYMENT_BREAKER_OPEN_SECONDS,
+        half_open_calls=Config.PAYMENT_BREAKER_HALF_OPEN_CALLS
+    ),
+    Bulkhead(
+        max_concurrent=Config.PAYMENT_BULKHEAD_MAX_CONCURRENT,
+        max_wait=Config.PAYMENT_BULKHEAD_MAX_WAIT
+    )
+)
+
+class PaymentError(Exception):
+    """Raised when a payment step fails"""
+
+    def __init__(self, message, retryable=True):
+        super().__init__(message)
+        self.retryable = retryable
+
+def order_key(order_id):
+    """Job queue key used to track the payment of an order"""
+    return f"order:{order_id}"
+
+def start_payment(order_id, amount):
+    """Create the payment for a pending order and attach it to the order"""
+    payment = gateway.create_payment(
+        amount=amount,
+        return_url=Config.PAYPAL_RETURN_URL,
+        cancel_url=Config.PAYPAL_CANCEL_URL
+    )
+
+    if not payment:
+        raise PaymentError('Failed to create payment')
+
+    db.execute_query("""
+        UPDATE orders SET paypal_payment_id = %s
+        WHERE id = %s AND status = 'pending'
+    """, (payment['id'], order_id))
+
+    return {
+        'order_id': order_id,
+        'payment_id': payment['id'],
+        'approval_url': payment.get('approval_url')
+    }
+
+def cancel_order(order_id):
+    """Cancel a pending order whose payment could not be created"""
+    if db.execute_query("""
+        UPDATE orders SET status = 'cancelled'
+        WHERE id = %s AND status = 'pending'
+        RETURNING id
+    """, (order_id,)):
+        seat_map.release_order_holds(order_id)
+
+def complete_payment(payment_id, payer_id):
+    """
+    Mark the order for an approved payment as completed, update ticket
+    quantities and clear the buyer's cart.
+    Safe to call more than once: only the first call for a payment applies it.
+    Returns the order id, or None if there was no pending order to complete.
+    All of it is one transaction, so an order is never completed without its
+    tickets being recorded.
+    """
+    with db.transaction() as cursor:
+        cursor.execute("""
+            UPDATE orders
+            SET status = 'completed', paypal_payer_id = COALESCE(%s, paypal_payer_id)
+            WHERE paypal_payment_id = %s AND status = 'pending'
+            RETURNING id, user_id, order_date
+        """, (payer_id, payment_id))
+        order = cursor.fetchone()
+        if not order:
+            return None
+
+        # In ticket order, so concurrent payments lock the tiers in the same order
+        cursor.execute("""
+            SELECT ticket_id, quantity
+            FROM order_items
+            WHERE order_id = %s AND order_date = %s
+            ORDER BY ticket_id
+        """, (order['id'], order['order_date']))
+        order_items = cursor.fetchall()
+
+        claimed = []
+        oversold = []
+        for item in order_items:
+            if inventory.claim(item['ticket_id'], item['quantity'], cursor):
+                claimed.append(item)
+            else:
+                oversold.append(item['ticket_id'])
+        if oversold:
+            # Paid for, but the tier sold out meanwhile: nothing is recorded for
+            # those items and an admin refunds or resolves the order
+            print(f"Order {order['id']} oversold tickets {oversold}, flagged for review")
+            cursor.execute("""
+                UPDATE order_items SET oversold = TRUE
+                WHERE order_id = %s AND order_date = %s AND ticket_id = ANY(%s)
+            """, (order['id'], order['order_date'], oversold))
+            cursor.execute("""
+                UPDATE orders SET needs_review = TRUE
+                WHERE id = %s AND order_date = %s
+            """, (order['id'], order['order_date']))
+
+        seat_map.confirm_order_holds(order['id'], cursor)
+
+        # Clear user's cart
+        cursor.execute("DELETE FROM cart_items WHERE user_id = %s", (order['user_id'],))
+
+    for item in claimed:
+        inventory.notify(item['ticket_id'], item['quantity'])
+
+    return order['id']
+
+def execute_payment(payment_id, payer_id):
+    """Execute an approved payment and complete its order"""
+    result = gateway.execute_payment(payment_id, payer_id)
+
+    if not result or result.get('state') != 'approved':
+        raise PaymentError('Payment execution failed', retryable=False)
+
+    complete_payment(payment_id, payer_id)
+    return {'payment_id': payment_id, 'state': result.get('state')}
+
+def cancel_payment(payment_id):
+    """Cancel the pending order for a payment that was denied or expired"""
+    orders = db.execute_query("""
+        UPDATE orders SET status = 'cancelled'
+        WHERE paypal_payment_id = %s AND status = 'pending'
+        RETURNING id
+    """, (payment_id,))
+
+    if not orders:
+        return None
+
+    seat_map.release_order_holds(orders[0]['id'])
+    return orders[0]['id']
+
+def refund_payment(payment_id):
+    """Mark a completed order as refunded and release its tickets"""
+    orders = db.execute_query("""
+        UPDATE orders SET status = 'refunded'
+        WHERE paypal_payment_id = %s AND status = 'completed'
+        RETURNING id, order_date
+    """, (payment_id,))
+
+    if not orders:
+        return None
+    order = orders[0]
+
+    order_items = db.execute_query("""
+        SELECT ticket_id, quantity
+        FROM order_items
+        WHERE order_id = %s AND order_date = %s AND NOT oversold
+    """, (order['id'], order['order_date']), fetch=True)
+
+    for item in order_items:
+        inventory.release(item['ticket_id'], item['quantity'])
+    seat_map.release_order_holds(order['id'])
+
+    return order['id']
+
+def apply_webhook_event(event):
+    """
+    Apply a verified PayPal webhook event to our orders.
+    Returns the id of the affected order, or None if nothing changed.
+    """
+    event_type = event.get('event_type')
+    resource = event.get('resource') or {}
+    payment_id = resource.get('parent_payment')
+
+    if not payment_id:
+        return None
+
+    if event_type == 'PAYMENT.SALE.COMPLETED':
+        return complete_payment(payment_id, None)
+    elif event_type == 'PAYMENT.SALE.DENIED':
+        return cancel_payment(payment_id)
+    elif event_type in ('PAYMENT.SALE.REFUNDED', 'PAYMENT.SALE.REVERSED'):
+        return refund_payment(payment_id)
+
+    return None
+
+def _check_payment(order):
+    """
+    Look up a pending order's payment at the gateway and decide what to do with it.
+    Runs in a reconciliation worker thread, so it only talks to the gateway.
+    """
+    payment_id = order['paypal_payment_id']
+    try:
+        details = gateway.get_payment_details(payment_id)
+    except CallRejectedError:
+        return None
+    if not details:
+        return None
+
+    state = details.get('state')
+    payer_id = ((details.get('payer') or {}).get('payer_info') or {}).get('payer_id')
+
+    if state == 'approved':
+        return ('complete', payment_id, payer_id)
+
+    if state == 'created' and payer_id:
+        # The buyer approved the payment but never came back to execute it
+        try:
+            result = gateway.execute_payment(payment_id, payer_id)
+        except CallRejectedError:
+            return None
+        if result and result.get('state') == 'approved':
+            return ('complete', payment_id, payer_id)
+        return None
+
+    if state in ('failed', 'canceled', 'expired') or order['expired']:
+        return ('cancel', payment_id, None)
+
+    return None
+
+def reconcile_pending_orders(stale_minutes=None, batch_size=None, concurrency=None):
+    """
+    Confirm or cancel pending orders the client never finished.
+    Orders are loaded in batches and their payments are checked
+    concurrently; the resulting updates are applied one by one.
+    Returns a summary with the number of orders checked, completed and cancelled.
+    """
+    stale_minutes = stale_minutes or Config.RECONCILE_STALE_MINUTES
+    batch_size = batch_size or Config.RECONCILE_BATCH_SIZE
+    concurrency = concurrency or Config.RECONCILE_CONCURRENCY
+
+    summary = {'checked': 0, 'completed': 0, 'cancelled': 0}
+    last_id = 0
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        while True:
+            orders = db.execute_query("""
+                SELECT id, paypal_payment_id,
+                       order_date < NOW() - make_interval(hours => %s) as expired
+                FROM orders
+                WHERE status = 'pending'
+                  AND paypal_payment_id IS NOT NULL
+                  AND order_date < NOW() - make_interval(mins => %s)
+                  AND id > %s
+                ORDER BY id
+                LIMIT %s
+            """, (Config.RECONCILE_EXPIRE_HOURS, stale_minutes, last_id, batch_size), fetch=True)
+
+            if not orders:
+                break
+
+            last_id = orders[-1]['id']
+            summary['checked'] += len(orders)
+
+            for action in executor.map(_check_payment, orders):
+                if not action:
+                    continue
+                kind, payment_id, payer_id = action
+                if kind == 'complete' and complete_payment(payment_id, payer_id):
+                    summary['completed'] += 1
+                elif kind == 'cancel' and cancel_payment(payment_id):
+                    summary['cancelled'] += 1
+
+    return summary
+
+def _create_payment_job(payload):
+    try:
+        return start_payment(payload['order_id'], payload['amount'])
+    except (PaymentError, CallRejectedError) as e:
+        # Rejected calls (breaker open, bulkhead full) are retried once the
+        # queue's retry_after delay has passed, like retryable failures
+        job = payment_queue.latest(order_key(payload['order_id']), 'create_payment')
+        if not getattr(e, 'retryable', True) or (job and job['attempts'] >= payment_queue.max_attempts):
+            cancel_order(payload['order_id'])
+        raise
+
+def _execute_payment_job(payload):
+    return execute_payment(payload['payment_id'], payload['payer_id'])
+
+def _webhook_event_job(payload):
+    return {'order_id': apply_webhook_event(payload)}
+
+# Global payment queue, only created when the background pipeline is enabled
+payment_queue = None
+if Config.PAYMENT_QUEUE_ENABLED:
+    payment_queue = JobQueue(
+        Config.PAYMENT_QUEUE_PATH,
+        workers=Config.PAYMENT_QUEUE_WORKERS,
+        max_attempts=Config.PAYMENT_QUEUE_MAX_ATTEMPTS
+    )
+    payment_queue.register('create_payment', _create_payment_job)
+    payment_queue.register('execute_payment', _execute_payment_job)
+    payment_queue.register('webhook_event', _webhook_event_job)
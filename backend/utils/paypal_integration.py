@@ -1,12 +1,52 @@
 import requests
 import json
+import time
 from config import Config
+from utils.payment_gateway import PaymentGateway
 
-class PayPalIntegration:
+def payment_request(amount, currency='USD', return_url=None, cancel_url=None):
+    """Body of a PayPal v1 sale payment for the tickets"""
+    return {
+        "intent": "sale",
+        "payer": {
+            "payment_method": "paypal"
+        },
+        "redirect_urls": {
+            "return_url": return_url or "http://localhost:3000/payment/success",
+            "cancel_url": cancel_url or "http://localhost:3000/payment/cancel"
+        },
+        "transactions": [{
+            "item_list": {
+                "items": [{
+                    "name": "Event Tickets",
+                    "sku": "tickets",
+                    "price": str(amount),
+                    "currency": currency,
+                    "quantity": 1
+                }]
+            },
+            "amount": {
+                "currency": currency,
+                "total": str(amount)
+            },
+            "description": "Event ticket purchase"
+        }]
+    }
+
+def with_approval_url(payment):
+    """Copy the approval link of a created payment to payment['approval_url']"""
+    for link in payment['links']:
+        if link['rel'] == 'approval_url':
+            payment['approval_url'] = link['href']
+            break
+    return payment
+
+class PayPalIntegration(PaymentGateway):
     def __init__(self):
         self.client_id = Config.PAYPAL_CLIENT_ID
         self.secret = Config.PAYPAL_SECRET
         self.mode = Config.PAYPAL_MODE
+        self.timeout = Config.PAYPAL_TIMEOUT
         
         if self.mode == 'sandbox':
             self.base_url = 'https://api.sandbox.paypal.com'
@@ -29,7 +69,8 @@ class PayPalIntegration:
                 url,
                 headers=headers,
                 data=data,
-                auth=(self.client_id, self.secret)
+                auth=(self.client_id, self.secret),
+                timeout=self.timeout
             )
             
             if response.status_code == 200:
@@ -56,43 +97,12 @@ class PayPalIntegration:
                 'Authorization': f'Bearer {access_token}',
             }
             
-            payment_data = {
-                "intent": "sale",
-                "payer": {
-                    "payment_method": "paypal"
-                },
-                "redirect_urls": {
-                    "return_url": return_url or "http://localhost:3000/payment/success",
-                    "cancel_url": cancel_url or "http://localhost:3000/payment/cancel"
-                },
-                "transactions": [{
-                    "item_list": {
-                        "items": [{
-                            "name": "Event Tickets",
-                            "sku": "tickets",
-                            "price": str(amount),
-                            "currency": currency,
-                            "quantity": 1
-                        }]
-                    },
-                    "amount": {
-                        "currency": currency,
-                        "total": str(amount)
-                    },
-                    "description": "Event ticket purchase"
-                }]
-            }
+            payment_data = payment_request(amount, currency, return_url, cancel_url)
             
-            response = requests.post(url, headers=headers, data=json.dumps(payment_data))
+            response = requests.post(url, headers=headers, data=json.dumps(payment_data), timeout=self.timeout)
             
             if response.status_code == 201:
-                payment = response.json()
-                # Find the approval URL
-                for link in payment['links']:
-                    if link['rel'] == 'approval_url':
-                        payment['approval_url'] = link['href']
-                        break
-                return payment
+                return with_approval_url(response.json())
             else:
                 print(f"Error creating PayPal payment: {response.text}")
                 return None
@@ -119,7 +129,7 @@ class PayPalIntegration:
                 "payer_id": payer_id
             }
             
-            response = requests.post(url, headers=headers, data=json.dumps(execute_data))
+            response = requests.post(url, headers=headers, data=json.dumps(execute_data), timeout=self.timeout)
             
             if response.status_code == 200:
                 return response.json()
@@ -145,7 +155,7 @@ class PayPalIntegration:
                 'Authorization': f'Bearer {access_token}',
             }
             
-            response = requests.get(url, headers=headers)
+            response = requests.get(url, headers=headers, timeout=self.timeout)
             
             if response.status_code == 200:
                 return response.json()
@@ -157,5 +167,139 @@ class PayPalIntegration:
             print(f"PayPal payment details error: {e}")
             return None
 
+    def verify_webhook_signature(self, headers, event, webhook_id):
+        """
+        Verify a webhook notification with PayPal. Returns False only when
+        PayPal says the signature is invalid, and None when it could not be
+        verified (PayPal or the network failed), so the sender retries
+        """
+        try:
+            access_token = self.get_access_token()
+            if not access_token:
+                return None
+            
+            url = f"{self.base_url}/v1/notifications/verify-webhook-signature"
+            
+            request_headers = {
+                'Content-Type': 'application/json',
+                'Authorization': f'Bearer {access_token}',
+            }
+            
+            verify_data = {
+                "transmission_id": headers.get('Paypal-Transmission-Id'),
+                "transmission_time": headers.get('Paypal-Transmission-Time'),
+                "cert_url": headers.get('Paypal-Cert-Url'),
+                "auth_algo": headers.get('Paypal-Auth-Algo'),
+                "transmission_sig": headers.get('Paypal-Transmission-Sig'),
+                "webhook_id": webhook_id,
+                "webhook_event": event
+            }
+            
+            response = requests.post(url, headers=request_headers, data=json.dumps(verify_data), timeout=self.timeout)
+            
+            if response.status_code == 200:
+                status = response.json().get('verification_status')
+                if status in ('SUCCESS', 'FAILURE'):
+                    return status == 'SUCCESS'
+            print(f"Error verifying PayPal webhook: {response.text}")
+            return None
+                
+        except Exception as e:
+            print(f"PayPal webhook verification error: {e}")
+            return None
+
+class AsyncPayPalIntegration:
+    """
+    PayPal client for asyncio handlers (see asgi.py), with the same methods
+    and failure contract as PayPalIntegration as coroutines. One HTTP
+    connection pool is shared by every call and the access token is reused
+    until shortly before it expires.
+    """
+
+    def __init__(self):
+        self.client_id = Config.PAYPAL_CLIENT_ID
+        self.secret = Config.PAYPAL_SECRET
+        self.base_url = 'https://api.sandbox.paypal.com' if Config.PAYPAL_MODE == 'sandbox' else 'https://api.paypal.com'
+        self.timeout = Config.PAYPAL_TIMEOUT
+        self._client = None
+        self._token = None
+        self._token_expires = 0
+
+    def _http(self):
+        if self._client is None:
+            import httpx
+            self._client = httpx.AsyncClient(base_url=self.base_url, timeout=self.timeout)
+        return self._client
+
+    async def close(self):
+        if self._client:
+            await self._client.aclose()
+            self._client = None
+
+    async def get_access_token(self):
+        """Get PayPal access token"""
+        if self._token and time.time() < self._token_expires:
+            return self._token
+        try:
+            response = await self._http().post(
+                '/v1/oauth2/token',
+                headers={'Accept': 'application/json', 'Accept-Language': 'en_US'},
+                data={'grant_type': 'client_credentials'},
+                auth=(self.client_id, self.secret)
+            )
+            if response.status_code == 200:
+                token = response.json()
+                self._token = token['access_token']
+                self._token_expires = time.time() + token.get('expires_in', 0) - 60
+                return self._token
+            print(f"Error getting PayPal access token: {response.text}")
+            return None
+        except Exception as e:
+            print(f"PayPal access token error: {e}")
+            return None
+
+    async def _request(self, method, path, expected_status, body=None):
+        access_token = await self.get_access_token()
+        if not access_token:
+            return None
+        response = await self._http().request(method, path, json=body, headers={
+            'Content-Type': 'application/json',
+            'Authorization': f'Bearer {access_token}',
+        })
+        if response.status_code == 401:
+            # Token revoked early: get a new one next time
+            self._token = None
+        if response.status_code != expected_status:
+            print(f"PayPal {method} {path} error: {response.text}")
+            return None
+        return response.json()
+
+    async def create_payment(self, amount, currency='USD', return_url=None, cancel_url=None):
+        """Create a PayPal payment"""
+        try:
+            payment = await self._request('POST', '/v1/payments/payment', 201,
+                                          payment_request(amount, currency, return_url, cancel_url))
+            return with_approval_url(payment) if payment else None
+        except Exception as e:
+            print(f"PayPal payment creation error: {e}")
+            return None
+
+    async def execute_payment(self, payment_id, payer_id):
+        """Execute a PayPal payment"""
+        try:
+            return await self._request('POST', f'/v1/payments/payment/{payment_id}/execute', 200,
+                                       {'payer_id': payer_id})
+        except Exception as e:
+            print(f"PayPal payment execution error: {e}")
+            return None
+
+    async def get_payment_details(self, payment_id):
+        """Get PayPal payment details"""
+        try:
+            return await self._request('GET', f'/v1/payments/payment/{payment_id}', 200)
+        except Exception as e:
+            print(f"PayPal payment details error: {e}")
+            return None
+
 # Global PayPal instance
 paypal = PayPalIntegration()
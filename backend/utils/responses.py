@@ -0,0 +1,36 @@
+from itertools import chain
+from flask import Response, current_app, stream_with_context
+
+def stream_json(data, key, rows, chunk_rows=500):
+    """
+    JSON response for data with data[key] set to the rows, written as rows
+    (e.g. db.stream()) yields them instead of built in memory first. Same
+    body as jsonify() writes outside debug mode.
+
+    The first row is read before responding, so a failing query still
+    raises in the route; an error after that can only cut the body short.
+    """
+    rows = iter(rows)
+    first = next(rows, None)
+    if first is not None:
+        rows = chain([first], rows)
+
+    def dumps(value):
+        return current_app.json.dumps(value, separators=(',', ':'))
+
+    def generate():
+        for i, name in enumerate(sorted({**data, key: None})):
+            yield ('{' if i == 0 else ',') + dumps(name) + ':'
+            if name != key:
+                yield dumps(data[name])
+                continue
+            chunk = ['[']
+            for n, row in enumerate(rows):
+                chunk.append((',' if n else '') + dumps(row))
+                if len(chunk) >= chunk_rows:
+                    yield ''.join(chunk)
+                    chunk = []
+            yield ''.join(chunk) + ']'
+        yield '}\n'
+
+    return Response(stream_with_context(generate()), mimetype='application/json')
@@ -0,0 +1,413 @@
+import base64
+import json
+import threading
+from psycopg2.extras import Json
+from utils.db import get_db, register_query
+from utils import change_feed
+
+db = get_db()
+
+class SeatBitmap:
+    """Set of seats of one section, stored as the bits of an integer (bit n = seat n)"""
+
+    __slots__ = ('size', 'bits')
+
+    def __init__(self, size, bits=0):
+        self.size = size
+        self.bits = bits
+
+    @classmethod
+    def from_bytes(cls, size, data):
+        return cls(size, int.from_bytes(bytes(data), 'little'))
+
+    def to_bytes(self):
+        return self.bits.to_bytes((self.size + 7) // 8, 'little')
+
+    def to_base64(self):
+        return base64.b64encode(self.to_bytes()).decode('ascii')
+
+    @staticmethod
+    def mask(seats):
+        """Build a bit mask from seat numbers"""
+        mask = 0
+        for seat in seats:
+            mask |= 1 << seat
+        return mask
+
+    def intersects(self, mask):
+        return bool(self.bits & mask)
+
+    def add(self, mask):
+        self.bits |= mask
+
+    def remove(self, mask):
+        self.bits &= ~mask
+
+    def count(self):
+        return bin(self.bits).count('1')
+
+    def __contains__(self, seat):
+        return bool(self.bits >> seat & 1)
+
+# Venue layouts rarely change, so each worker keeps them in memory until a
+# seat map is saved (on any worker, see change_feed)
+_layouts = {}
+_layouts_lock = threading.Lock()
+
+def _on_sections_changed(change):
+    """Forget the layouts of venues whose seat map was saved on any worker"""
+    with _layouts_lock:
+        if change['ids'] is None:
+            _layouts.clear()
+        else:
+            for venue_id in change.get('venue_ids', []):
+                _layouts.pop(venue_id, None)
+
+change_feed.subscribe('venue_sections', _on_sections_changed)
+
+# Functions called as listener(event_id, seats_by_section, taken) after seats
+# are held (taken=True) or released (taken=False) by this worker
+_listeners = []
+
+def add_listener(listener):
+    """Get notified when seats of an event are held or released"""
+    _listeners.append(listener)
+
+def _notify(event_id, seats_by_section, taken):
+    for listener in _listeners:
+        try:
+            listener(event_id, {int(k): v for k, v in seats_by_section.items()}, taken)
+        except Exception as e:
+            print(f"Seat listener error: {e}")
+
+def save_venue_layout(venue_id, sections):
+    """
+    Replace a venue's seat map.
+    sections: [{'name': 'Platea', 'preference': 0, 'rows': [{'label': 'A', 'seats': 30}, ...]}, ...]
+    Raises ValueError if an event already uses the current layout.
+    """
+    with db.transaction() as cursor:
+        cursor.execute("""
+            SELECT 1 FROM event_section_seats ess
+            JOIN venue_sections vs ON ess.section_id = vs.id
+            WHERE vs.venue_id = %s LIMIT 1
+        """, (venue_id,))
+        if cursor.fetchone():
+            raise ValueError('The seat map is already in use by an event')
+
+        cursor.execute("DELETE FROM venue_sections WHERE venue_id = %s", (venue_id,))
+
+        for section in sections:
+            rows = section.get('rows') or []
+            cursor.execute("""
+                INSERT INTO venue_sections (venue_id, name, preference, seat_count)
+                VALUES (%s, %s, %s, %s) RETURNING id
+            """, (venue_id, section['name'], section.get('preference', 0),
+                  sum(int(row['seats']) for row in rows)))
+            section_id = cursor.fetchone()['id']
+
+            first_seat = 0
+            for row_index, row in enumerate(rows):
+                cursor.execute("""
+                    INSERT INTO venue_rows (section_id, row_index, label, seat_count, first_seat)
+                    VALUES (%s, %s, %s, %s, %s)
+                """, (section_id, row_index, row['label'], int(row['seats']), first_seat))
+                first_seat += int(row['seats'])
+
+    with _layouts_lock:
+        _layouts.pop(venue_id, None)
+
+def get_venue_layout(venue_id):
+    """Get a venue's sections and rows, ordered by preference"""
+    with _layouts_lock:
+        layout = _layouts.get(venue_id)
+    if layout is not None:
+        return layout
+
+    sections = db.execute_query("""
+        SELECT id, name, preference, seat_count
+        FROM venue_sections WHERE venue_id = %s
+        ORDER BY preference, id
+    """, (venue_id,), fetch=True)
+
+    rows = db.execute_query("""
+        SELECT vr.section_id, vr.row_index, vr.label, vr.seat_count, vr.first_seat
+        FROM venue_rows vr
+        JOIN venue_sections vs ON vr.section_id = vs.id
+        WHERE vs.venue_id = %s
+        ORDER BY vr.section_id, vr.row_index
+    """, (venue_id,), fetch=True)
+
+    layout = {section['id']: dict(section, rows=[]) for section in sections}
+    for row in rows:
+        layout[row['section_id']]['rows'].append(row)
+    layout = list(layout.values())
+
+    with _layouts_lock:
+        _layouts[venue_id] = layout
+    return layout
+
+def resolve_seats(layout, seats):
+    """
+    Translate [{'section_id': 1, 'row': 'A', 'seat': 12}, ...] into
+    {section_id: [seat bits]}. Raises ValueError for seats not in the layout.
+    """
+    sections = {section['id']: section for section in layout}
+    resolved = {}
+    for seat in seats:
+        section = sections.get(seat.get('section_id'))
+        if not section:
+            raise ValueError(f"Unknown section {seat.get('section_id')}")
+        row = next((r for r in section['rows'] if r['label'] == str(seat.get('row'))), None)
+        number = seat.get('seat')
+        if not row or not isinstance(number, int) or not 1 <= number <= row['seat_count']:
+            raise ValueError(f"Unknown seat {seat.get('row')}{number} in section {section['name']}")
+        resolved.setdefault(section['id'], set()).add(row['first_seat'] + number - 1)
+    return {section_id: sorted(bits) for section_id, bits in resolved.items()}
+
+def describe_seats(layout, seats_by_section):
+    """Inverse of resolve_seats"""
+    sections = {section['id']: section for section in layout}
+    seats = []
+    for section_id, bits in seats_by_section.items():
+        section = sections[int(section_id)]
+        for bit in bits:
+            row = next(r for r in section['rows'] if r['first_seat'] <= bit < r['first_seat'] + r['seat_count'])
+            seats.append({'section_id': section['id'], 'row': row['label'], 'seat': bit - row['first_seat'] + 1})
+    return seats
+
+def init_event_seats(event_id, section_tickets=None):
+    """
+    Create empty seat bitmaps for an event from its venue's seat map.
+    section_tickets optionally maps section ids to the ticket tier that prices them.
+    Returns False if the event has no venue seat map.
+    """
+    event = db.execute_query("SELECT venue_id FROM events WHERE id = %s", (event_id,), fetch='one')
+    if not event or not event['venue_id']:
+        return False
+
+    layout = get_venue_layout(event['venue_id'])
+    if not layout:
+        return False
+
+    section_tickets = section_tickets or {}
+    with db.transaction() as cursor:
+        for section in layout:
+            empty = SeatBitmap(section['seat_count']).to_bytes()
+            cursor.execute("""
+                INSERT INTO event_section_seats (event_id, section_id, ticket_id, sold, held)
+                VALUES (%s, %s, %s, %s, %s)
+                ON CONFLICT (event_id, section_id) DO UPDATE SET ticket_id = EXCLUDED.ticket_id
+            """, (event_id, section['id'], section_tickets.get(section['id']), empty, empty))
+    return True
+
+def get_event_seats(event_id):
+    """
+    Get the seat state of an event as {section_id: {'ticket_id', 'sold', 'held'}}
+    with SeatBitmap values. Returns None if the event has no seat map.
+    """
+    release_expired_holds(event_id)
+
+    event = db.execute_query("SELECT venue_id FROM events WHERE id = %s", (event_id,), fetch='one')
+    if not event or not event['venue_id']:
+        return None
+
+    sizes = {section['id']: section['seat_count'] for section in get_venue_layout(event['venue_id'])}
+    rows = db.execute_query("""
+        SELECT section_id, ticket_id, sold, held
+        FROM event_section_seats WHERE event_id = %s
+    """, (event_id,), fetch=True)
+
+    if not rows:
+        return None
+
+    return {
+        row['section_id']: {
+            'ticket_id': row['ticket_id'],
+            'sold': SeatBitmap.from_bytes(sizes[row['section_id']], row['sold']),
+            'held': SeatBitmap.from_bytes(sizes[row['section_id']], row['held'])
+        }
+        for row in rows if row['section_id'] in sizes
+    }
+
+def _lock_sections(cursor, event_id, section_ids):
+    """Lock the given section bitmaps of an event, always in section order"""
+    cursor.execute("""
+        SELECT ess.section_id, ess.sold, ess.held, vs.seat_count
+        FROM event_section_seats ess
+        JOIN venue_sections vs ON ess.section_id = vs.id
+        WHERE ess.event_id = %s AND ess.section_id = ANY(%s)
+        ORDER BY ess.section_id
+        FOR UPDATE OF ess
+    """, (event_id, sorted(int(s) for s in section_ids)))
+    return {
+        row['section_id']: {
+            'sold': SeatBitmap.from_bytes(row['seat_count'], row['sold']),
+            'held': SeatBitmap.from_bytes(row['seat_count'], row['held'])
+        }
+        for row in cursor.fetchall()
+    }
+
+def _save_sections(cursor, event_id, sections):
+    for section_id, state in sections.items():
+        cursor.execute("""
+            UPDATE event_section_seats SET sold = %s, held = %s
+            WHERE event_id = %s AND section_id = %s
+        """, (state['sold'].to_bytes(), state['held'].to_bytes(), event_id, section_id))
+
+def hold_seats(event_id, user_id, seats_by_section, ttl_seconds):
+    """
+    Atomically hold a set of seats for a user.
+    Returns the hold id, or None if any of the seats is already sold or held.
+    """
+    release_expired_holds(event_id)
+
+    with db.transaction() as cursor:
+        sections = _lock_sections(cursor, event_id, seats_by_section.keys())
+        if len(sections) != len(seats_by_section):
+            return None
+
+        masks = {}
+        for section_id, bits in seats_by_section.items():
+            state = sections[int(section_id)]
+            mask = SeatBitmap.mask(bits)
+            if state['sold'].intersects(mask) or state['held'].intersects(mask):
+                return None
+            masks[int(section_id)] = mask
+
+        for section_id, mask in masks.items():
+            sections[section_id]['held'].add(mask)
+        _save_sections(cursor, event_id, sections)
+
+        cursor.execute("""
+            INSERT INTO seat_holds (event_id, user_id, seats, expires_at)
+            VALUES (%s, %s, %s, NOW() + make_interval(secs => %s))
+            RETURNING id
+        """, (event_id, user_id, Json({str(k): v for k, v in seats_by_section.items()}), ttl_seconds))
+        hold_id = cursor.fetchone()['id']
+
+    _notify(event_id, seats_by_section, True)
+    return hold_id
+
+def _finish_hold(hold_id, status, from_statuses, user_id=None):
+    """
+    Release (status 'released') or sell (status 'confirmed') the seats of a
+    hold that is in one of from_statuses. A released hold also leaves the
+    cart it was in, so the cart can be checked out again
+    """
+    with db.transaction() as cursor:
+        hold = _finish_hold_in(cursor, hold_id, status, from_statuses, user_id)
+    if not hold:
+        return False
+
+    if status == 'released':
+        _notify(hold['event_id'], hold['seats'], False)
+    return True
+
+def _finish_hold_in(cursor, hold_id, status, from_statuses, user_id=None):
+    """_finish_hold() in the caller's transaction. Returns the hold, or None"""
+    query = "SELECT id, event_id, seats, status FROM seat_holds WHERE id = %s AND status = ANY(%s)"
+    params = [hold_id, list(from_statuses)]
+    if user_id is not None:
+        query += " AND user_id = %s"
+        params.append(user_id)
+    cursor.execute(query + " FOR UPDATE", params)
+    hold = cursor.fetchone()
+    if not hold:
+        return None
+
+    seats = hold['seats'] if isinstance(hold['seats'], dict) else json.loads(hold['seats'])
+    sections = _lock_sections(cursor, hold['event_id'], seats.keys())
+    for section_id, bits in seats.items():
+        state = sections.get(int(section_id))
+        if not state:
+            continue
+        mask = SeatBitmap.mask(bits)
+        state['sold' if hold['status'] == 'confirmed' else 'held'].remove(mask)
+        if status == 'confirmed':
+            state['sold'].add(mask)
+    _save_sections(cursor, hold['event_id'], sections)
+
+    cursor.execute("UPDATE seat_holds SET status = %s WHERE id = %s", (status, hold_id))
+    if status == 'released':
+        cursor.execute("DELETE FROM cart_items WHERE seat_hold_id = %s", (hold_id,))
+    return dict(hold, seats=seats)
+
+def release_hold(hold_id, user_id=None):
+    """Give the seats of a hold back. Returns False if there is no active hold"""
+    return _finish_hold(hold_id, 'released', ('held',), user_id)
+
+def confirm_hold(hold_id, user_id=None):
+    """Mark the seats of a held or ordered hold as sold. Returns False if there is none"""
+    return _finish_hold(hold_id, 'confirmed', ('held', 'ordered'), user_id)
+
+def release_expired_holds(event_id):
+    """Release the holds of an event whose time ran out"""
+    expired = db.execute_query("""
+        SELECT id FROM seat_holds
+        WHERE event_id = %s AND status = 'held' AND expires_at < NOW()
+    """, (event_id,), fetch=True)
+    for hold in expired or []:
+        release_hold(hold['id'])
+
+# Holds bought through the cart (see migrations/010_link_seat_holds.sql)
+
+class HoldExpiredError(Exception):
+    """Raised when a hold in a cart ran out before checkout"""
+
+CART_HOLD_QUERY = register_query('cart_seat_hold', """
+    SELECT sh.id, sh.event_id, sh.seats, array_agg(DISTINCT ess.ticket_id) as ticket_ids
+    FROM seat_holds sh
+    JOIN event_section_seats ess ON ess.event_id = sh.event_id
+     AND ess.section_id IN (SELECT key::int FROM jsonb_object_keys(sh.seats) key)
+    WHERE sh.id = %s AND sh.user_id = %s AND sh.status = 'held' AND sh.expires_at > NOW()
+    GROUP BY sh.id
+""")
+
+ORDER_HOLDS_QUERY = register_query('order_seat_holds', """
+    UPDATE seat_holds SET status = 'ordered', order_id = %s
+    WHERE id = ANY(%s) AND user_id = %s AND status = 'held' AND expires_at > NOW()
+    RETURNING id
+""")
+
+def hold_cart_item(hold):
+    """
+    Ticket tier and quantity of the cart item for a hold from CART_HOLD_QUERY.
+    The ticket id is None if the held sections are not priced by a single tier.
+    """
+    seats = hold['seats'] if isinstance(hold['seats'], dict) else json.loads(hold['seats'])
+    ticket_ids = hold['ticket_ids']
+    ticket_id = ticket_ids[0] if len(ticket_ids) == 1 else None
+    return ticket_id, sum(len(bits) for bits in seats.values())
+
+def order_holds(order_id, user_id, hold_ids):
+    """
+    Tie the holds of a cart to its order so they stop expiring.
+    Raises HoldExpiredError, leaving the holds as they were, if any of them ran out.
+    """
+    with db.transaction() as cursor:
+        cursor.execute(ORDER_HOLDS_QUERY, (order_id, hold_ids, user_id))
+        if len(cursor.fetchall()) != len(hold_ids):
+            raise HoldExpiredError('Some of the held seats are no longer held')
+
+def confirm_order_holds(order_id, cursor=None):
+    """
+    Sell the seats held for an order once it is paid. With the cursor of a
+    db.transaction() the seats are sold as part of that transaction
+    """
+    if cursor is None:
+        with db.transaction() as cursor:
+            return confirm_order_holds(order_id, cursor)
+
+    cursor.execute("SELECT id FROM seat_holds WHERE order_id = %s AND status = 'ordered' ORDER BY id", (order_id,))
+    for hold in cursor.fetchall():
+        _finish_hold_in(cursor, hold['id'], 'confirmed', ('held', 'ordered'))
+
+def release_order_holds(order_id):
+    """Give back the seats of a cancelled or refunded order"""
+    holds = db.fetch_all("""
+        SELECT id FROM seat_holds
+        WHERE order_id = %s AND status IN ('ordered', 'confirmed')
+    """, (order_id,))
+    for hold in holds:
+        _finish_hold(hold['id'], 'released', ('ordered', 'confirmed'))
@@ -0,0 +1,197 @@
+import threading
+import time
+from config import Config
+from utils.db import get_db
+from utils import seat_map, change_feed
+
+db = get_db()
+
+# Scoring of a block of seats, lower is better:
+#   section preference * SECTION_WEIGHT + row index * ROW_WEIGHT
+#   + distance of the block from the row center (0 to 1) * CENTER_WEIGHT
+# CENTER_WEIGHT < ROW_WEIGHT, so a closer row always wins within a section.
+SECTION_WEIGHT = 1000.0
+ROW_WEIGHT = 1.0
+CENTER_WEIGHT = 0.5
+
+def free_runs(free, count):
+    """Return the (start, length) runs of set bits in the lowest `count` bits of `free`"""
+    runs = []
+    free &= (1 << count) - 1
+    position = 0
+    while free:
+        skip = (free & -free).bit_length() - 1
+        free >>= skip
+        position += skip
+        taken = ~free
+        length = (taken & -taken).bit_length() - 1
+        runs.append((position, length))
+        free >>= length
+        position += length
+    return runs
+
+class EventSeatIndex:
+    """
+    Free-run index of an event's seat map.
+
+    For every row it keeps the runs of consecutive free seats and the longest
+    run, so searching for N seats together only looks at rows that can hold
+    them. Claims and releases update just the affected rows.
+    """
+
+    def __init__(self, layout, seats):
+        self.built_at = time.time()
+        self._lock = threading.Lock()
+        self.sections = []
+        self._sections_by_id = {}
+        for section in layout:
+            state = seats.get(section['id'])
+            if not state:
+                continue
+            entry = {
+                'id': section['id'],
+                'preference': section['preference'],
+                'rows': section['rows'],
+                'occupied': state['sold'].bits | state['held'].bits,
+                'runs': [],
+                'longest': []
+            }
+            for row in section['rows']:
+                entry['runs'].append([])
+                entry['longest'].append(0)
+            for row_index in range(len(section['rows'])):
+                self._reindex_row(entry, row_index)
+            self.sections.append(entry)
+            self._sections_by_id[section['id']] = entry
+        self.sections.sort(key=lambda s: (s['preference'], s['id']))
+
+    def _reindex_row(self, entry, row_index):
+        row = entry['rows'][row_index]
+        free = ~(entry['occupied'] >> row['first_seat'])
+        runs = free_runs(free, row['seat_count'])
+        entry['runs'][row_index] = runs
+        entry['longest'][row_index] = max((length for _, length in runs), default=0)
+
+    def update(self, seats_by_section, taken):
+        """Mark seats as taken or free and reindex the rows they are in"""
+        with self._lock:
+            for section_id, bits in seats_by_section.items():
+                entry = self._sections_by_id.get(section_id)
+                if not entry:
+                    continue
+                mask = seat_map.SeatBitmap.mask(bits)
+                entry['occupied'] = entry['occupied'] | mask if taken else entry['occupied'] & ~mask
+                rows = set()
+                for bit in bits:
+                    for row_index, row in enumerate(entry['rows']):
+                        if row['first_seat'] <= bit < row['first_seat'] + row['seat_count']:
+                            rows.add(row_index)
+                            break
+                for row_index in rows:
+                    self._reindex_row(entry, row_index)
+
+    def find(self, quantity, section_ids=None):
+        """
+        Find the best block of `quantity` adjacent seats.
+        Returns ({section_id: [seat bits]}, score) or (None, None).
+        """
+        best = None
+        best_score = None
+        with self._lock:
+            for entry in self.sections:
+                if section_ids and entry['id'] not in section_ids:
+                    continue
+                section_score = entry['preference'] * SECTION_WEIGHT
+                # Sections are sorted by preference, nothing after this can win
+                if best_score is not None and section_score >= best_score:
+                    break
+
+                for row_index, row in enumerate(entry['rows']):
+                    if entry['longest'][row_index] < quantity:
+                        continue
+                    row_score = section_score + row_index * ROW_WEIGHT
+                    if best_score is not None and row_score >= best_score:
+                        break
+
+                    center = row['seat_count'] / 2.0
+                    for start, length in entry['runs'][row_index]:
+                        if length < quantity:
+                            continue
+                        # Most centered placement of the block inside this run
+                        offset = min(max(int(center - quantity / 2.0), start), start + length - quantity)
+                        distance = abs(offset + quantity / 2.0 - center) / max(center, 1)
+                        score = row_score + distance * CENTER_WEIGHT
+                        if best_score is None or score < best_score:
+                            best_score = score
+                            best = (entry['id'], row['first_seat'] + offset)
+
+        if not best:
+            return None, None
+        section_id, first_bit = best
+        return {section_id: list(range(first_bit, first_bit + quantity))}, best_score
+
+# One index per event, per worker
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+def get_index(event_id, refresh=False):
+    """Get the event's free-run index, rebuilding it when stale"""
+    with _indexes_lock:
+        index = _indexes.get(event_id)
+    if index and not refresh and time.time() - index.built_at < Config.SEAT_INDEX_TTL:
+        return index
+
+    event = db.execute_query("SELECT venue_id FROM events WHERE id = %s", (event_id,), fetch='one')
+    seats = seat_map.get_event_seats(event_id)
+    if not event or seats is None:
+        return None
+
+    index = EventSeatIndex(seat_map.get_venue_layout(event['venue_id']), seats)
+    with _indexes_lock:
+        _indexes[event_id] = index
+    return index
+
+def _on_seats_changed(event_id, seats_by_section, taken):
+    with _indexes_lock:
+        index = _indexes.get(event_id)
+    if index:
+        index.update(seats_by_section, taken)
+
+seat_map.add_listener(_on_seats_changed)
+
+def _on_layout_changed(change):
+    # Indexes hold the venue layout they were built with
+    with _indexes_lock:
+        _indexes.clear()
+
+change_feed.subscribe('venue_sections', _on_layout_changed)
+
+def find_best_seats(event_id, quantity, section_ids=None):
+    """Find the best available block of seats. Returns {section_id: [seat bits]} or None"""
+    index = get_index(event_id)
+    if not index:
+        return None
+    seats, _ = index.find(quantity, section_ids)
+    return seats
+
+def hold_best_seats(event_id, user_id, quantity, ttl_seconds, section_ids=None, attempts=3):
+    """
+    Find and hold the best available block of seats.
+    The index may be stale (other workers sell seats too), so when the hold
+    loses a race the index is rebuilt and the search retried.
+    Returns (hold_id, {section_id: [seat bits]}) or (None, None).
+    """
+    for attempt in range(attempts):
+        index = get_index(event_id, refresh=attempt > 0)
+        if not index:
+            return None, None
+
+        seats, _ = index.find(quantity, section_ids)
+        if not seats:
+            return None, None
+
+        hold_id = seat_map.hold_seats(event_id, user_id, seats, ttl_seconds)
+        if hold_id:
+            return hold_id, seats
+
+    return None, None
@@ -0,0 +1,140 @@
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+
+class _Flight:
+    """A computation in progress that other callers can wait for"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+class SingleFlightCache:
+    """
+    Short-lived cache of read results where concurrent identical reads share
+    one computation.
+
+    get(key, compute) returns the cached value while it is fresh (ttl
+    seconds). Otherwise the first caller runs compute and every caller that
+    arrives meanwhile waits for its result (or its exception) instead of
+    running the same queries. Once an entry expires, for stale_ttl more
+    seconds only one caller recomputes it while the others keep getting the
+    expired value, so a hot key costs one computation per refresh whatever
+    the concurrency. With ttl and stale_ttl at 0 nothing is kept and only
+    in-flight computations are shared.
+
+    get_async() is the same for coroutines on one event loop. Both share the
+    entries and invalidations; a key may be computed once by each side.
+    """
+
+    def __init__(self, ttl, stale_ttl=0, max_entries=1000):
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> (value, expires_at)
+        self._flights = {}
+        self._async_flights = {}  # key -> asyncio.Future
+        self._generation = 0
+        self._stats = {'hits': 0, 'stale_hits': 0, 'coalesced': 0, 'computed': 0}
+
+    def get(self, key, compute):
+        found, value, flight, generation = self._join(key, self._flights, _Flight)
+        if found:
+            return value
+
+        if generation is None:
+            flight.done.wait()
+            if flight.error:
+                raise flight.error
+            return flight.value
+
+        try:
+            flight.value = compute()
+            return flight.value
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            self._land(key, self._flights, generation, not flight.error, flight.value)
+            flight.done.set()
+
+    async def get_async(self, key, compute):
+        """get() for coroutines: compute is a coroutine function"""
+        found, value, flight, generation = self._join(
+            key, self._async_flights, asyncio.get_running_loop().create_future
+        )
+        if found:
+            return value
+
+        if generation is None:
+            # Shielded so a follower going away doesn't cancel the leader's result
+            return await asyncio.shield(flight)
+
+        try:
+            value = await compute()
+            flight.set_result(value)
+            return value
+        except Exception as e:
+            flight.set_exception(e)
+            raise
+        finally:
+            if not flight.done():
+                flight.cancel()
+            # Marks the exception as retrieved when nobody was waiting
+            failed = flight.cancelled() or flight.exception() is not None
+            self._land(key, self._async_flights, generation, not failed, value)
+
+    def _join(self, key, flights, new_flight):
+        """
+        Look key up. Returns (True, value, None, None) for a usable entry,
+        otherwise (False, None, flight, generation) where generation is None
+        when another caller is already computing the key
+        """
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and now < entry[1]:
+                self._stats['hits'] += 1
+                return True, entry[0], None, None
+            flight = flights.get(key)
+            if flight is None:
+                flight = flights[key] = new_flight()
+                self._stats['computed'] += 1
+                return False, None, flight, self._generation
+            if entry and now < entry[1] + self.stale_ttl:
+                # Someone is already refreshing it
+                self._stats['stale_hits'] += 1
+                return True, entry[0], None, None
+            self._stats['coalesced'] += 1
+            return False, None, flight, None
+
+    def _land(self, key, flights, generation, ok, value):
+        """End a computation, keeping its value if nothing was invalidated meanwhile"""
+        with self._lock:
+            del flights[key]
+            # Results computed across an invalidation may already be stale
+            if ok and generation == self._generation and (self.ttl or self.stale_ttl):
+                self._store(key, value)
+
+    def _store(self, key, value):
+        self._entries.pop(key, None)
+        self._entries[key] = (value, time.time() + self.ttl)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, *keys):
+        """Drop the given keys, or everything when called without keys"""
+        with self._lock:
+            self._generation += 1
+            if not keys:
+                self._entries.clear()
+            for key in keys:
+                self._entries.pop(key, None)
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats, entries=len(self._entries),
+                        in_flight=len(self._flights) + len(self._async_flights))
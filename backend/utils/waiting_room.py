@@ -0,0 +1,168 @@
+import threading
+import time
+import uuid
+import jwt
+from config import Config
+from utils.db import get_db, register_query
+
+# Spent admissions are shared by all workers. An admission is keyed by the
+# queue position it was issued for, so polling the same position again can't
+# buy twice; rows are dropped once that position's queue token has expired.
+SPEND_ADMISSION_QUERY = register_query('spend_admission', """
+    WITH expired AS (
+        DELETE FROM waiting_room_spent WHERE expires_at < NOW()
+    )
+    INSERT INTO waiting_room_spent (jti, expires_at) VALUES (%s, to_timestamp(%s))
+    ON CONFLICT (jti) DO NOTHING
+    RETURNING jti
+""")
+
+class WaitingRoom:
+    """
+    Virtual waiting room for flash sales.
+
+    Buyers join a per-event queue and get a signed position token. The
+    admission frontier advances at `rate` buyers per second (with up to
+    `burst` buyers let in at once when the queue is empty); once a buyer's
+    position is behind the frontier, polling returns a short-lived admission
+    token that the cart and checkout routes require.
+
+    Both tokens name the buyer's user id and are only accepted from that
+    user. An admission is spent by the checkout it lets through, so each
+    queue position buys once.
+
+    Queue state is kept in memory and never touches the database. With
+    several worker processes each one runs its own queue, so `rate` is per
+    worker. Spent admissions are recorded in the database, so they are
+    spent on every worker.
+    """
+
+    def __init__(self, secret, rate=50, burst=100, admission_ttl=600, queue_ttl=3600, event_ids=None):
+        self.secret = secret
+        self.rate = rate
+        self.burst = burst
+        self.admission_ttl = admission_ttl
+        self.queue_ttl = queue_ttl
+        self.event_ids = set(event_ids) if event_ids else None
+        self._lock = threading.Lock()
+        self._queues = {}
+
+    def is_gated(self, event_id):
+        """Return True if buyers for this event must go through the queue"""
+        return self.event_ids is None or event_id in self.event_ids
+
+    def join(self, event_id, user_id):
+        """Add a buyer to the event's queue and return their status"""
+        with self._lock:
+            queue = self._advance(event_id)
+            queue['joined'] += 1
+            position = queue['joined']
+
+        token = jwt.encode({
+            'type': 'queue',
+            'event_id': event_id,
+            'user_id': user_id,
+            'position': position,
+            'jti': uuid.uuid4().hex,
+            'iat': int(time.time()),
+            'exp': int(time.time()) + self.queue_ttl
+        }, self.secret, algorithm='HS256')
+
+        status = self.status(event_id, token, user_id)
+        status['queue_token'] = token
+        return status
+
+    def status(self, event_id, queue_token, user_id):
+        """
+        Return a buyer's place in the queue. Once admitted the status includes
+        an 'admission_token' for the purchase routes.
+        Raises jwt.InvalidTokenError for expired tokens and tokens not issued
+        for this event and user.
+        """
+        payload = jwt.decode(queue_token, self.secret, algorithms=['HS256'])
+        if payload.get('type') != 'queue' or payload.get('event_id') != event_id:
+            raise jwt.InvalidTokenError('Queue token does not belong to this event')
+        if payload.get('user_id') != user_id:
+            raise jwt.InvalidTokenError('Queue token does not belong to this user')
+
+        position = payload['position']
+        with self._lock:
+            admitted_through = int(self._advance(event_id)['admitted'])
+
+        ahead = max(position - admitted_through, 0)
+        status = {
+            'event_id': event_id,
+            'position': position,
+            'ahead': ahead,
+            'admitted': ahead == 0,
+            'estimated_wait': round(ahead / self.rate, 1) if self.rate else None,
+            'poll_after': min(max(ahead / self.rate / 2, 1), 30) if self.rate and ahead else None
+        }
+
+        # Every admission for this queue position shares its id, so spending
+        # one spends them all
+        if status['admitted']:
+            status['admission_token'] = jwt.encode({
+                'type': 'admission',
+                'event_id': event_id,
+                'user_id': user_id,
+                'position': position,
+                'jti': payload.get('jti') or f"{event_id}:{user_id}:{position}",
+                'queue_exp': payload['exp'],
+                'exp': int(time.time()) + self.admission_ttl
+            }, self.secret, algorithm='HS256')
+
+        return status
+
+    def check_admission(self, admission_token, user_id):
+        """
+        Validate an admission token and return its payload, or None if it is
+        missing, expired, forged or another user's. Whether it was already
+        spent is only known when spending it.
+        """
+        if not admission_token:
+            return None
+        try:
+            payload = jwt.decode(admission_token, self.secret, algorithms=['HS256'])
+        except jwt.InvalidTokenError:
+            return None
+        if payload.get('type') != 'admission' or payload.get('user_id') != user_id:
+            return None
+        return payload
+
+    def spend(self, admission):
+        """
+        Mark an admission (a check_admission payload) as used. Returns False
+        if it was already spent, on this or another worker.
+        """
+        expires_at = admission.get('queue_exp', admission['exp'])
+        return bool(get_db().execute_query(SPEND_ADMISSION_QUERY, (admission['jti'], expires_at)))
+
+    def _advance(self, event_id):
+        """Move the event's admission frontier forward. Caller holds the lock"""
+        now = time.time()
+        queue = self._queues.get(event_id)
+        if queue is None:
+            queue = {'joined': 0, 'admitted': float(self.burst), 'updated_at': now}
+            self._queues[event_id] = queue
+            return queue
+
+        elapsed = now - queue['updated_at']
+        queue['admitted'] = min(queue['admitted'] + elapsed * self.rate, queue['joined'] + self.burst)
+        queue['updated_at'] = now
+        return queue
+
+def _parse_event_ids(value):
+    return [int(event_id) for event_id in value.split(',') if event_id.strip()] if value else None
+
+# Global waiting room, only created when enabled
+waiting_room = None
+if Config.WAITING_ROOM_ENABLED:
+    waiting_room = WaitingRoom(
+        Config.WAITING_ROOM_SECRET,
+        rate=Config.WAITING_ROOM_ADMIT_RATE,
+        burst=Config.WAITING_ROOM_ADMIT_BURST,
+        admission_ttl=Config.WAITING_ROOM_ADMISSION_TTL,
+        queue_ttl=Config.WAITING_ROOM_QUEUE_TOKEN_TTL,
+        event_ids=_parse_event_ids(Config.WAITING_ROOM_EVENT_IDS)
+    )
@@ -194,8 +194,20 @@ const PaymentSuccess = () => {
 
         if (paymentId && payerId) {
           const { cartAPI } = await import('./services/api');
-          await cartAPI.executePayment({ payment_id: paymentId, payer_id: payerId });
-          setSuccess(true);
+          const response = await cartAPI.executePayment({ payment_id: paymentId, payer_id: payerId });
+
+          // Payment is being executed in the background, wait for it
+          let status = response.status === 202 ? response.data.status : 'completed';
+          while (status === 'queued' || status === 'running') {
+            const statusResponse = await cartAPI.getPaymentStatus(response.data.order_id);
+            status = statusResponse.data.status;
+          }
+
+          if (status === 'completed') {
+            setSuccess(true);
+          } else {
+            setError('Error al procesar el pago');
+          }
         } else {
           setError('Parámetros de pago inválidos');
         }
@@ -17,6 +17,31 @@ const EventDetails = () => {
     loadEventDetails();
   }, [id]);
 
+  // Keep the remaining tickets up to date while the page is open
+  useEffect(() => {
+    const stream = eventsAPI.availabilityStream(id);
+
+    const applyAvailability = (message) => {
+      const data = JSON.parse(message.data);
+      if (!data.tickets) return;
+
+      const available = {};
+      data.tickets.forEach((ticket) => {
+        available[ticket.id] = ticket.available;
+      });
+      setEvent((current) => current && current.tickets ? {
+        ...current,
+        tickets: current.tickets.map((ticket) => (
+          ticket.id in available ? { ...ticket, available: Math.max(available[ticket.id], 0) } : ticket
+        ))
+      } : current);
+    };
+
+    stream.addEventListener('snapshot', applyAvailability);
+    stream.addEventListener('availability', applyAvailability);
+    return () => stream.close();
+  }, [id]);
+
   const loadEventDetails = async () => {
     try {
       setLoading(true);
@@ -42,7 +42,10 @@ const EventList = () => {
         }
       });
 
-      const response = await eventsAPI.getEvents(params);
+      // Free text goes to the ranked search endpoint, the catalog ignores it
+      const response = params.search
+        ? await eventsAPI.search(params.search, { page: params.page, per_page: params.per_page })
+        : await eventsAPI.getEvents(params);
       setEvents(response.data.events);
       setPagination(prev => ({
         ...prev,
@@ -1,4 +1,5 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
+import { useNavigate } from 'react-router-dom';
 import { eventsAPI } from '../services/api';
 
 const SearchBar = ({ onSearch, onFiltersChange }) => {
@@ -9,11 +10,45 @@ const SearchBar = ({ onSearch, onFiltersChange }) => {
   const [eventTypes, setEventTypes] = useState([]);
   const [venues, setVenues] = useState([]);
   const [isExpanded, setIsExpanded] = useState(false);
+  const [suggestions, setSuggestions] = useState([]);
+  const suggestionSelected = useRef(false);
+  const navigate = useNavigate();
 
   useEffect(() => {
     loadFilters();
   }, []);
 
+  // Suggestions while typing, once the user pauses for a moment
+  useEffect(() => {
+    // Picking a suggestion fills in its text, which needs no suggestions
+    if (suggestionSelected.current) {
+      suggestionSelected.current = false;
+      return;
+    }
+
+    if (searchTerm.trim().length < 2) {
+      setSuggestions([]);
+      return;
+    }
+
+    let cancelled = false;
+    const timer = setTimeout(async () => {
+      try {
+        const response = await eventsAPI.autocomplete(searchTerm);
+        if (!cancelled) {
+          setSuggestions(response.data.suggestions);
+        }
+      } catch (error) {
+        console.error('Error loading suggestions:', error);
+      }
+    }, 150);
+
+    return () => {
+      cancelled = true;
+      clearTimeout(timer);
+    };
+  }, [searchTerm]);
+
   const loadFilters = async () => {
     try {
       const [typesResponse, venuesResponse] = await Promise.all([
@@ -63,10 +98,42 @@ const SearchBar = ({ onSearch, onFiltersChange }) => {
 
   const handleKeyPress = (e) => {
     if (e.key === 'Enter') {
+      setSuggestions([]);
       handleSearch();
     }
   };
 
+  const handleSelectSuggestion = (suggestion) => {
+    setSuggestions([]);
+
+    if (suggestion.type === 'event') {
+      navigate(`/events/${suggestion.id}`);
+      return;
+    }
+
+    // Artists, venues and types are searched by name
+    suggestionSelected.current = suggestion.text !== searchTerm;
+    setSearchTerm(suggestion.text);
+
+    const filters = {
+      search: suggestion.text,
+      type: selectedType,
+      venue: selectedVenue,
+      date: selectedDate
+    };
+    onSearch(filters);
+    if (onFiltersChange) {
+      onFiltersChange(filters);
+    }
+  };
+
+  const suggestionLabels = {
+    event: 'Evento',
+    artist: 'Artista',
+    venue: 'Lugar',
+    event_type: 'Tipo'
+  };
+
   return (
     <div className="bg-white shadow-lg rounded-lg p-6 mb-8">
       {/* Main Search Bar */}
@@ -79,6 +146,7 @@ const SearchBar = ({ onSearch, onFiltersChange }) => {
               value={searchTerm}
               onChange={(e) => setSearchTerm(e.target.value)}
               onKeyPress={handleKeyPress}
+              onBlur={() => setTimeout(() => setSuggestions([]), 150)}
               className="w-full pl-10 pr-4 py-3 border border-gray-300 rounded-lg focus:ring-2 focus:ring-primary-500 focus:border-transparent"
             />
             <div className="absolute inset-y-0 left-0 pl-3 flex items-center pointer-events-none">
@@ -86,6 +154,24 @@ const SearchBar = ({ onSearch, onFiltersChange }) => {
                 <path strokeLinecap="round" strokeLinejoin="round" strokeWidth="2" d="M21 21l-6-6m2-5a7 7 0 11-14 0 7 7 0 0114 0z" />
               </svg>
             </div>
+
+            {/* Autocomplete Suggestions */}
+            {suggestions.length > 0 && (
+              <ul className="absolute z-10 mt-1 w-full bg-white border border-gray-200 rounded-lg shadow-lg">
+                {suggestions.map((suggestion) => (
+                  <li key={`${suggestion.type}-${suggestion.id}`}>
+                    <button
+                      type="button"
+                      onClick={() => handleSelectSuggestion(suggestion)}
+                      className="w-full flex justify-between items-center px-4 py-2 text-left hover:bg-gray-50"
+                    >
+                      <span>{suggestion.text}</span>
+                      <span className="text-xs text-gray-500">{suggestionLabels[suggestion.type]}</span>
+                    </button>
+                  </li>
+                ))}
+              </ul>
+            )}
           </div>
         </div>
         
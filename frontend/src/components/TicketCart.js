@@ -50,7 +50,17 @@ const TicketCart = () => {
       setError('');
 
       const response = await cartAPI.checkout();
-      const { approval_url } = response.data;
+      let { approval_url } = response.data;
+
+      // Payment is being created in the background, wait for it
+      if (response.status === 202) {
+        let status = response.data.status;
+        while (status === 'queued' || status === 'running') {
+          const statusResponse = await cartAPI.getPaymentStatus(response.data.order_id);
+          status = statusResponse.data.status;
+          approval_url = statusResponse.data.approval_url;
+        }
+      }
 
       if (approval_url) {
         // Redirect to PayPal for payment
@@ -17,6 +17,10 @@ api.interceptors.request.use(
     if (token) {
       config.headers.Authorization = `Bearer ${token}`;
     }
+    const admissionTokens = localStorage.getItem('admissionTokens');
+    if (admissionTokens) {
+      config.headers['X-Admission-Token'] = admissionTokens;
+    }
     return config;
   },
   (error) => {
@@ -50,6 +54,10 @@ export const eventsAPI = {
   getEventDetails: (eventId) => api.get(`/api/events/${eventId}`),
   getEventTypes: () => api.get('/api/event-types'),
   getVenues: () => api.get('/api/venues'),
+  search: (q, params = {}) => api.get('/api/search', { params: { q, ...params } }),
+  autocomplete: (q, limit = 8) => api.get('/api/autocomplete', { params: { q, limit } }),
+  // Server-Sent Events stream of the event's ticket availability
+  availabilityStream: (eventId) => new EventSource(`${API_BASE_URL}/api/events/${eventId}/availability/stream`),
 };
 
 // Cart API
@@ -59,6 +67,13 @@ export const cartAPI = {
   removeFromCart: (itemId) => api.delete(`/api/cart/${itemId}`),
   checkout: () => api.post('/api/checkout'),
   executePayment: (paymentData) => api.post('/api/payment/execute', paymentData),
+  getPaymentStatus: (orderId, wait = 20) => api.get(`/api/orders/${orderId}/payment`, { params: { wait } }),
+};
+
+// Waiting Room API
+export const waitingRoomAPI = {
+  joinQueue: (eventId) => api.post(`/api/events/${eventId}/queue`),
+  getQueueStatus: (eventId, token) => api.get(`/api/events/${eventId}/queue`, { params: { token } }),
 };
 
 // Orders API